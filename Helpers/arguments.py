@@ -9,25 +9,122 @@ def table_file_type(arg_value, pat=re.compile(r'^.+\.(?:xlsx|csv)$')):
     return arg_value
 
 
+def book_file_type(arg_value, pat=re.compile(r'^.+\.(?:xlsx|csv|parquet)$')):
+    if not pat.match(arg_value):
+        raise argparse.ArgumentTypeError('Not a csv file or a parquet archive')
+    return arg_value
+
+
+def store_type(arg_value, pat=re.compile(r'^sqlite:.+$')):
+    if not pat.match(arg_value):
+        raise argparse.ArgumentTypeError('Not a store (expected sqlite:path.db)')
+    return arg_value
+
+
 def get_arguments():
     arg_parser = argparse.ArgumentParser(description='backup livelib library')
 
     arg_parser.add_argument('user',
                             type=str,
+                            nargs='?',
                             help='livelib username used in the link to the personal page')
 
+    arg_parser.add_argument('--users_file',
+                            type=str,
+                            default=None,
+                            help='back up every user listed in the file (one username per line) in one run')
+
+    arg_parser.add_argument('--base_url',
+                            type=str,
+                            default='https://www.livelib.ru',
+                            help='the site to back up from, e.g. a local mirror for benchmarks '
+                                 '(default: https://www.livelib.ru)')
+
+    arg_parser.add_argument('--user_workers',
+                            type=int,
+                            default=4,
+                            help='the number of users backed up at the same time with --users_file (default: 4)')
+
     arg_parser.add_argument('--min_delay',
                             type=int,
-                            default=60,
-                            help='minimum waiting time between two page loads (default: 30 seconds)')
+                            default=5,
+                            help='the shortest waiting time between two page loads; the pause shrinks towards it '
+                                 'while the site answers fast (default: 5 seconds)')
 
     arg_parser.add_argument('--max_delay',
                             type=int,
+                            default=15,
+                            help='the usual longest waiting time between two page loads; the pause may grow past '
+                                 'it when the site pushes back; -1 keeps the pause at --min_delay until the site '
+                                 'pushes back (default: 15 seconds)')
+
+    arg_parser.add_argument('--pace_file',
+                            type=str,
+                            default='.livelib_pace.json',
+                            help='file keeping the last pause between page loads for the next run '
+                                 '(default: .livelib_pace.json)')
+
+    arg_parser.add_argument('-w', '--workers',
+                            type=int,
+                            default=1,
+                            help='the number of pages downloaded in parallel (default: 1)')
+
+    arg_parser.add_argument('--parsers',
+                            type=int,
+                            default=0,
+                            help='the number of processes parsing downloaded pages (default: 0 - parse in the '
+                                 'download threads)')
+
+    arg_parser.add_argument('--rate',
+                            type=float,
+                            default=None,
+                            help='average number of page loads per second shared by all workers; '
+                                 'replaces min_delay/max_delay when set')
+
+    arg_parser.add_argument('--burst',
+                            type=int,
+                            default=1,
+                            help='the number of page loads allowed in a row without waiting when --rate is set '
+                                 '(default: 1)')
+
+    arg_parser.add_argument('--pool_size',
+                            type=int,
+                            default=10,
+                            help='the number of kept-alive connections to livelib.ru (default: 10)')
+
+    arg_parser.add_argument('--per_host',
+                            type=int,
+                            default=None,
+                            help='the maximum number of simultaneous requests to one host (default: unlimited)')
+
+    arg_parser.add_argument('--cache',
+                            type=str,
+                            default=None,
+                            help='path to the sqlite file caching downloaded pages')
+
+    arg_parser.add_argument('--cache_ttl',
+                            type=float,
+                            default=0,
+                            help='seconds a cached page is used without asking the site (default: 0 - always '
+                                 'revalidate)')
+
+    arg_parser.add_argument('--cache_max_age',
+                            type=float,
                             default=30,
-                            help='maximum waiting time between two page loads (default: 30 seconds)')
+                            help='days after which pages not confirmed by the site are dropped from the cache '
+                                 '(default: 30)')
+
+    arg_parser.add_argument('--cache_size',
+                            type=int,
+                            default=None,
+                            help='maximum cache size in megabytes (default: unlimited)')
+
+    arg_parser.add_argument('--offline',
+                            action='store_true',
+                            help='use only cached pages, never go to the site (requires --cache)')
 
     arg_parser.add_argument('-b', '--books_backup',
-                            type=table_file_type,
+                            type=book_file_type,
                             default=None,
                             help='path to file stores books backup')
 
@@ -46,6 +143,51 @@ def get_arguments():
                             default=math.inf,
                             help='the number of pages of quotes that the script will process')
 
+    arg_parser.add_argument('--stop_after',
+                            type=int,
+                            default=0,
+                            help='stop paging a list after N pages in a row without new or changed items '
+                                 '(default: 0 - read all pages)')
+
+    arg_parser.add_argument('--batch_size',
+                            type=int,
+                            default=100,
+                            help='write new books and quotes to disk every N items (default: 100)')
+
+    arg_parser.add_argument('--metrics',
+                            type=str,
+                            help='write a json summary of the run (stage timings, bytes, cache hits) to the file')
+
+    arg_parser.add_argument('--prometheus',
+                            type=str,
+                            help='write the run metrics to the file in the Prometheus text format '
+                                 '(e.g. for the node_exporter textfile collector)')
+
+    arg_parser.add_argument('--openmetrics',
+                            action='store_true',
+                            help='write --prometheus in the OpenMetrics format')
+
+    arg_parser.add_argument('--store',
+                            type=store_type,
+                            help='keep books and quotes in a database instead of the tables (sqlite:path.db)')
+
+    arg_parser.add_argument('--export',
+                            action='store_true',
+                            help='regenerate the csv/xlsx tables from --store and exit')
+
+    arg_parser.add_argument('--resume',
+                            action='store_true',
+                            help='continue an interrupted backup from the last crawled page')
+
+    arg_parser.add_argument('--retries',
+                            type=int,
+                            default=3,
+                            help='attempts to load a page before it is put to the failed list (default: 3)')
+
+    arg_parser.add_argument('--retry_failed',
+                            action='store_true',
+                            help='load only the pages that failed in the previous runs and exit')
+
     arg_parser.add_argument('-R', '--rewrite_all',
                             action='store_true',
                             help='rewrite all csv files (not update)')
@@ -56,6 +198,29 @@ def get_arguments():
 
     arg_parser.add_argument('-d', '--driver',
                             type=str,
-                            help='the name of the page download driver (requests/silenium)')
+                            help='the name of the page download driver (requests/silenium/async)')
 
-    return arg_parser.parse_args()
+    args = arg_parser.parse_args()
+    if (args.user is None) == (args.users_file is None):
+        arg_parser.error('give either a username or --users_file')
+    if args.users_file:
+        for name in ('books_backup', 'quotes_backup', 'store'):
+            value = getattr(args, name)
+            # архив parquet уже разбит по пользователям
+            if value and '{user}' not in value and not value.endswith('.parquet'):
+                arg_parser.error(f'--{name} must contain {{user}} with --users_file')
+    if args.max_delay < -1:
+        arg_parser.error('--max_delay must be -1 (a fixed --min_delay pause) or at least 0')
+    if args.max_delay != -1 and args.min_delay > args.max_delay:
+        arg_parser.error('--min_delay must not exceed --max_delay')
+    if args.offline and not args.cache:
+        arg_parser.error('--offline requires --cache')
+    if args.export and not args.store:
+        arg_parser.error('--export requires --store')
+    if args.retry_failed and (args.rewrite_all or args.resume or args.export):
+        arg_parser.error('--retry_failed cannot be combined with --rewrite_all, --resume or --export')
+    if args.openmetrics and not args.prometheus:
+        arg_parser.error('--openmetrics requires --prometheus')
+    if args.retries < 1:
+        arg_parser.error('--retries must be at least 1')
+    return args
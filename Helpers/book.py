@@ -2,6 +2,10 @@ from .utils import handle_none, add_livelib
 
 
 class Book:
+    # порядок полей при записи и чтении (to_list, to_dict); __slots__ убирает у каждой книги свой __dict__
+    FIELDS = ('name', 'author', 'status', 'rating', 'date', 'link')
+    __slots__ = FIELDS
+
     def __init__(self, link=None, status=None, name=None, author=None, rating=None, date=None):
         self.name = handle_none(name)
         self.author = handle_none(author)
@@ -14,13 +18,18 @@ class Book:
         return '%s\t%s\t%s\t%s\t%s\t%s' % (self.name, self.author, self.status, self.rating, self.date, self.link)
 
     def __eq__(self, other):
+        if not isinstance(other, Book):
+            return NotImplemented
         return self.link == other.link
 
-    def __ne__(self, other):
-        return not self.__eq__(other)
+    def __hash__(self):
+        return hash(self.link)
 
     def to_list(self):
-        return self.__dict__.values()
+        return tuple(getattr(self, name) for name in self.FIELDS)
+
+    def to_dict(self):
+        return dict(zip(self.FIELDS, self.to_list()))
 
     def add_name(self, name):
         self.name = name
@@ -0,0 +1,117 @@
+import json
+import os
+
+from .book import Book
+from .quote import Quote
+
+
+def item_to_dict(item):
+    """
+    :param item: Book or Quote
+    :return: dict - объект в виде, пригодном для json
+    """
+    return item.to_dict()
+
+
+def item_from_dict(data):
+    """
+    :param data: dict - результат item_to_dict
+    :return: Book or Quote
+    """
+    if 'book' in data:
+        return Quote(data['link'], data['text'], Book(**data['book']))
+    return Book(**data)
+
+
+class Checkpoint:
+    """
+    Журнал обхода одного раздела (книги одного статуса или цитаты). После каждой разобранной страницы
+    в файл дописывается строка json с ее номером и найденными на ней объектами, так что после сбоя
+    обход можно продолжить со следующей страницы, не скачивая заново уже пройденные
+    """
+
+    def __init__(self, path, resume=False):
+        """
+        :param path: string - путь к файлу журнала
+        :param resume: bool - продолжить сохраненный журнал (иначе он начинается заново)
+        """
+        self.path = path
+        self.page = 0
+        self.done = False
+        if resume:
+            self.load()
+        else:
+            self.clear()
+
+    def load(self):
+        """
+        Читает номер последней пройденной страницы. Недописанная при сбое строка отрезается,
+        чтобы следующие записи не склеились с ней
+        """
+        self.page, self.done = 0, False
+        if not os.path.exists(self.path):
+            return
+        valid = 0
+        with open(self.path, 'rb') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                self.page = max(self.page, record.get('page', 0))
+                self.done = self.done or record.get('done', False)
+                valid += len(line)
+        if valid < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as file:
+                file.truncate(valid)
+
+    def records(self):
+        """
+        :return: generator - записи журнала (dict)
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                yield json.loads(line)
+
+    def items(self):
+        """
+        Объекты, найденные на уже пройденных страницах, в порядке обхода
+        :return: generator - классы Book или Quote
+        """
+        for record in self.records():
+            for data in record.get('items', ()):
+                yield item_from_dict(data)
+
+    def add(self, page, items):
+        """
+        Отмечает страницу пройденной
+        :param page: int - номер страницы
+        :param items: list - объекты со страницы
+        """
+        self._write({'page': page, 'items': [item_to_dict(item) for item in items]})
+        self.page = page
+
+    def finish(self):
+        """
+        Отмечает, что раздел пройден до конца
+        """
+        self._write({'done': True})
+        self.done = True
+
+    def clear(self):
+        """
+        Удаляет журнал
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.page, self.done = 0, False
+
+    def _write(self, record):
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
@@ -1,21 +1,148 @@
 import csv
+import mmap
 import os
+from operator import itemgetter
 from .book import Book
 from .quote import Quote
 
 
+# колонки таблиц в порядке аргументов Book и Quote
+BOOK_CSV_COLUMNS = ('Link', 'Status', 'Name', 'Author', 'My Rating', 'Date')
+QUOTE_CSV_COLUMNS = ('Quote link', 'Quote text', 'Book link', 'Name', 'Author')
+
+
 def read_csv(file_path):
     """
     Считывает csv таблицу в виде списка, в котором лежат списки из ячеек строки
     :param file_path: string - путь к таблице
     :return: list - список списков из ячеек таблицы
     """
-    if not os.path.exists(file_path):  # если таблицы не существует, следует вернуть пустой лист
-        return []
-    with open(file_path, "r", encoding='utf-8') as file:
-        reader = csv.reader(file, delimiter='\t')
-        next(reader, None)  # skip the header
-        return list(reader)
+    return [row for _, row in iter_csv(file_path)]
+
+
+def iter_csv(file_path, columns=None, start=0):
+    """
+    Читает csv таблицу по одной записи из отображения файла в память (mmap), не загружая ее целиком.
+    Строки без кавычек разбираются прямо по табуляциям, записи с кавычками (текст цитаты в несколько строк) -
+    через csv.reader. Если заданы columns, из записи отдаются только нужные поля
+    (например, для проверки "уже сохранено?" - одна колонка Link, см. iter_links_from_csv).
+    Если нужна только последняя колонка, декодируется лишь она
+    :param file_path: string - путь к таблице
+    :param columns: list or None - имена колонок заголовка, которые нужно прочитать (None - все колонки);
+    колонка, которой нет в таблице (или None вместо имени), читается как пустая строка
+    :param start: int - смещение в байтах начала записи, с которой читать (0 - с первой записи после заголовка)
+    :return: generator - пары (смещение записи в байтах, список значений всех колонок или columns в их порядке)
+    """
+    if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:  # пустой файл нельзя отобразить в память
+        return
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        size = len(data)
+        end = data.find(b'\n')
+        end = size if end < 0 else end
+        header = next(csv.reader([data[:end].decode('utf-8')], delimiter='\t'), None)
+        if not header:
+            return
+        pick = column_picker(header, columns)
+        # нужна только последняя колонка (Link): ее значение ставится в заготовку на свое место
+        single = len(header) > 1 and {name for name in columns or () if name in header} == {header[-1]}
+        if single:
+            blank, slot = [''] * len(columns), list(columns).index(header[-1])
+        position = max(start, end + 1)
+        while position < size:
+            end = data.find(b'\n', position)
+            end = size if end < 0 else end
+            if data.find(b'"', position, end) >= 0:
+                cursor = [position]
+                row = next(csv.reader(iter_lines(data, position, cursor), delimiter='\t'), [])
+                offset, position = position, cursor[0]
+            else:
+                stop = end - 1 if end > position and data[end - 1] == 13 else end  # \r\n
+                offset, position = position, end + 1
+                if single:
+                    # название и автор не копируются и не декодируются
+                    cut = data.rfind(b'\t', offset, stop)
+                    if cut >= 0:
+                        row = blank[:]
+                        row[slot] = data[cut + 1:stop].decode('utf-8')
+                        yield offset, row
+                        continue
+                row = data[offset:stop].decode('utf-8').split('\t') if stop > offset else []
+            if row:
+                yield offset, row if pick is None else pick(row)
+
+
+def iter_lines(data, position, cursor):
+    """
+    :param data: mmap - отображение таблицы
+    :param position: int - смещение начала первой строки
+    :param cursor: list - в cursor[0] записывается смещение конца последней отданной строки
+    :return: generator - строки таблицы вместе с переводом строки
+    """
+    while position < len(data):
+        end = data.find(b'\n', position)
+        end = len(data) if end < 0 else end + 1
+        cursor[0] = end
+        yield data[position:end].decode('utf-8')
+        position = end
+
+
+def column_picker(header, columns):
+    """
+    :param header: list - имена колонок таблицы
+    :param columns: list or None - нужные колонки (см. iter_csv)
+    :return: function or None - список значений строки -> значения columns в их порядке; None - нужны все колонки
+    """
+    if columns is None:
+        return None
+    picks = [header.index(name) if name in header else -1 for name in columns]
+    if len(picks) > 1 and max(picks) >= 0:
+        getter = itemgetter(*picks)
+        last = max(picks)
+
+        def pick(values):
+            if len(values) > last:
+                values.append('')  # колонки, которых нет в таблице (индекс -1), берутся из этой пустой ячейки
+                return list(getter(values))
+            return [values[idx] if 0 <= idx < len(values) else '' for idx in picks]
+        return pick
+    return lambda values: [values[idx] if 0 <= idx < len(values) else '' for idx in picks]
+
+
+def iter_books_from_csv(file_name, start=0, columns=BOOK_CSV_COLUMNS):
+    """
+    Потоковый вариант read_books_from_csv (см. iter_csv)
+    :param file_name: string - путь к таблице с книгами
+    :param start: int - смещение записи, с которой читать
+    :param columns: tuple - читаемые колонки (например, только ссылка и сравниваемые поля); остальные поля пустые
+    :return: generator - пары (смещение строки в байтах, Book)
+    """
+    projection = [name if name in columns else None for name in BOOK_CSV_COLUMNS]
+    for offset, row in iter_csv(file_name, projection, start):
+        yield offset, Book(*row)
+
+
+def iter_quotes_from_csv(file_name, start=0, columns=QUOTE_CSV_COLUMNS):
+    """
+    Потоковый вариант read_quotes_from_csv (см. iter_csv)
+    :param file_name: string - путь к таблице с цитатами
+    :param start: int - смещение записи, с которой читать
+    :param columns: tuple - читаемые колонки; остальные поля пустые
+    :return: generator - пары (смещение строки в байтах, Quote)
+    """
+    projection = [name if name in columns else None for name in QUOTE_CSV_COLUMNS]
+    for offset, (link, text, book_link, name, author) in iter_csv(file_name, projection, start):
+        yield offset, Quote(link, text, Book(book_link, '', name, author))
+
+
+def iter_links_from_csv(file_name, column='Link'):
+    """
+    Самый быстрый способ узнать, какие записи уже сохранены: из каждой строки читается только ссылка
+    :param file_name: string - путь к таблице
+    :param column: string - колонка со ссылкой ('Link' для книг, 'Quote link' для цитат)
+    :return: generator - ссылки в порядке строк таблицы
+    """
+    for _, (link,) in iter_csv(file_name, [column]):
+        yield link
 
 
 def convert_csv_to_books(cache):
@@ -52,3 +179,40 @@ def read_quotes_from_csv(file_name):
     :return: list - список классов Quote
     """
     return convert_csv_to_quotes(read_csv(file_name))
+
+
+def read_books_from_parquet(dir_path, user=None, columns=None):
+    """
+    Возвращает книги из архива parquet (см. csv_writer.ParquetBookWriter).
+    Если у книги в архиве несколько строк (сбой между записью новой версии и удалением старой, см.
+    ParquetBookWriter.drop_links), берется строка из самого нового файла
+    :param dir_path: string - путь к каталогу архива
+    :param user: string or None - читать только книги этого пользователя
+    :param columns: list or None - читаемые колонки (например, только 'Link'); остальные поля книг остаются пустыми
+    :return: list - список классов Book, по одному на ссылку у каждого пользователя
+    """
+    root = dir_path if user is None else os.path.join(dir_path, f'user={user}')
+    # читаются только файлы пользователя; скрытые файлы еще пишутся (или это служебные файлы)
+    files = [os.path.join(path, name) for path, _, names in os.walk(root)
+             for name in names if name.endswith('.parquet') and not name.startswith('.')]
+    if not files:
+        return []
+    import pyarrow as pa  # pyarrow нужен только для архивов parquet
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([('user', pa.string()), ('status', pa.string())]), flavor='hive')
+    # имена файлов part-<время записи в нс>-...: файлы читаются от старых к новым
+    files.sort(key=os.path.basename)
+    dataset = ds.dataset(files, format='parquet', partitioning=partitioning, partition_base_dir=dir_path)
+    read_columns = None if columns is None else list(dict.fromkeys(list(columns) + ['Link', 'user']))
+    table = dataset.to_table(columns=read_columns)
+
+    data = table.to_pydict()
+    size = table.num_rows
+    empty = [''] * size
+    latest = {}
+    for owner, name, author, status, rating, date, link in zip(
+            data.get('user', empty), data.get('Name', empty), data.get('Author', empty), data.get('status', empty),
+            data.get('My Rating', empty), data.get('Date', empty), data.get('Link', empty)):
+        latest[owner, link] = Book(link, status, name, author, rating, date)
+    return list(latest.values())
@@ -1,4 +1,5 @@
 import os
+import time
 
 
 def save_books(books, file_path):
@@ -14,6 +15,66 @@ def save_books(books, file_path):
             file.write(str(book) + '\n')
 
 
+def updated_book_line(line, book):
+    """
+    Подставляет в строку таблицы сравниваемые поля (статус, оценку, дату) новой версии книги,
+    сохраняя остальные поля как есть
+    :param line: bytes - строка таблицы вместе с переводом строки
+    :param book: Book - новая версия книги
+    :return: bytes or None - новая строка; None, если строка не относится к этой книге
+    """
+    body = line.rstrip(b'\r\n')
+    fields = body.decode('utf-8').split('\t')
+    if len(fields) != 6 or fields[5] != book.link:
+        return None
+    fields[2:5] = book.status, book.rating, book.date
+    return '\t'.join(fields).encode('utf-8') + line[len(body):]
+
+
+def update_books(books, file_path, locate=None):
+    """
+    Обновляет в таблице уже сохраненные книги, у которых изменились статус, оценка или дата.
+    Строка, новая версия которой занимает столько же байт, переписывается на месте (locate находит ее без
+    чтения таблицы); если хотя бы одна строка меняет длину, таблица переписывается одним проходом
+    через временный файл и атомарно подменяется
+    :param books: list - новые версии книг (классы Book)
+    :param file_path: string - путь к таблице
+    :param locate: function or None - ссылка -> смещение строки книги в таблице или None (см. LinkIndex.offset)
+    :return: tuple - список пар (смещение строки, книга), обновленных на месте, и была ли таблица переписана
+    """
+    from .journal import replace_durably
+
+    updates = {book.link: book for book in books}
+    in_place, moved = [], {}
+    with open(file_path, 'r+b') as file:
+        for book in updates.values():
+            offset = locate(book.link) if locate is not None else None
+            if offset is not None:
+                file.seek(offset)
+                line = file.readline()
+                new_line = updated_book_line(line, book)
+                if new_line is not None and len(new_line) == len(line):
+                    file.seek(offset)
+                    file.write(new_line)
+                    in_place.append((offset, book))
+                    continue
+            moved[book.link] = book
+        file.flush()
+        os.fsync(file.fileno())
+    if not moved:
+        return in_place, False
+
+    tmp = file_path + '.tmp'
+    with open(file_path, 'rb') as source, open(tmp, 'wb') as target:
+        target.write(source.readline())  # заголовок
+        for line in source:
+            link = line.rstrip(b'\r\n').rsplit(b'\t', 1)[-1].decode('utf-8')
+            new_line = updated_book_line(line, moved[link]) if link in moved else None
+            target.write(line if new_line is None else new_line)
+    replace_durably(tmp, file_path)
+    return [], True
+
+
 def save_quotes(quotes, file_path):
     """
     Дописываем в таблицу все цитаты из списка
@@ -25,3 +86,133 @@ def save_quotes(quotes, file_path):
             file.write('Name\tAuthor\tQuote text\tBook link\tQuote link\n')
         for quote in quotes:
             file.write(str(quote) + '\n')
+
+
+def is_parquet(file_path):
+    """
+    :param file_path: string - путь к таблице
+    :return: bool - является ли таблица архивом parquet (каталогом с файлами .parquet)
+    """
+    return file_path.endswith('.parquet')
+
+
+class ParquetBookWriter:
+    """
+    Дописывает книги в архив parquet. Архив - каталог, разбитый по пользователям и статусам
+    (user=<имя>/status=<статус>/part-*.parquet); каждый запуск добавляет по новому файлу на статус,
+    а каждая пачка книг становится в нем отдельной группой строк. Старые файлы переписываются, только
+    чтобы убрать прежние версии измененных книг (drop_links), так что у каждой книги в архиве одна строка.
+    Пока файл не закрыт, он скрыт (имя начинается с точки), поэтому прерванная запись не портит архив
+    """
+
+    def __init__(self, dir_path, user):
+        """
+        :param dir_path: string - путь к каталогу архива
+        :param user: string - имя пользователя
+        """
+        import pyarrow as pa  # pyarrow нужен только для архивов parquet
+
+        self.dir_path = dir_path
+        self.user = user
+        self.schema = pa.schema([('Name', pa.string()), ('Author', pa.dictionary(pa.int32(), pa.string())),
+                                 ('My Rating', pa.string()), ('Date', pa.string()), ('Link', pa.string())])
+        self.writers = {}
+        self.files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+    def write(self, books):
+        """
+        Записывает пачку книг
+        :param books: list - список книг (классов Book)
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        by_status = {}
+        for book in books:
+            by_status.setdefault(book.status, []).append(book)
+        for status, group in by_status.items():
+            if status not in self.writers:
+                part_dir = os.path.join(self.dir_path, f'user={self.user}', f'status={status}')
+                os.makedirs(part_dir, exist_ok=True)
+                name = f'part-{time.time_ns()}-{os.urandom(4).hex()}.parquet'
+                hidden = os.path.join(part_dir, '.' + name)
+                self.writers[status] = (pq.ParquetWriter(hidden, self.schema, use_dictionary=['Author']), hidden,
+                                        os.path.join(part_dir, name))
+            table = pa.Table.from_pydict({'Name': [b.name for b in group], 'Author': [b.author for b in group],
+                                          'My Rating': [b.rating for b in group], 'Date': [b.date for b in group],
+                                          'Link': [b.link for b in group]}, schema=self.schema)
+            self.writers[status][0].write_table(table)
+
+    def close(self, commit=True):
+        """
+        Закрывает файлы и делает их видимыми
+        :param commit: bool - False, если запись прервана: тогда файлы удаляются
+        """
+        for writer, hidden, path in self.writers.values():
+            writer.close()
+            if commit:
+                os.replace(hidden, path)
+                self.files.append(path)
+            else:
+                os.remove(hidden)
+        self.writers = {}
+
+    def drop_links(self, links):
+        """
+        Удаляет строки книг с этими ссылками из файлов пользователя, записанных раньше: их новые версии
+        (книга сменила статус, оценку или дату) записаны этим писателем. Переписываются только файлы,
+        в которых такие строки есть, - каждый через скрытый временный файл с атомарной подменой
+        :param links: iterable - ссылки книг
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        value_set = pa.array(sorted(set(links)), pa.string())
+        if not len(value_set):
+            return
+        user_dir = os.path.join(self.dir_path, f'user={self.user}')
+        for root, _, names in os.walk(user_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                if path in self.files or name.startswith('.') or not name.endswith('.parquet'):
+                    continue
+                if not pc.any(pc.is_in(pq.ParquetFile(path).read(columns=['Link'])['Link'],
+                                       value_set=value_set)).as_py():
+                    continue
+                table = pq.ParquetFile(path).read()
+                kept = table.filter(pc.invert(pc.is_in(table['Link'], value_set=value_set)))
+                if kept.num_rows == 0:
+                    os.remove(path)
+                    continue
+                hidden = os.path.join(root, '.' + name)
+                pq.write_table(kept, hidden, use_dictionary=['Author'])
+                os.replace(hidden, path)
+
+    def drop_other_files(self):
+        """
+        Удаляет файлы пользователя, записанные не этим писателем (перезапись архива в режиме rewrite_all)
+        """
+        user_dir = os.path.join(self.dir_path, f'user={self.user}')
+        for root, _, names in os.walk(user_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                if path not in self.files and name.endswith('.parquet'):
+                    os.remove(path)
+
+
+def save_books_parquet(books, dir_path, user):
+    """
+    Дописываем в архив parquet все книги из списка (одним новым файлом на статус)
+    :param books: list - список книг (классов Book)
+    :param dir_path: string - путь к каталогу архива
+    :param user: string - имя пользователя
+    """
+    with ParquetBookWriter(dir_path, user) as writer:
+        writer.write(books)
@@ -0,0 +1,120 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# страница готова, как только появился список книг, лента цитат или служебная страница:
+# пары (способ поиска силениума, значение)
+READY_ELEMENTS = (
+    ('id', 'booklist'),
+    ('tag name', 'article'),
+    ('class name', 'with-pad'),
+    ('class name', 'page-404'),
+)
+
+# картинки, шрифты и стили для разбора не нужны
+BLOCKED_URLS = ['*.css', '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+                '*.woff', '*.woff2', '*.ttf', '*.otf']
+
+
+def make_chrome():
+    """
+    Запускает Chrome без окна, не загружающий картинки, шрифты и стили
+    :return: webdriver.Chrome
+    """
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    # не ждать загрузки подресурсов: готовность страницы проверяется по READY_ELEMENTS
+    options.page_load_strategy = 'eager'
+    driver = webdriver.Chrome(options=options)
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URLS})
+    return driver
+
+
+def wait_until_ready(driver, timeout=60):
+    """
+    Ждет, пока на открытой странице появится один из READY_ELEMENTS
+    :param driver: драйвер силениума
+    :param timeout: int - сколько секунд ждать
+    """
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.wait import WebDriverWait
+
+    WebDriverWait(driver, timeout).until(
+        EC.any_of(*(EC.presence_of_element_located(locator) for locator in READY_ELEMENTS)))
+
+
+class DriverPool:
+    """
+    Пул браузеров силениума. Браузеры запускаются по мере надобности (не больше size), каждый в один момент
+    времени загружает одну страницу, поэтому пул можно использовать из нескольких потоков
+    """
+
+    def __init__(self, size=1, factory=make_chrome, timeout=60):
+        """
+        :param size: int - сколько браузеров может работать одновременно
+        :param factory: function - запускает новый браузер
+        :param timeout: int - сколько секунд ждать готовности страницы
+        """
+        self.size = max(1, size)
+        self.factory = factory
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.drivers = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self):
+        """
+        Выдает свободный браузер, при необходимости запуская новый или дожидаясь освобождения занятого
+        :return: context manager - драйвер силениума
+        """
+        try:
+            driver = self.idle.get_nowait()
+        except queue.Empty:
+            driver = None
+            with self.lock:
+                if len(self.drivers) < self.size:
+                    driver = self.factory()
+                    self.drivers.append(driver)
+            if driver is None:
+                driver = self.idle.get()
+        try:
+            yield driver
+        finally:
+            self.idle.put(driver)
+
+    def download(self, link):
+        """
+        Загружает страницу в свободном браузере
+        :param link: string - ссылка на страницу
+        :return: string or None - тело страницы, None, если страница не дождалась готовности
+        """
+        with self.acquire() as driver:
+            driver.get(link)
+            try:
+                wait_until_ready(driver, self.timeout)
+                return driver.page_source
+            except Exception as e:
+                logger.error(f'Some error erupted during selenium processing: {e}')
+                return None
+
+    def close(self):
+        """
+        Закрывает все запущенные браузеры
+        """
+        with self.lock:
+            for driver in self.drivers:
+                try:
+                    driver.quit()
+                except Exception as e:
+                    logger.error(f'Could not close the browser: {e}')
+            self.drivers.clear()
+        self.idle = queue.LifoQueue()
@@ -0,0 +1,223 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bodies (
+    digest TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+CREATE INDEX IF NOT EXISTS responses_digest ON responses (digest);
+'''
+# через сколько сохраненных ответов кэш снова проверяется на max_size во время запуска
+EVICT_EVERY = 100
+
+
+def is_bot_page(body) -> bool:
+    """
+    Проверяет, что сайт вместо страницы отдал заглушку для ботов (см. livelib_parser.is_redirecting_page)
+    :param body: bytes - тело ответа
+    :return: bool
+    """
+    return b'"page-404"' in body
+
+
+class CacheMissError(LookupError):
+    """Страницы нет в кэше, а ходить в сеть запрещено (режим offline)"""
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    body: bytes
+    etag: str = None
+    last_modified: str = None
+    fetched_at: float = 0.0
+
+
+class HttpCache:
+    """
+    Дисковый кэш ответов в SQLite. Тела хранятся по хэшу содержимого, так что одинаковые страницы
+    (например, пустые последние страницы списков) занимают место один раз
+    """
+
+    def __init__(self, path, ttl=0, max_age=30 * 24 * 3600, max_size=None, offline=False):
+        """
+        :param path: string - путь к файлу базы
+        :param ttl: float - сколько секунд ответ считается свежим и отдается без обращения к сайту
+        :param max_age: float - ответы, не подтвержденные сайтом дольше этого срока, удаляются
+        :param max_size: int or None - ограничение суммарного размера тел в байтах (вытесняются давно не читанные)
+        :param offline: bool - отдавать только то, что уже есть в кэше, не обращаясь к сайту
+        """
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_size = max_size
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.puts = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self.evict()
+
+    def get(self, url):
+        """
+        Возвращает сохраненный ответ
+        :param url: string - ссылка на страницу
+        :return: CacheEntry or None
+        """
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT r.etag, r.last_modified, r.fetched_at, b.body FROM responses r '
+                'JOIN bodies b ON b.digest = r.digest WHERE r.url = ?', (url,)).fetchone()
+            if row is None:
+                return None
+            with self.conn:
+                self.conn.execute('UPDATE responses SET accessed_at = ? WHERE url = ?', (time.time(), url))
+        etag, last_modified, fetched_at, body = row
+        return CacheEntry(url, body, etag, last_modified, fetched_at)
+
+    def fresh(self, url):
+        """
+        Возвращает тело ответа, если его можно отдать без обращения к сайту (попадание учитывается);
+        промахи и устаревшие ответы учитывает is_usable при загрузке
+        :param url: string - ссылка на страницу
+        :return: bytes or None
+        :raise CacheMissError: если страницы нет в кэше в режиме offline
+        """
+        entry = self.get(url)
+        if entry is None:
+            if self.offline:
+                raise CacheMissError(f'{url} is not cached')
+            return None
+        if self.offline or time.time() - entry.fetched_at < self.ttl:
+            with self.lock:
+                self.hits += 1
+            return entry.body
+        return None
+
+    def is_usable(self, entry, url=None) -> bool:
+        """
+        Проверяет, можно ли отдать ответ без обращения к сайту
+        :param entry: CacheEntry or None
+        :param url: string - ссылка (для сообщения об ошибке)
+        :return: bool
+        """
+        if entry is None:
+            if self.offline:
+                raise CacheMissError(f'{url} is not cached')
+            with self.lock:  # счетчики меняются из потоков загрузки
+                self.misses += 1
+            return False
+        if self.offline or time.time() - entry.fetched_at < self.ttl:
+            with self.lock:
+                self.hits += 1
+            return True
+        return False
+
+    @staticmethod
+    def revalidation_headers(entry):
+        """
+        Заголовки условного запроса для сохраненного ответа
+        :param entry: CacheEntry or None
+        :return: dict
+        """
+        headers = {}
+        if entry is not None and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def update(self, url, entry, status, body, headers):
+        """
+        Учитывает ответ сайта: 304 продлевает сохраненный ответ, успешный ответ сохраняется,
+        если это не заглушка для ботов (иначе она отдавалась бы из кэша до конца ttl)
+        :param url: string - ссылка на страницу
+        :param entry: CacheEntry or None - ответ, по которому делался условный запрос
+        :param status: int - код ответа
+        :param body: bytes - тело ответа
+        :param headers: заголовки ответа
+        :return: bytes - актуальное тело страницы
+        """
+        if status == 304 and entry is not None:
+            with self.lock, self.conn:
+                self.revalidated += 1
+                self.conn.execute('UPDATE responses SET fetched_at = ? WHERE url = ?', (time.time(), url))
+            return entry.body
+        if status == 200 and not is_bot_page(body):
+            self.put(url, body, headers.get('ETag'), headers.get('Last-Modified'))
+        return body
+
+    def put(self, url, body, etag=None, last_modified=None):
+        """
+        Сохраняет ответ. Каждые EVICT_EVERY ответов кэш вытесняет лишнее, чтобы уложиться в max_size
+        :param url: string - ссылка на страницу
+        :param body: bytes - тело ответа
+        :param etag: string or None
+        :param last_modified: string or None
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute('INSERT OR IGNORE INTO bodies (digest, body, size) VALUES (?, ?, ?)',
+                              (digest, body, len(body)))
+            self.conn.execute('INSERT OR REPLACE INTO responses (url, digest, etag, last_modified, fetched_at, '
+                              'accessed_at) VALUES (?, ?, ?, ?, ?, ?)', (url, digest, etag, last_modified, now, now))
+            self.puts += 1
+            due = self.max_size is not None and self.puts % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def size(self) -> int:
+        """
+        :return: int - суммарный размер сохраненных тел в байтах
+        """
+        with self.lock:
+            return self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM bodies').fetchone()[0]
+
+    def evict(self):
+        """
+        Удаляет устаревшие ответы, а затем давно не читанные, пока кэш не уложится в max_size
+        """
+        with self.lock, self.conn:
+            if self.max_age is not None:
+                self.conn.execute('DELETE FROM responses WHERE fetched_at < ?', (time.time() - self.max_age,))
+            self._drop_orphan_bodies()
+            if self.max_size is None:
+                return
+            total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM bodies').fetchone()[0]
+            rows = self.conn.execute('SELECT r.url, r.digest, b.size FROM responses r '
+                                     'JOIN bodies b ON b.digest = r.digest ORDER BY r.accessed_at').fetchall()
+            for url, digest, size in rows:
+                if total <= self.max_size:
+                    break
+                self.conn.execute('DELETE FROM responses WHERE url = ?', (url,))
+                if self.conn.execute('SELECT 1 FROM responses WHERE digest = ?', (digest,)).fetchone() is None:
+                    self.conn.execute('DELETE FROM bodies WHERE digest = ?', (digest,))
+                    total -= size
+
+    def _drop_orphan_bodies(self):
+        """
+        Удаляет тела, на которые не ссылается ни один ответ
+        """
+        self.conn.execute('DELETE FROM bodies WHERE digest NOT IN (SELECT digest FROM responses)')
+
+    def close(self):
+        self.evict()
+        self.conn.close()
@@ -0,0 +1,159 @@
+import json
+import os
+import struct
+import zlib
+
+from .checkpoint import item_to_dict, item_from_dict
+
+# сигнатура, длина данных и их crc32 перед каждой записью
+RECORD = struct.Struct('<4sII')
+MAGIC = b'LLJ1'
+# после скольких байт журнала изменения закрепляются в таблице, даже если запуск еще не закончен
+CHECKPOINT_BYTES = 4 * 1024 * 1024
+
+
+def fsync_file(path):
+    """
+    Сбрасывает файл на диск
+    :param path: string - путь к файлу
+    """
+    with open(path, 'rb') as file:
+        os.fsync(file.fileno())
+
+
+def fsync_dir(path):
+    """
+    Сбрасывает на диск каталог файла, чтобы переименование или создание файла пережило сбой питания
+    :param path: string - путь к файлу в каталоге
+    """
+    if os.name == 'nt':  # в Windows каталог нельзя открыть как файл
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def replace_durably(tmp, path):
+    """
+    Подменяет файл новой версией: она сначала целиком сбрасывается на диск, а затем атомарно переименовывается,
+    так что после сбоя на месте файла лежит либо старая, либо новая версия
+    :param tmp: string - путь к новой версии
+    :param path: string - путь к файлу
+    """
+    fsync_file(tmp)
+    os.replace(tmp, path)
+    fsync_dir(path)
+
+
+class Journal:
+    """
+    Журнал упреждающей записи таблицы (<таблица>.journal). Каждая пачка книг или цитат записывается в него
+    одной записью с контрольной суммой и сбрасывается на диск одним fsync до того, как попадет в таблицу.
+    Таблица на диск сбрасывается только в контрольных точках, после чего журнал очищается. После сбоя журнал
+    воспроизводится (см. export.recover_books, QuoteLoader.recover): недописанная запись в конце отбрасывается,
+    остальные применяются к таблице заново.
+    Записи бывают двух видов: 'add' - объекты дописаны в конец таблицы начиная с position,
+    'upsert' - объекты заменяют в таблице свои версии по ссылке (таблица переписывается целиком)
+    """
+
+    def __init__(self, path):
+        """
+        :param path: string - путь к файлу журнала
+        """
+        self.path = path
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def append(self, op, items, position=None):
+        """
+        Записывает пачку объектов и дожидается, пока она окажется на диске
+        :param op: string - 'add' или 'upsert'
+        :param items: list - классы Book или Quote
+        :param position: int or None - размер таблицы до дописывания пачки (для 'add')
+        """
+        payload = json.dumps({'op': op, 'position': position, 'items': [item_to_dict(item) for item in items]},
+                             ensure_ascii=False).encode('utf-8')
+        new = not os.path.exists(self.path)
+        with open(self.path, 'ab') as file:
+            file.write(RECORD.pack(MAGIC, len(payload), zlib.crc32(payload)) + payload)
+            file.flush()
+            os.fsync(file.fileno())
+        if new:
+            fsync_dir(self.path)
+
+    def records(self):
+        """
+        Читает записи журнала до первой поврежденной (недописанной при сбое)
+        :return: generator - тройки (вид записи, размер таблицы до нее, список объектов)
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as file:
+            while True:
+                head = file.read(RECORD.size)
+                if len(head) < RECORD.size:
+                    return
+                magic, length, crc = RECORD.unpack(head)
+                payload = file.read(length)
+                if magic != MAGIC or len(payload) < length or zlib.crc32(payload) != crc:
+                    return
+                record = json.loads(payload)
+                yield record['op'], record['position'], [item_from_dict(data) for data in record['items']]
+
+    def pending(self) -> bool:
+        """
+        :return: bool - есть ли в журнале записи, еще не закрепленные в таблице
+        """
+        return self.size > 0
+
+    def checkpoint(self, table):
+        """
+        Контрольная точка: таблица, к которой уже применены все записи журнала, сбрасывается на диск,
+        после чего журнал очищается
+        :param table: string - путь к таблице
+        """
+        if os.path.exists(table):
+            fsync_file(table)
+        self.clear()
+
+    def replay(self, table, append, update, appendable=True):
+        """
+        Переносит в таблицу записи журнала и очищает его. Дописанные пачки записываются заново с того места,
+        где началась первая из них (недописанный при сбое хвост таблицы отрезается), измененные объекты
+        передаются в update. В таблицу, которую нельзя дописать, все объекты переносятся через update
+        :param table: string - путь к таблице
+        :param append: function - дописывает объекты в конец таблицы: append(items, table)
+        :param update: function - заменяет в таблице версии объектов по ссылке: update(items)
+        :param appendable: bool - можно ли дописывать таблицу
+        :return: int - сколько объектов перенесено
+        """
+        records = list(self.records())
+        added = [(position, items) for op, position, items in records if op == 'add']
+        upserts = [item for op, _, items in records if op == 'upsert' for item in items]
+        appended = []
+        if added and appendable:
+            appended = [item for _, items in added for item in items]
+            position = added[0][0]
+            if os.path.exists(table) and os.path.getsize(table) > position:
+                with open(table, 'r+b') as file:
+                    file.truncate(position)
+            append(appended, table)
+            fsync_file(table)
+        else:
+            upserts = [item for _, items in added for item in items] + upserts
+        if upserts:
+            update(upserts)
+        self.clear()
+        return len(appended) + len(upserts)
+
+    def clear(self):
+        """
+        Очищает журнал: все его записи уже закреплены в таблице
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+            fsync_dir(self.path)
@@ -0,0 +1,229 @@
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from operator import attrgetter
+
+# сигнатура, версия формата и порядок байт: файл создается и читается на одной машине
+MAGIC = b'LLIX1' + sys.byteorder[0].encode() + b'\0\0'
+# сигнатура, число записей, размер и время изменения таблицы, по которой построен индекс
+HEADER = struct.Struct('=8sQQQ')
+
+
+def link_hash(link) -> int:
+    """
+    :param link: string - ссылка на книгу или цитату
+    :return: int - 64-битный хэш ссылки
+    """
+    return int.from_bytes(hashlib.blake2b(link.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def fields_digest(item, fields) -> int:
+    """
+    :param item: Book or Quote
+    :param fields: tuple - имена сравниваемых полей (см. merge.BOOK_FIELDS)
+    :return: int - 64-битный хэш значений полей
+    """
+    values = '\x1f'.join(map(str, attrgetter(*fields)(item))) if len(fields) > 1 else str(getattr(item, fields[0]))
+    return int.from_bytes(hashlib.blake2b(values.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def source_stamp(source):
+    """
+    :param source: string - путь к таблице
+    :return: tuple - размер и время изменения таблицы в наносекундах, (0, 0) если таблицы нет
+    """
+    try:
+        stat = os.stat(source)
+    except FileNotFoundError:
+        return 0, 0
+    return stat.st_size, stat.st_mtime_ns
+
+
+class LinkIndex:
+    """
+    Индекс сохраненных записей в файле рядом с таблицей (<таблица>.idx): отсортированные хэши ссылок,
+    хэши сравниваемых полей и смещения строк в таблице. Файл отображается в память (mmap) и ищется бинарным
+    поиском, поэтому проверка "запись уже сохранена?" не требует читать таблицу и создавать объекты Book и Quote.
+    Для сравнения (см. merge.iter_merge) get отдает вместо сохраненного объекта хэш его полей, а сам объект
+    при необходимости читается из таблицы по смещению (index[link]).
+    Записи, дописанные в таблицу во время запуска, держатся в памяти до save
+    """
+
+    def __init__(self, source, fields, read_rows, index_rows=None):
+        """
+        :param source: string - путь к таблице
+        :param fields: tuple - сравниваемые поля записей
+        :param read_rows: function - (путь, смещение) -> генератор пар (смещение строки, объект) с этого места таблицы
+        :param index_rows: function or None - то же, но объекты могут быть заполнены только ссылкой и полями fields
+        (используется для построения индекса), None - read_rows
+        """
+        self.source = source
+        self.path = source + '.idx'
+        self.fields = fields
+        self.read_rows = read_rows
+        self.index_rows = index_rows or read_rows
+        self.mmap = None
+        self.keys = self.digests = self.offsets = memoryview(b'').cast('Q')
+        self.added = {}
+
+    def load(self) -> bool:
+        """
+        Открывает файл индекса
+        :return: bool - удалось ли: файл есть и построен по текущей версии таблицы
+        """
+        self.close()
+        try:
+            with open(self.path, 'rb') as file:
+                if os.fstat(file.fileno()).st_size < HEADER.size:
+                    return False
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return False
+        magic, count, size, mtime = HEADER.unpack_from(mapped)
+        if magic != MAGIC or (size, mtime) != source_stamp(self.source) or \
+                len(mapped) != HEADER.size + 3 * 8 * count:
+            mapped.close()
+            return False
+        self.mmap = mapped
+        view = memoryview(mapped)[HEADER.size:].cast('Q')
+        self.keys, self.digests, self.offsets = view[:count], view[count:2 * count], view[2 * count:]
+        view.release()
+        return True
+
+    def rebuild(self):
+        """
+        Перестраивает индекс, один раз прочитав таблицу строка за строкой
+        """
+        self.close()
+        self.added = {}
+        self.extend(self.index_rows(self.source, 0))
+        self.save()
+
+    def extend(self, rows):
+        """
+        Добавляет записи, дописанные в таблицу (более поздняя строка с той же ссылкой заменяет прежнюю)
+        :param rows: iterable - пары (смещение строки, объект)
+        """
+        for offset, item in rows:
+            self.added[link_hash(item.link)] = (fields_digest(item, self.fields), offset)
+
+    def extend_from(self, position):
+        """
+        Добавляет записи, дописанные в таблицу начиная с position
+        :param position: int - размер таблицы до дописывания
+        """
+        self.extend(self.index_rows(self.source, position))
+
+    def save(self):
+        """
+        Сохраняет индекс вместе с добавленными записями и отметкой текущей версии таблицы
+        """
+        # слияние двух отсортированных последовательностей: участки файла между добавленными записями копируются целиком
+        keys, digests, offsets = array('Q'), array('Q'), array('Q')
+        added = sorted(self.added.items())
+        if not len(self.keys):  # новый индекс: сливать не с чем
+            keys.extend(key for key, _ in added)
+            digests.extend(digest for _, (digest, _) in added)
+            offsets.extend(offset for _, (_, offset) in added)
+            added = []
+        start = 0
+        for key, (digest, offset) in added:
+            end = bisect.bisect_left(self.keys, key, start)
+            for column, view in ((keys, self.keys), (digests, self.digests), (offsets, self.offsets)):
+                column.frombytes(view[start:end].cast('B'))
+            start = end + 1 if end < len(self.keys) and self.keys[end] == key else end
+            keys.append(key)
+            digests.append(digest)
+            offsets.append(offset)
+        for column, view in ((keys, self.keys), (digests, self.digests), (offsets, self.offsets)):
+            column.frombytes(view[start:].cast('B'))
+        self.close()
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, len(keys), *source_stamp(self.source)))
+            for column in (keys, digests, offsets):
+                column.tofile(file)
+        os.replace(tmp, self.path)
+        self.added = {}
+        self.load()
+
+    def find(self, key):
+        """
+        :param key: int - хэш ссылки
+        :return: int - номер записи в файле индекса или -1
+        """
+        idx = bisect.bisect_left(self.keys, key)
+        return idx if idx < len(self.keys) and self.keys[idx] == key else -1
+
+    def entry(self, link):
+        """
+        :param link: string - ссылка
+        :return: tuple or None - хэш полей и смещение строки в таблице
+        """
+        key = link_hash(link)
+        if key in self.added:
+            return self.added[key]
+        idx = self.find(key)
+        return (self.digests[idx], self.offsets[idx]) if idx >= 0 else None
+
+    def offset(self, link):
+        """
+        :param link: string - ссылка
+        :return: int or None - смещение строки записи в таблице
+        """
+        entry = self.entry(link)
+        return None if entry is None else entry[1]
+
+    def get(self, link, default=None):
+        """
+        :param link: string - ссылка
+        :return: int or default - хэш сравниваемых полей сохраненной записи
+        """
+        entry = self.entry(link)
+        return default if entry is None else entry[0]
+
+    def __getitem__(self, link):
+        """
+        Читает сохраненную запись из таблицы
+        :param link: string - ссылка
+        :return: Book or Quote
+        """
+        entry = self.entry(link)
+        if entry is None:
+            raise KeyError(link)
+        return next(self.read_rows(self.source, entry[1]))[1]
+
+    def __contains__(self, link):
+        return self.entry(link) is not None
+
+    def __len__(self):
+        return len(self.keys) + sum(1 for key in self.added if self.find(key) < 0)
+
+    def close(self):
+        for view in (self.keys, self.digests, self.offsets):
+            view.release()
+        self.keys = self.digests = self.offsets = memoryview(b'').cast('Q')
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+
+
+def open_link_index(source, fields, read_rows, index_rows=None):
+    """
+    Открывает индекс таблицы, перестраивая его, если он устарел (таблица изменилась после его записи) или его нет
+    :param source: string - путь к таблице
+    :param fields: tuple - сравниваемые поля записей
+    :param read_rows: function - см. LinkIndex
+    :param index_rows: function or None - см. LinkIndex
+    :return: LinkIndex or dict - пустой словарь, если таблицы еще нет
+    """
+    if not os.path.exists(source):
+        return {}
+    index = LinkIndex(source, fields, read_rows, index_rows)
+    if not index.load():
+        index.rebuild()
+    return index
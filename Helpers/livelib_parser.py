@@ -1,7 +1,12 @@
+import logging
 import re
 from collections import defaultdict
 from lxml import etree
 
+from . import xpaths
+
+logger = logging.getLogger(__name__)
+
 
 def error_handler(where, raw):
     """
@@ -10,7 +15,6 @@ def error_handler(where, raw):
     :param raw: html-узел
     :return: None
     """
-    from export import logger
     logger.error(f'ERROR: Parsing error ({where} not parsed): {etree.tostring(raw)}')
     return None
 
@@ -44,7 +48,7 @@ def is_last_page(page):
     :param page: страница
     :return: bool
     """
-    return bool(len(page.xpath('//div[@class="with-pad"]')))
+    return bool(len(xpath_all(page, xpaths.LAST_PAGE)))
 
 
 def is_redirecting_page(page):
@@ -53,13 +57,26 @@ def is_redirecting_page(page):
     :param page: страница
     :return: bool
     """
-    flag = bool(len(page.xpath('//div[@class="page-404"]')))
+    flag = bool(len(xpath_all(page, xpaths.REDIRECT_PAGE)))
     if flag:
         print('ERROR: Oops! Livelib suspects that you are a bot! Reading stopped.')
         print()
     return flag
 
 
+def page_end(page):
+    """
+    Проверяет, не закончился ли на этой странице обход списка
+    :param page: страница
+    :return: string or None - 'last' для последней страницы, 'redirect' для перенаправляющей, None для обычной
+    """
+    if is_last_page(page):
+        return 'last'
+    if is_redirecting_page(page):
+        return 'redirect'
+    return None
+
+
 def href_i(href, i):
     """
     Возвращает ссылку на i-ую страницу данного типа
@@ -76,7 +93,7 @@ def date_parser(date):
     :param date: string
     :return: string or None
     """
-    m = re.search('\d{4} г.', date)
+    m = re.search(r'\d{4} г.', date)
     if m is not None:
         year = m.group(0).split(' ')[0]
         raw_month = date.split(' ')[0]
@@ -85,17 +102,29 @@ def date_parser(date):
     return None
 
 
+def xpath_all(html_node, request):
+    """
+    Обертка над xpath. Возвращает все найденные узлы
+    :param html_node: html-узел
+    :param request: etree.XPath or string - скомпилированный (см. Helpers.xpaths) или строковый xpath запрос
+    :return: list - найденные узлы
+    """
+    if isinstance(request, etree.XPath):
+        return request(html_node)
+    return html_node.xpath(request)
+
+
 def handle_xpath(html_node, request, i=0):
     """
     Обертка над xpath. Возвращает i-ый найденный узел. Если он не нашелся, то возвращается None
     :param html_node: html-узел
-    :param request: string - xpath запрос
+    :param request: etree.XPath or string - скомпилированный (см. Helpers.xpaths) или строковый xpath запрос
     :param i: int - индекс (по дефолту 0)
     :return: нужный html-узел или None
     """
     if html_node is None:
         return None
-    tmp = html_node.xpath(request)
+    tmp = xpath_all(html_node, request)
     return tmp[i] if i < len(tmp) else None
 
 
@@ -0,0 +1,178 @@
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+from .link_index import fields_digest
+
+BOOK_FIELDS = ('status', 'rating', 'date')
+QUOTE_FIELDS = ('text',)
+
+
+@dataclass
+class MergeResult:
+    added: list = field(default_factory=list)
+    changed: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+
+
+def build_index(items):
+    """
+    Строит индекс объектов по их (уже нормализованной) ссылке
+    :param items: iterable - книги или цитаты (классы Book или Quote)
+    :return: dict - словарь ссылка -> объект
+    """
+    return {item.link: item for item in items}
+
+
+def is_changed(old, new, fields):
+    """
+    Проверяет, отличается ли объект от своей сохраненной версии хотя бы в одном из полей
+    :param old: Book, Quote or int - сохраненная версия или хэш ее полей (из LinkIndex)
+    :param new: Book or Quote - свежая версия
+    :param fields: tuple - имена сравниваемых полей
+    :return: bool
+    """
+    if isinstance(old, int):
+        return old != fields_digest(new, fields)
+    return any(getattr(old, name) != getattr(new, name) for name in fields)
+
+
+def iter_merge(index, new_data, fields=BOOK_FIELDS, changed=None, seen=None):
+    """
+    Потоковое сравнение: по одному разбирает свежие объекты и отдает новые, не накапливая их
+    :param index: dict or LinkIndex - индекс сохраненных объектов (см. build_index)
+    :param new_data: iterable - свежие объекты, дубликаты по ссылке отбрасываются
+    :param fields: tuple - поля, изменение которых считается изменением объекта
+    :param changed: list or None - список, в который складываются измененные объекты
+    :param seen: set or None - множество, в которое складываются ссылки просмотренных объектов
+    :return: generator - объекты, которых нет в индексе
+    """
+    seen = set() if seen is None else seen
+    for new in new_data:
+        if new.link in seen:
+            continue
+        seen.add(new.link)
+
+        old = index.get(new.link)
+        if old is None:
+            yield new
+        elif changed is not None and is_changed(old, new, fields):
+            changed.append(new)
+
+
+def merge_items(old_data, new_data, fields=BOOK_FIELDS):
+    """
+    Сравнивает сохраненные и свежие объекты за линейное время, используя индекс по ссылке
+    :param old_data: list or Mapping - сохраненные объекты или уже построенный индекс (см. build_index)
+    :param new_data: iterable - свежие объекты, дубликаты по ссылке отбрасываются
+    :param fields: tuple - поля, изменение которых считается изменением объекта
+    :return: MergeResult - добавленные, измененные и пропавшие объекты (в порядке появления)
+    """
+    index = old_data if isinstance(old_data, Mapping) else build_index(old_data)
+    result = MergeResult()
+    seen = set()
+    result.added = list(iter_merge(index, new_data, fields, result.changed, seen))
+    result.removed = [old for link, old in index.items() if link not in seen]
+    return result
+
+
+def has_news(items, index, fields=BOOK_FIELDS):
+    """
+    Проверяет, есть ли среди объектов новые или измененные относительно индекса
+    :param items: iterable - книги или цитаты
+    :param index: dict - индекс сохраненных объектов (см. build_index)
+    :param fields: tuple - поля, изменение которых считается изменением объекта
+    :return: bool
+    """
+    for item in items:
+        old = index.get(item.link)
+        if old is None or is_changed(old, item, fields):
+            return True
+    return False
+
+
+class StalePageCounter:
+    """
+    Считает идущие подряд страницы, на которых нет ничего нового. Нужен, чтобы прекратить обход списка,
+    когда дальше идут только уже сохраненные объекты
+    """
+
+    def __init__(self, index, limit, fields=BOOK_FIELDS):
+        """
+        :param index: dict or None - индекс сохраненных объектов; без него обход не прерывается
+        :param limit: int - после скольких страниц подряд без нового остановиться (0 - не останавливаться)
+        :param fields: tuple - поля, изменение которых считается изменением объекта
+        """
+        self.index = index
+        self.limit = limit
+        self.fields = fields
+        self.stale_pages = 0
+
+    def feed(self, items) -> bool:
+        """
+        Учитывает очередную страницу
+        :param items: list - объекты со страницы
+        :return: bool - пора ли остановить обход
+        """
+        if self.index is None or self.limit <= 0:
+            return False
+        if has_news(items, self.index, self.fields):
+            self.stale_pages = 0
+        else:
+            self.stale_pages += 1
+        return self.stale_pages >= self.limit
+
+
+class PageWalk:
+    """
+    Учет обхода одного списка, общий для синхронной и асинхронной загрузки: журнал обхода (Checkpoint)
+    и остановка на страницах без нового (StalePageCounter). Загрузчик только подает ему разобранные страницы
+    """
+
+    def __init__(self, checkpoint, index, limit, fields=BOOK_FIELDS):
+        """
+        :param checkpoint: Checkpoint or None - журнал обхода
+        :param index: dict or None - индекс сохраненных объектов (см. StalePageCounter)
+        :param limit: int - после скольких страниц подряд без нового остановиться
+        :param fields: tuple - сравниваемые поля объектов
+        """
+        self.checkpoint = checkpoint
+        self.stale = StalePageCounter(index, limit, fields)
+
+    @property
+    def start(self) -> int:
+        """
+        :return: int - номер первой страницы, которую нужно загрузить
+        """
+        return 1 if self.checkpoint is None else self.checkpoint.page + 1
+
+    @property
+    def done(self) -> bool:
+        """
+        :return: bool - список уже пройден до конца прошлым запуском
+        """
+        return self.checkpoint is not None and self.checkpoint.done
+
+    def restored(self):
+        """
+        :return: iterable - объекты с уже пройденных страниц, в порядке обхода
+        """
+        return () if self.checkpoint is None else self.checkpoint.items()
+
+    def add(self, idx, items) -> bool:
+        """
+        Отмечает страницу пройденной
+        :param idx: int - номер страницы
+        :param items: list - объекты со страницы
+        :return: bool - пора ли остановить обход
+        """
+        if self.checkpoint is not None:
+            self.checkpoint.add(idx, items)
+        return self.stale.feed(items)
+
+    def finish(self):
+        """
+        Отмечает, что список пройден (до конца или до остановки)
+        """
+        if self.checkpoint is not None:
+            self.checkpoint.finish()
+
@@ -0,0 +1,247 @@
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+# границы корзин гистограммы времени этапа, секунды
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# границы корзин гистограммы числа записей на странице
+ITEMS_BUCKETS = (0, 1, 5, 10, 20, 30, 50, 100)
+
+# этапы, которые считаются работой (остальное время потоки ждут или спят)
+WORK_STAGES = ('download', 'parse_html', 'parse_books', 'parse_quotes', 'parse_pool', 'merge', 'write')
+
+
+class Histogram:
+    """
+    Гистограмма с постоянными корзинами: хранит только счетчики, поэтому не растет с числом наблюдений
+    """
+
+    def __init__(self, bounds):
+        """
+        :param bounds: tuple - верхние границы корзин по возрастанию (последняя корзина - до бесконечности)
+        """
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q) -> float:
+        """
+        Оценивает квантиль линейной интерполяцией внутри корзины
+        :param q: float - уровень от 0 до 1
+        :return: float
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                low = self.bounds[idx - 1] if idx else 0.0
+                high = self.bounds[idx] if idx < len(self.bounds) else self.max
+                return min(self.max, low + (high - low) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else 0.0,
+            'p50': round(self.quantile(0.5), 6),
+            'p95': round(self.quantile(0.95), 6),
+            'max': round(self.max, 6),
+        }
+
+
+class Metrics:
+    """
+    Потокобезопасный сборщик метрик обхода: гистограммы времени этапов (загрузка, разбор, сравнение, запись,
+    пауза перед запросом), гистограмма записей на странице и счетчики (страницы, байты, попадания в кэш).
+    В конце запуска сводка пишется в json, а при необходимости - в текстовый файл для Prometheus
+    """
+
+    # гистограммы, которые измеряются не в секундах
+    SIZES = {'items_per_page': ITEMS_BUCKETS}
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name, value):
+        """
+        Добавляет наблюдение в гистограмму
+        :param name: string - этап (время в секундах) или одна из SIZES
+        :param value: float
+        """
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.SIZES.get(name, SECONDS_BUCKETS))
+            histogram.add(value)
+
+    def count(self, name, value=1):
+        """
+        Увеличивает счетчик
+        :param name: string - имя счетчика
+        :param value: int
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def measure(self, stage):
+        """
+        Записывает в гистограмму этапа время выполнения блока (в том числе завершившегося ошибкой)
+        :param stage: string - этап
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def summary(self):
+        """
+        :return: dict - сводка: время этапов, счетчики и производные показатели
+        """
+        with self.lock:
+            stages = {name: h.to_dict() for name, h in sorted(self.histograms.items()) if name not in self.SIZES}
+            sizes = {name: h.to_dict() for name, h in sorted(self.histograms.items()) if name in self.SIZES}
+            counters = dict(sorted(self.counters.items()))
+        sleep = stages.get('sleep', {}).get('sum', 0.0)
+        work = sum(stages[stage]['sum'] for stage in WORK_STAGES if stage in stages)
+        downloads = stages.get('download', {}).get('count', 0)
+        cached = counters.get('cache_hits', 0) + counters.get('cache_revalidated', 0)
+        return {
+            'wall_seconds': round(time.monotonic() - self.started, 3),
+            # суммы по всем потокам, поэтому при нескольких потоках могут превышать wall_seconds
+            'sleep_seconds': round(sleep, 3),
+            'work_seconds': round(work, 3),
+            'sleep_share': round(sleep / (sleep + work), 3) if sleep + work else 0.0,
+            'cache_hit_ratio': round(cached / downloads, 3) if downloads else 0.0,
+            'stages': stages,
+            **sizes,
+            'counters': counters,
+        }
+
+    def write_json(self, path):
+        """
+        Сохраняет сводку в json
+        :param path: string - путь к файлу
+        """
+        write_atomic(path, json.dumps(self.summary(), ensure_ascii=False, indent=2) + '\n')
+
+    def to_prometheus(self, openmetrics=False, prefix='livelib'):
+        """
+        Текстовое представление метрик в формате Prometheus или OpenMetrics
+        :param openmetrics: bool - формат OpenMetrics (завершается # EOF)
+        :param prefix: string - префикс имен метрик
+        :return: string
+        """
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def buckets(name, label, histogram):
+            total = 0
+            for bound, count in zip(histogram.bounds + (math.inf,), histogram.counts):
+                total += count
+                le = 'le="%s"' % ('+Inf' if bound == math.inf else repr(float(bound)))
+                lines.append(f'{name}_bucket{{{label + "," if label else ""}{le}}} {total}')
+            label = f'{{{label}}}' if label else ''
+            lines.append(f'{name}_sum{label} {histogram.sum!r}')
+            lines.append(f'{name}_count{label} {histogram.count}')
+
+        stages = [(name, h) for name, h in histograms if name not in self.SIZES]
+        if stages:
+            family(f'{prefix}_stage_seconds', 'histogram', 'Time spent in a crawl stage.')
+            for name, histogram in stages:
+                buckets(f'{prefix}_stage_seconds', f'stage="{name}"', histogram)
+        for name, histogram in histograms:
+            if name in self.SIZES:
+                family(f'{prefix}_{name}', 'histogram', f'Distribution of {name.replace("_", " ")}.')
+                buckets(f'{prefix}_{name}', '', histogram)
+        for name, value in counters:
+            # в OpenMetrics семейство счетчика называется без _total, а в Prometheus - как сам отсчет
+            family(f'{prefix}_{name}' if openmetrics else f'{prefix}_{name}_total', 'counter',
+                   f'Total {name.replace("_", " ")}.')
+            lines.append(f'{prefix}_{name}_total {value}')
+        family(f'{prefix}_run_seconds', 'gauge', 'Wall time of the run so far.')
+        lines.append(f'{prefix}_run_seconds {time.monotonic() - self.started:.3f}')
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, openmetrics=False):
+        """
+        Сохраняет метрики в текстовый файл (например, для textfile collector у node_exporter)
+        :param path: string - путь к файлу
+        :param openmetrics: bool - формат OpenMetrics вместо Prometheus
+        """
+        write_atomic(path, self.to_prometheus(openmetrics))
+
+
+def write_atomic(path, text):
+    """
+    Записывает файл целиком через временный, чтобы читатель никогда не увидел его наполовину записанным
+    :param path: string - путь к файлу
+    :param text: string - содержимое
+    """
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as file:
+        file.write(text)
+    os.replace(tmp, path)
+
+
+def merged_batches(metrics, items, merge, batch_size):
+    """
+    Разбивает результат сравнения на пачки, записывая в этап merge собственное время сравнения -
+    без времени загрузки и разбора страниц, которое уходит на получение очередного объекта из items
+    :param metrics: Metrics or None
+    :param items: iterable - свежие объекты
+    :param merge: function - iterable свежих объектов -> iterable новых (например, iter_merge с индексом)
+    :param batch_size: int - размер пачки
+    :return: generator - списки длиной не больше batch_size
+    """
+    upstream = [0.0]
+
+    def timed(iterator):
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                upstream[0] += time.perf_counter() - started
+            yield item
+
+    merged = iter(merge(timed(iter(items)) if metrics is not None else items))
+    while True:
+        started, before = time.perf_counter(), upstream[0]
+        batch = list(islice(merged, batch_size))
+        if metrics is not None:
+            metrics.observe('merge', time.perf_counter() - started - (upstream[0] - before))
+        if not batch:
+            return
+        yield batch
@@ -1,29 +1,218 @@
+import logging
+
 import requests
-from selenium.webdriver.support.wait import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+from .driver_pool import DriverPool, wait_until_ready
+
+logger = logging.getLogger(__name__)
+
+# br добавляется в ACCEPT_ENCODING только если установлен brotli, иначе сжатый ответ нечем было бы распаковать
+DEFAULT_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
+    'Connection': 'keep-alive',
+}
 
+_default_downloader = None
 
-def download_page(link, driver=None) -> str or None:
+
+class SiteBusyError(Exception):
+    """
+    Сайт просит сбавить темп: ответил 429 или ошибкой сервера (5xx)
+    """
+
+    def __init__(self, link, status, retry_after=None):
+        super().__init__(f'{link} answered {status}')
+        self.link = link
+        self.status = status
+        self.retry_after = retry_after
+
+
+def check_status(link, status, headers):
+    """
+    Проверяет код ответа
+    :param link: string - ссылка на страницу
+    :param status: int - код ответа
+    :param headers: заголовки ответа
+    :raise SiteBusyError: на 429 и 5xx
+    """
+    if status == 429 or status >= 500:
+        retry_after = headers.get('Retry-After')
+        raise SiteBusyError(link, status, float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+
+class PageDownloader:
+    """
+    Загрузчик страниц поверх requests.Session: переиспользует TCP/TLS соединения к livelib.ru
+    """
+
+    def __init__(self, pool_size=10, headers=None, timeout=60, cache=None, per_host=None):
+        """
+        :param pool_size: int - сколько соединений к одному хосту держать открытыми
+        :param headers: dict - заголовки, дополняющие DEFAULT_HEADERS
+        :param timeout: int - таймаут запроса в секундах
+        :param cache: HttpCache or None - дисковый кэш ответов
+        :param per_host: int or None - сколько запросов к одному хосту может идти одновременно;
+        остальные ждут освобождения соединения (по умолчанию не ограничено)
+        """
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        if per_host:
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=per_host, pool_block=True)
+        else:
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.session.headers.update(headers or {})
+
+    def get(self, link, headers=None):
+        """
+        Выполняет GET-запрос через общую сессию
+        :param link: string - ссылка на страницу
+        :param headers: dict or None - дополнительные заголовки запроса
+        :return: requests.Response
+        """
+        return self.session.get(link, headers=headers, timeout=self.timeout)
+
+    def download(self, link):
+        """
+        Скачивает тело страницы (из кэша, если он задан и ответ в нем еще годен)
+        :param link: string - ссылка на страницу
+        :return: bytes - тело страницы
+        :raise SiteBusyError: если сайт ответил 429 или 5xx
+        """
+        if self.cache is None:
+            with self.get(link) as data:
+                check_status(link, data.status_code, data.headers)
+                return data.content
+
+        entry = self.cache.get(link)
+        if self.cache.is_usable(entry, link):
+            return entry.body
+        with self.get(link, self.cache.revalidation_headers(entry)) as data:
+            check_status(link, data.status_code, data.headers)
+            return self.cache.update(link, entry, data.status_code, data.content, data.headers)
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+class AsyncPageDownloader:
+    """
+    Асинхронный загрузчик страниц поверх aiohttp. Используется как асинхронный контекстный менеджер
+    """
+
+    def __init__(self, pool_size=10, headers=None, timeout=60, cache=None, per_host=None):
+        """
+        :param pool_size: int - сколько соединений держать открытыми одновременно
+        :param headers: dict - заголовки, дополняющие DEFAULT_HEADERS
+        :param timeout: int - таймаут запроса в секундах
+        :param cache: HttpCache or None - дисковый кэш ответов (может быть общим с PageDownloader)
+        :param per_host: int or None - сколько запросов к одному хосту может идти одновременно
+        """
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.timeout = timeout
+        self.cache = cache
+        # aiohttp сам сообщает, какие кодировки сжатия умеет распаковывать
+        self.headers = {k: v for k, v in DEFAULT_HEADERS.items() if k != 'Accept-Encoding'}
+        self.headers.update(headers or {})
+        self.session = None
+
+    async def __aenter__(self):
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.per_host or 0)
+        self.session = aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def download(self, link):
+        """
+        Скачивает тело страницы (из кэша, если он задан и ответ в нем еще годен)
+        :param link: string - ссылка на страницу
+        :return: bytes - тело страницы
+        :raise SiteBusyError: если сайт ответил 429 или 5xx
+        :raise ConnectionError: при ошибках aiohttp, чтобы повторы (Helpers.retry) не различали драйверы
+        """
+        import aiohttp
+
+        try:
+            return await self._download(link)
+        except aiohttp.ClientError as e:
+            raise ConnectionError(f'{type(e).__name__}: {e}') from e
+
+    async def _download(self, link):
+        if self.cache is None:
+            async with self.session.get(link) as response:
+                check_status(link, response.status, response.headers)
+                return await response.read()
+
+        entry = self.cache.get(link)
+        if self.cache.is_usable(entry, link):
+            return entry.body
+        async with self.session.get(link, headers=self.cache.revalidation_headers(entry)) as response:
+            check_status(link, response.status, response.headers)
+            return self.cache.update(link, entry, response.status, await response.read(), response.headers)
+
+
+def get_default_downloader():
+    """
+    Возвращает общий загрузчик для вызовов, которым он не был передан явно
+    :return: PageDownloader
+    """
+    global _default_downloader
+    if _default_downloader is None:
+        _default_downloader = PageDownloader()
+    return _default_downloader
+
+
+def download_page(link, driver=None, downloader=None) -> str or None:
     if driver:
         return __download_page_silenium(link, driver)
     else:
-        return __download_page_requests(link)
+        return __download_page_requests(link, downloader or get_default_downloader())
 
 
-def __download_page_requests(link):
+def __download_page_requests(link, downloader):
     """
     Скачивает страницу
     :param link: string - ссылка на страницу
+    :param downloader: PageDownloader - загрузчик с пулом соединений
     :return: string? - тело страницы
     """
-    print('Start downloading "%s" ...' % link, end='\t')
+    logger.info(f'Start downloading {link}')
+    try:
+        content = downloader.download(link)
+        logger.info(f'Downloaded {link}')
+        return content
+    except Exception as ex:
+        logger.error(f'Some troubles with downloading {link}: {ex}')
+        raise ex
+
+
+async def download_page_async(link, downloader) -> bytes:
+    """
+    Асинхронно скачивает страницу
+    :param link: string - ссылка на страницу
+    :param downloader: AsyncPageDownloader - открытый асинхронный загрузчик
+    :return: bytes - тело страницы
+    """
+    logger.info(f'Start downloading {link}')
     try:
-        with requests.get(link)as data:
-            content = data.content
-            print('Downloaded.')
-            return content
+        return await downloader.download(link)
     except Exception as ex:
-        print('\nERROR: Some troubles with downloading:', ex)
+        logger.error(f'Some troubles with downloading {link}: {ex}')
         raise ex
 
 
@@ -31,19 +220,17 @@ def __download_page_silenium(link, driver) -> str or None:
     """
     Скачивает страницу
     :param link: string - ссылка на страницу
-    :param driver: obj - драйвер силениума
+    :param driver: obj - драйвер силениума или DriverPool
     :return: string? - тело страницы
     """
-    from export import logger
+    if isinstance(driver, DriverPool):
+        logger.info(f'Start downloading {link}')
+        return driver.download(link)
 
     driver.get(link)
     try:
-        from selenium.webdriver.common.by import By
         logger.info(f'Start downloading {link}')
-        WebDriverWait(driver, 60).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "main-body"))
-            # EC.presence_of_element_located((By.CLASS_NAME, "page-content"))
-        )
+        wait_until_ready(driver)
         return driver.page_source
     except Exception as e:
         logger.error(f'Some error erupted during selenium processing: {e}')
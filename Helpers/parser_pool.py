@@ -0,0 +1,39 @@
+import threading
+
+
+class ParserPool:
+    """
+    Пул процессов, разбирающих скачанные страницы. Разбор html упирается в GIL, поэтому при быстрой загрузке
+    (кэш, локальное зеркало) потоки загрузки отдают сырые страницы сюда, а обратно получают готовые Book и Quote.
+    Процессы запускаются при первой странице, так что пул ничего не стоит, если разбирать нечего
+    """
+
+    def __init__(self, workers):
+        """
+        :param workers: int - число процессов
+        """
+        self.workers = max(1, workers)
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def submit(self, parse, *args):
+        """
+        Отправляет страницу на разбор
+        :param parse: function - функция уровня модуля (ее передают в другой процесс по имени)
+        :param args: аргументы parse, первым обычно идет тело страницы
+        :return: Future - результат parse
+        """
+        with self.lock:
+            if self.executor is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                # spawn, а не fork: пул создается, когда уже работают потоки загрузки
+                self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.executor.submit(parse, *args)
+
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True, cancel_futures=True)
+                self.executor = None
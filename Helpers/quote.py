@@ -3,22 +3,31 @@ from .utils import handle_none, add_livelib
 
 
 class Quote:
-    def __init__(self, link, text, book=Book()):
+    # порядок полей при записи и чтении (to_list, to_dict)
+    FIELDS = ('link', 'text', 'book')
+    __slots__ = FIELDS
+
+    def __init__(self, link, text, book=None):
         self.link = add_livelib(handle_none(link))
         self.text = handle_none(text)
-        self.book = book
+        self.book = Book() if book is None else book
 
     def __str__(self):
         return '%s\t%s\t%s\t%s\t%s' % (self.book.name, self.book.author, self.text, self.book.link, self.link)
 
     def __eq__(self, other):
+        if not isinstance(other, Quote):
+            return NotImplemented
         return self.link == other.link
 
-    def __ne__(self, other):
-        return not self.__eq__(other)
+    def __hash__(self):
+        return hash(self.link)
 
     def to_list(self):
-        return self.__dict__.values()
+        return self.link, self.text, self.book
+
+    def to_dict(self):
+        return {'link': self.link, 'text': self.text, 'book': self.book.to_dict()}
 
     def add_book(self, book):
         self.book = book
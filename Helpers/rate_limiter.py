@@ -0,0 +1,153 @@
+import json
+import os
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Потокобезопасный ограничитель частоты запросов: в среднем не больше rate запросов в секунду,
+    подряд без ожидания — не больше burst
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Забирает один токен (возможно, в долг) и возвращает время, которое нужно подождать до его появления
+        :return: float - время ожидания в секундах
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self) -> float:
+        """
+        Останавливает поток, пока не появится свободный токен
+        :return: float - сколько секунд пришлось ждать
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def report(self, latency=None, throttled=False, retry_after=None):
+        """
+        Постоянная частота не зависит от ответов сайта
+        """
+
+
+class AdaptiveDelay:
+    """
+    Потокобезопасный ограничитель с адаптивной паузой между запросами (AIMD): пока сайт отвечает быстро,
+    пауза уменьшается на постоянный шаг, а когда сайт сопротивляется (429, 5xx, перенаправление на заглушку
+    для ботов), пауза удваивается. Медленный ответ увеличивает паузу в полтора раза
+    """
+
+    # во сколько раз пауза может вырасти сверх max_delay, когда сайт сопротивляется
+    BACKOFF_LIMIT = 10
+
+    def __init__(self, min_delay, max_delay, start=None, jitter=0.2):
+        """
+        :param min_delay: float - самая короткая пауза в секундах
+        :param max_delay: float - обычная самая длинная пауза; при сопротивлении сайта пауза может вырасти
+        до BACKOFF_LIMIT * max_delay
+        :param start: float or None - начальная пауза (по умолчанию середина между min_delay и max_delay)
+        :param jitter: float - случайное отклонение каждой паузы (доля от нее), чтобы запросы не шли ровным шагом
+        """
+        self.min_delay = max(0.0, min(min_delay, max_delay))
+        self.max_delay = max(min_delay, max_delay)
+        self.limit = self.max_delay * self.BACKOFF_LIMIT
+        self.step = max(0.1, (self.max_delay - self.min_delay) / 20)
+        self.jitter = jitter
+        middle = (self.min_delay + self.max_delay) / 2
+        self.delay = middle if start is None else min(max(start, self.min_delay), self.limit)
+        self.latency = None
+        self.next = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Занимает ближайшее свободное время для запроса
+        :return: float - время ожидания в секундах
+        """
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next)
+            self.next = start + self.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+            return start - now
+
+    def acquire(self) -> float:
+        """
+        Останавливает поток до занятого времени
+        :return: float - сколько секунд пришлось ждать
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def report(self, latency=None, throttled=False, retry_after=None):
+        """
+        Учитывает ответ сайта
+        :param latency: float or None - время ответа в секундах
+        :param throttled: bool - сайт ответил 429/5xx или перенаправил на заглушку
+        :param retry_after: float or None - сколько секунд сайт просит подождать (заголовок Retry-After)
+        """
+        with self.lock:
+            if throttled:
+                self.delay = min(self.limit, max(self.delay * 2, self.step))
+                if retry_after:
+                    self.next = max(self.next, time.monotonic() + retry_after)
+                return
+            if latency is None:
+                return
+            # ответ, который вдвое дольше обычного (и дольше секунды), - признак перегрузки сайта
+            if self.latency is not None and latency > max(1.0, 2 * self.latency):
+                self.delay = min(self.limit, self.delay * 1.5)
+            else:
+                self.delay = max(self.min_delay, self.delay - self.step)
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+
+
+def load_delay(path, host):
+    """
+    Читает паузу, на которой закончился прошлый запуск
+    :param path: string - путь к файлу состояния
+    :param host: string - имя хоста
+    :return: float or None - None, если для хоста ничего не сохранено
+    """
+    try:
+        with open(path, encoding='utf-8') as file:
+            return float(json.load(file)[host]['delay'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_delay(path, host, delay):
+    """
+    Сохраняет паузу для хоста, не трогая записи других хостов
+    :param path: string - путь к файлу состояния
+    :param host: string - имя хоста
+    :param delay: float - пауза в секундах
+    """
+    try:
+        with open(path, encoding='utf-8') as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        state = {}
+    state[host] = {'delay': delay, 'updated': time.time()}
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(state, file, indent=2)
+    os.replace(path + '.tmp', path)
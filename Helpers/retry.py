@@ -0,0 +1,127 @@
+import json
+import os
+import random
+import threading
+
+from .page_loader import SiteBusyError
+
+
+class EmptyPageError(Exception):
+    """
+    Драйвер не вернул тело страницы (например, браузер не дождался ее готовности)
+    """
+
+
+class RetryPolicy:
+    """
+    Политика повторных загрузок: экспоненциальная пауза со случайным разбросом и ограниченное число попыток.
+    Повторяются только временные ошибки (сеть, таймауты, 429/5xx); остальные сразу считаются окончательными
+    """
+
+    def __init__(self, max_attempts=3, base_delay=2, max_delay=60, jitter=0.5,
+                 retryable=(SiteBusyError, EmptyPageError, OSError), fatal=(ValueError,)):
+        """
+        :param max_attempts: int - сколько всего попыток загрузить страницу
+        :param base_delay: float - пауза перед второй попыткой в секундах, дальше она удваивается
+        :param max_delay: float - самая длинная пауза между попытками
+        :param jitter: float - случайное отклонение паузы (доля от нее)
+        :param retryable: tuple - классы ошибок, после которых стоит попробовать еще раз
+        :param fatal: tuple - классы ошибок, которые не повторяются, даже если подходят под retryable
+        (например, неверная ссылка у requests - одновременно ValueError и OSError)
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retryable = retryable
+        self.fatal = fatal
+
+    def is_retryable(self, error) -> bool:
+        """
+        :param error: Exception - ошибка загрузки
+        :return: bool - стоит ли повторить загрузку
+        """
+        return not isinstance(error, self.fatal) and isinstance(error, self.retryable)
+
+    def should_retry(self, attempt, error) -> bool:
+        """
+        :param attempt: int - номер неудавшейся попытки, начиная с 1
+        :param error: Exception - ошибка загрузки
+        :return: bool - будет ли еще попытка
+        """
+        return attempt < self.max_attempts and self.is_retryable(error)
+
+    def delay(self, attempt, error=None) -> float:
+        """
+        Пауза перед следующей попыткой
+        :param attempt: int - номер неудавшейся попытки, начиная с 1
+        :param error: Exception or None - ошибка загрузки; пауза не короче запрошенной сайтом в Retry-After
+        :return: float - пауза в секундах
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        retry_after = getattr(error, 'retry_after', None)
+        return max(delay, retry_after or 0)
+
+
+# одна попытка, как до появления повторов
+SINGLE_ATTEMPT = RetryPolicy(max_attempts=1)
+
+
+class DeadLetters:
+    """
+    Список страниц, которые не удалось загрузить за все попытки. Хранится в файле json lines,
+    чтобы следующий запуск с --retry_failed загрузил только их, не обходя списки заново
+    """
+
+    def __init__(self, path):
+        """
+        :param path: string - путь к файлу списка
+        """
+        self.path = path
+        self.lock = threading.Lock()
+
+    def add(self, link, error):
+        """
+        Записывает страницу в список
+        :param link: string - ссылка на страницу списка книг или цитат
+        :param error: Exception - последняя ошибка
+        """
+        line = json.dumps({'link': link, 'error': f'{type(error).__name__}: {error}'}, ensure_ascii=False)
+        with self.lock, open(self.path, 'a', encoding='utf-8') as file:
+            file.write(line + '\n')
+
+    def links(self):
+        """
+        :return: list - ссылки записанных страниц без повторов, в порядке записи
+        """
+        if not os.path.exists(self.path):
+            return []
+        links = []
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    links.append(json.loads(line)['link'])
+                except (ValueError, KeyError):
+                    continue  # недописанная при сбое строка
+        return list(dict.fromkeys(links))
+
+    def clear(self):
+        """
+        Удаляет список
+        """
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def replace_with(self, other):
+        """
+        Заменяет список другим (собранным за повторную загрузку страниц списка); файл подменяется атомарно,
+        так что до этого момента старый список остается целым
+        :param other: DeadLetters - новый список, его файл переносится на место файла этого списка
+        """
+        with self.lock, other.lock:
+            if os.path.exists(other.path):
+                os.replace(other.path, self.path)
+            elif os.path.exists(self.path):
+                os.remove(self.path)
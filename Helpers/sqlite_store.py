@@ -0,0 +1,203 @@
+import sqlite3
+import threading
+from collections.abc import Mapping
+
+from .book import Book
+from .quote import Quote
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS books (
+    link TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    author TEXT NOT NULL,
+    status TEXT NOT NULL,
+    rating TEXT NOT NULL,
+    date TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS quotes (
+    link TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    book_link TEXT NOT NULL,
+    book_name TEXT NOT NULL,
+    book_author TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS books_status ON books (status);
+CREATE INDEX IF NOT EXISTS books_date ON books (date);
+CREATE INDEX IF NOT EXISTS quotes_book_link ON quotes (book_link);
+'''
+
+BOOK_SELECT = 'SELECT link, status, name, author, rating, date FROM books'
+QUOTE_SELECT = 'SELECT link, text, book_link, book_name, book_author FROM quotes'
+
+
+def book_from_row(row):
+    return Book(*row)
+
+
+def quote_from_row(row):
+    link, text, book_link, book_name, book_author = row
+    return Quote(link, text, Book(link=book_link, name=book_name, author=book_author))
+
+
+def open_store(spec):
+    """
+    Открывает хранилище по описанию из командной строки
+    :param spec: string - описание вида 'sqlite:путь'
+    :return: SqliteStore
+    """
+    kind, _, path = spec.partition(':')
+    if kind == 'sqlite' and path:
+        return SqliteStore(path)
+    raise ValueError(f'Unknown store: {spec}')
+
+
+class StoreIndex(Mapping):
+    """
+    Индекс ссылка -> объект поверх таблицы хранилища. Объекты читаются точечными запросами по первичному ключу,
+    поэтому инкрементальный запуск не читает архив целиком
+    """
+
+    def __init__(self, store, table):
+        """
+        :param store: SqliteStore
+        :param table: string - 'books' или 'quotes'
+        """
+        self.store = store
+        self.table = table
+
+    def __getitem__(self, link):
+        item = self.store.get(self.table, link)
+        if item is None:
+            raise KeyError(link)
+        return item
+
+    def __iter__(self):
+        return self.store.links(self.table)
+
+    def __len__(self):
+        return self.store.count(self.table)
+
+
+class SqliteStore:
+    """
+    Хранилище книг и цитат в SQLite с ключом по ссылке. Изменения записываются пачками в одной транзакции,
+    а таблицы csv/xlsx собираются из него по запросу (см. export.export_views)
+    """
+
+    def __init__(self, path):
+        """
+        :param path: string - путь к файлу базы
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def book_index(self):
+        """
+        :return: StoreIndex - индекс сохраненных книг
+        """
+        return StoreIndex(self, 'books')
+
+    def quote_index(self):
+        """
+        :return: StoreIndex - индекс сохраненных цитат
+        """
+        return StoreIndex(self, 'quotes')
+
+    def get(self, table, link):
+        """
+        Возвращает сохраненный объект
+        :param table: string - 'books' или 'quotes'
+        :param link: string - ссылка на книгу или цитату
+        :return: Book, Quote or None
+        """
+        select, from_row = (BOOK_SELECT, book_from_row) if table == 'books' else (QUOTE_SELECT, quote_from_row)
+        with self.lock:
+            row = self.conn.execute(select + ' WHERE link = ?', (link,)).fetchone()
+        return None if row is None else from_row(row)
+
+    def links(self, table):
+        """
+        :param table: string - 'books' или 'quotes'
+        :return: iterator - ссылки всех сохраненных объектов
+        """
+        with self.lock:
+            rows = self.conn.execute(f'SELECT link FROM {table}').fetchall()
+        return (link for link, in rows)
+
+    def count(self, table) -> int:
+        """
+        :param table: string - 'books' или 'quotes'
+        :return: int - число сохраненных объектов
+        """
+        with self.lock:
+            return self.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    def upsert_books(self, books):
+        """
+        Добавляет новые книги и обновляет сохраненные одной транзакцией
+        :param books: iterable - классы Book
+        """
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT INTO books (link, name, author, status, rating, date) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (link) DO UPDATE SET name = excluded.name, author = excluded.author, '
+                'status = excluded.status, rating = excluded.rating, date = excluded.date',
+                ((b.link, b.name, b.author, b.status, b.rating, b.date) for b in books))
+
+    def upsert_quotes(self, quotes):
+        """
+        Добавляет новые цитаты и обновляет сохраненные одной транзакцией
+        :param quotes: iterable - классы Quote
+        """
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT INTO quotes (link, text, book_link, book_name, book_author) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (link) DO UPDATE SET text = excluded.text, book_link = excluded.book_link, '
+                'book_name = excluded.book_name, book_author = excluded.book_author',
+                ((q.link, q.text, q.book.link, q.book.name, q.book.author) for q in quotes))
+
+    def retain(self, table, links):
+        """
+        Удаляет объекты, ссылок на которые нет среди переданных (перезапись в режиме rewrite_all)
+        :param table: string - 'books' или 'quotes'
+        :param links: iterable - ссылки объектов, которые нужно оставить
+        """
+        with self.lock, self.conn:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS retained (link TEXT PRIMARY KEY)')
+            self.conn.execute('DELETE FROM retained')
+            self.conn.executemany('INSERT OR IGNORE INTO retained (link) VALUES (?)', ((link,) for link in links))
+            self.conn.execute(f'DELETE FROM {table} WHERE link NOT IN (SELECT link FROM retained)')
+            self.conn.execute('DELETE FROM retained')
+
+    def iter_books(self, status=None):
+        """
+        :param status: string or None - отдавать только книги с этим статусом
+        :return: generator - сохраненные книги в порядке добавления
+        """
+        query, params = BOOK_SELECT, ()
+        if status is not None:
+            query, params = query + ' WHERE status = ?', (status,)
+        yield from self._iter(query + ' ORDER BY rowid', params, book_from_row)
+
+    def iter_quotes(self):
+        """
+        :return: generator - сохраненные цитаты в порядке добавления
+        """
+        yield from self._iter(QUOTE_SELECT + ' ORDER BY rowid', (), quote_from_row)
+
+    def _iter(self, query, params, from_row, size=1000):
+        with self.lock:
+            cursor = self.conn.execute(query, params)
+        while True:
+            with self.lock:
+                rows = cursor.fetchmany(size)
+            if not rows:
+                return
+            for row in rows:
+                yield from_row(row)
+
+    def close(self):
+        self.conn.close()
@@ -1,3 +1,6 @@
+from itertools import islice
+
+
 def handle_none(none):
     """
     Возвращает пустую строку, если объект является None, сам объект иначе
@@ -7,11 +10,29 @@ def handle_none(none):
     return '' if none is None else none
 
 
-def add_livelib(link):
+LIVELIB_URL = 'https://www.livelib.ru'
+
+
+def add_livelib(link, base_url=LIVELIB_URL):
     """
     Добавляет доменное имя к ссылке, взятой из внутренностей HTML-кода, где доменное имя опускается
     :param link: string - ссылка, начинается с '/'
+    :param base_url: string - адрес сайта, с которого взята ссылка (--base_url, например зеркало)
     :return: string - полноценная ссылка, к которой можно обращаться
     """
-    ll = 'https://www.livelib.ru'
-    return link if ll in link else ll + link
+    return link if '://' in link else base_url.rstrip('/') + link
+
+
+def batched(iterable, size):
+    """
+    Разбивает поток объектов на пачки
+    :param iterable: iterable - поток объектов
+    :param size: int - размер пачки
+    :return: generator - списки длиной не больше size
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,34 @@
+from lxml import etree
+
+# Все xpath-запросы, которыми разбираются страницы livelib. Компилируются один раз при импорте модуля,
+# поэтому lxml не разбирает выражение заново для каждой книги и цитаты.
+# Запросы, возвращающие текст, отдают обычные строки (smart_strings=False), которые не держат в памяти
+# всё дерево страницы.
+
+# служебные страницы
+LAST_PAGE = etree.XPath('//div[@class="with-pad"]')
+REDIRECT_PAGE = etree.XPath('//div[@class="page-404"]')
+
+# список книг
+BOOK_LIST = etree.XPath('.//div[@id="booklist"]/div')
+BOOK_DATE = etree.XPath('.//h2/text()', smart_strings=False)
+BOOK_DATA = etree.XPath('.//div/div/div[@class="brow-data"]/div')
+BOOK_NAME = etree.XPath('.//a[contains(@class, "brow-book-name")]')
+BOOK_AUTHORS = etree.XPath('.//a[contains(@class, "brow-book-author")]/text()', smart_strings=False)
+BOOK_RATING = etree.XPath('.//div[@class="brow-ratings"]/span/span/span/text()', smart_strings=False)
+
+# лента цитат и страница цитаты
+QUOTE_LIST = etree.XPath('.//article')
+QUOTE_CARD = etree.XPath('.//div[@class="lenta-card"]')
+QUOTE_LINKS = etree.XPath('.//a')
+QUOTE_READ_MORE = etree.XPath('.//a[@class="read-more__link"]')
+QUOTE_BOOK_CARD = etree.XPath('.//div[@class="lenta-card-book__wrapper"]')
+QUOTE_BOOK_NAME = etree.XPath('.//a[@class="lenta-card__book-title"]/text()', smart_strings=False)
+QUOTE_BOOK_AUTHOR = etree.XPath('.//p[@class="lenta-card__author-wrap"]/a/text()', smart_strings=False)
+# места, где может лежать текст цитаты, в порядке проверки
+QUOTE_TEXT = (
+    etree.XPath('.//blockquote'),
+    etree.XPath('.//div[@id="lenta-card__text-quote-full"]/p'),
+    etree.XPath('.//div[@id="lenta-card__text-quote-full"]/div'),
+    etree.XPath('.//p'),
+)
@@ -1,32 +1,106 @@
 import logging
 import math
+from contextlib import nullcontext
 from dataclasses import dataclass
 import time
 import random
 
+from Helpers.utils import LIVELIB_URL
+
 
 @dataclass
 class AppContext:
     user_href: str = None
     status: str = None
     driver: object = None
+    downloader: object = None
     skip: str = None
     book_file: str = None
     quote_file: str = None
+    rewrite_all: bool = False
     page_count: int = math.inf
     quote_count: int = math.inf
+    stop_after: int = 0
     max_delay: int = 15
     min_delay: int = 5
+    workers: int = 1
+    rate_limiter: object = None
+    store: object = None
+    parser_pool: object = None
+    retry_policy: object = None
+    dead_letters: object = None
+    metrics: object = None
+    cache: object = None
+    base_url: str = LIVELIB_URL
 
-    def wait_for_delay(self) -> None:
+    def get_delay(self) -> int:
         """
-        Останавливает программу на некоторое число секунд. Нужна, чтобы сайт не распознал в нас бота
+        Выбирает время ожидания перед очередной загрузкой страницы
+        :return: int - число секунд
         """
         if self.max_delay == -1:
-            delay = self.min_delay
+            return self.min_delay
         elif self.max_delay < self.min_delay:
-            delay = self.max_delay
+            return self.max_delay
         else:
-            delay = random.randint(self.min_delay, self.max_delay)
+            return random.randint(self.min_delay, self.max_delay)
+
+    def wait_for_delay(self) -> None:
+        """
+        Останавливает программу на некоторое число секунд. Нужна, чтобы сайт не распознал в нас бота
+        """
+        delay = self.get_delay()
         logging.debug(f"Waiting {delay} sec...")
         time.sleep(delay)
+
+    def throttle(self) -> None:
+        """
+        Выдерживает паузу перед очередным запросом: по ограничителю частоты, если он задан, иначе случайную
+        """
+        with self.measure('sleep'):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            else:
+                self.wait_for_delay()
+
+    def report(self, latency=None, throttled=False, retry_after=None) -> None:
+        """
+        Сообщает ограничителю частоты, как сайт ответил на запрос (см. AdaptiveDelay.report)
+        :param latency: float or None - время ответа в секундах
+        :param throttled: bool - сайт ответил 429/5xx или перенаправил на заглушку
+        :param retry_after: float or None - сколько секунд сайт просит подождать
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.report(latency, throttled, retry_after)
+
+    async def throttle_async(self) -> None:
+        """
+        Асинхронный вариант throttle: ждет, не блокируя цикл событий
+        """
+        delay = self.rate_limiter.reserve() if self.rate_limiter is not None else self.get_delay()
+        if delay > 0:
+            import asyncio
+            await asyncio.sleep(delay)
+        self.observe('sleep', max(0, delay))
+
+    def measure(self, stage):
+        """
+        Замеряет время этапа обхода, если метрики собираются (см. Metrics.measure)
+        :param stage: string - этап
+        :return: context manager
+        """
+        return self.metrics.measure(stage) if self.metrics is not None else nullcontext()
+
+    def observe(self, name, value) -> None:
+        """
+        Добавляет наблюдение в гистограмму метрик, если они собираются
+        """
+        if self.metrics is not None:
+            self.metrics.observe(name, value)
+
+    def count(self, name, value=1) -> None:
+        """
+        Увеличивает счетчик метрик, если они собираются
+        """
+        if self.metrics is not None:
+            self.metrics.count(name, value)
@@ -1,42 +1,128 @@
+import logging
+
 from lxml import html
 
 from Helpers.book import Book
-from Helpers.livelib_parser import slash_add, href_i, is_last_page, is_redirecting_page, handle_xpath, error_handler, \
-    date_parser
-from Helpers.page_loader import download_page
+from Helpers import xpaths
+from Helpers.livelib_parser import slash_add, handle_xpath, xpath_all, error_handler, date_parser, page_end
+from Helpers.merge import PageWalk
+from Helpers.utils import LIVELIB_URL, add_livelib
+from Modules.AppContext import AppContext
+from Modules.PageFetcher import PageFetcher
+
+logger = logging.getLogger(__name__)
 
 
 class BookLoader:
     def __init__(self, app_context):
         self.ac = app_context
 
-    def get_books(self, status):
+    def get_books(self, status, page_count=None, known=None, checkpoint=None):
         """
         Возвращает список книг (классов Book)
         :param status: string - статус книг
+        :param page_count: int - максимальное число страниц (по умолчанию page_count из контекста)
+        :param known: dict or None - индекс уже сохраненных книг (см. iter_books)
+        :param checkpoint: Checkpoint or None - журнал обхода (см. iter_books)
         :return: list - список классов Book
         """
-        books = []
+        return list(self.iter_books(status, page_count, known, checkpoint))
+
+    def iter_books(self, status, page_count=None, known=None, checkpoint=None, pages=None):
+        """
+        Отдает книги по мере разбора страниц, не накапливая их
+        :param status: string - статус книг
+        :param page_count: int - максимальное число страниц (по умолчанию page_count из контекста)
+        :param known: dict or None - индекс уже сохраненных книг; если задан вместе с ac.stop_after,
+        обход прекращается после stop_after страниц подряд без новых или измененных книг
+        :param checkpoint: Checkpoint or None - журнал обхода; сначала отдаются книги с уже пройденных страниц,
+        затем обход продолжается со следующей страницы
+        :param pages: iterable or None - номера страниц, которые нужно загрузить вместо обхода всего списка
+        :return: generator - классы Book
+        """
         href = slash_add(self.ac.user_href, status)
-        page_idx = 1
+        walk = PageWalk(checkpoint, known, self.ac.stop_after)
+        yield from walk.restored()
+        if walk.done:
+            return
+
+        for idx, page_books in self.iter_pages(href, status, page_count or self.ac.page_count, walk.start, pages):
+            stop = self.page_done(walk, idx, page_books, status)
+            yield from page_books
+            if stop:
+                break
+        walk.finish()
 
-        while page_idx <= self.ac.page_count:
-            self.ac.wait_for_delay()
+    @staticmethod
+    def page_done(walk, idx, page_books, status) -> bool:
+        """
+        Учитывает разобранную страницу (общая часть iter_books и get_books_async)
+        :param walk: PageWalk - учет обхода списка
+        :param idx: int - номер страницы
+        :param page_books: list - книги со страницы
+        :param status: string - статус книг
+        :return: bool - пора ли остановить обход
+        """
+        if not walk.add(idx, page_books):
+            return False
+        logger.info(f'No new books with status "{status}" on the last {walk.stale.stale_pages} pages, stopping.')
+        return True
 
-            # если происходит какая-то ошибка с подключением, переходим к следующей странице
-            try:
-                page = html.fromstring(download_page(href_i(href, page_idx), self.ac.driver))
-            except Exception:
-                continue
-            finally:
-                page_idx += 1
+    def iter_pages(self, href, status, page_count, start=1, pages=None):
+        """
+        Загружает и разбирает страницы списка книг: в пуле процессов ac.parser_pool, если он задан,
+        иначе в потоках загрузки
+        :param href: string - ссылка на список
+        :param status: string - статус книг
+        :param page_count: int - номер последней страницы, которую можно загрузить
+        :param start: int - номер первой загружаемой страницы
+        :param pages: iterable or None - номера страниц, которые нужно загрузить (см. PageFetcher.numbered_pages)
+        :return: generator - пары (номер страницы, список классов Book)
+        """
+        fetcher = PageFetcher(self.ac)
+        if self.ac.parser_pool is not None:
+            yield from fetcher.parsed_pages(href, page_count, parse_book_page, status, self.ac.base_url, start=start,
+                                            pages=pages)
+            return
+        for idx, page in fetcher.numbered_pages(href, page_count, start, pages):
+            yield idx, self.parse_page(page, status)
 
-            if is_last_page(page) or is_redirecting_page(page):
+    async def get_books_async(self, status, page_count=None, known=None, checkpoint=None):
+        """
+        Асинхронный вариант get_books
+        :param status: string - статус книг
+        :param page_count: int - максимальное число страниц (по умолчанию page_count из контекста)
+        :param known: dict or None - индекс уже сохраненных книг (см. iter_books)
+        :param checkpoint: Checkpoint or None - журнал обхода (см. iter_books)
+        :return: list - список классов Book
+        """
+        href = slash_add(self.ac.user_href, status)
+        walk = PageWalk(checkpoint, known, self.ac.stop_after)
+        books = list(walk.restored())
+        if walk.done:
+            return books
+
+        async for idx, page in PageFetcher(self.ac).numbered_pages_async(href, page_count or self.ac.page_count,
+                                                                          walk.start):
+            page_books = self.parse_page(page, status)
+            books.extend(page_books)
+            if self.page_done(walk, idx, page_books, status):
                 break
+        walk.finish()
+        return books
 
-            last_date = None
-            for div_book_html in page.xpath('.//div[@id="booklist"]/div'):
-                date = handle_xpath(div_book_html, './/h2/text()')
+    def parse_page(self, page, status):
+        """
+        Парсит страницу списка книг
+        :param page: html-страница
+        :param status: string - статус книг
+        :return: list - список классов Book
+        """
+        books = []
+        last_date = None
+        with self.ac.measure('parse_books'):
+            for div_book_html in xpath_all(page, xpaths.BOOK_LIST):
+                date = handle_xpath(div_book_html, xpaths.BOOK_DATE)
                 if date is not None:
                     date = date_parser(date)
                     if status == 'read' and date is not None:
@@ -45,7 +131,7 @@ class BookLoader:
                     book = self.book_parser(div_book_html, last_date, status)
                     if book is not None:
                         books.append(book)
-
+        self.ac.observe('items_per_page', len(books))
         return books
 
     def book_parser(self, book_html, date, status):
@@ -56,23 +142,24 @@ class BookLoader:
         :param status: string - статус книги
         :return: Book or None
         """
-        book_data = handle_xpath(book_html, './/div/div/div[@class="brow-data"]/div')
+        book_data = handle_xpath(book_html, xpaths.BOOK_DATA)
         if book_data is None:
             return error_handler('book_data', book_html)
 
-        book_name = handle_xpath(book_data, './/a[contains(@class, "brow-book-name")]')
+        book_name = handle_xpath(book_data, xpaths.BOOK_NAME)
         link = self.try_get_book_link(book_name.get("href"))  # в аргументах лежит ссылка
         if link is None:
             return error_handler('link', book_html)
+        link = add_livelib(link, self.ac.base_url)
         name = None if book_name is None else book_name.text
 
-        author = book_data.xpath('.//a[contains(@class, "brow-book-author")]/text()')
+        author = xpath_all(book_data, xpaths.BOOK_AUTHORS)
         if len(author):
             author = ', '.join(author)  # в случае нескольких авторов нужно добавить запятые
 
         rating = None
         if status == 'read':
-            rating = handle_xpath(book_data, './/div[@class="brow-ratings"]/span/span/span/text()')
+            rating = handle_xpath(book_data, xpaths.BOOK_RATING)
 
         return Book(link, status, name, author, rating, date)
 
@@ -86,3 +173,18 @@ class BookLoader:
         if "/book/" in link or "/work/" in link:
             return link
         return None
+
+
+def parse_book_page(raw, status, base_url=LIVELIB_URL):
+    """
+    Разбирает скачанную страницу списка книг. Вызывается в пуле процессов (см. PageFetcher.parsed_pages)
+    :param raw: string or bytes - тело страницы
+    :param status: string - статус книг
+    :param base_url: string - адрес сайта, к которому достраиваются ссылки
+    :return: tuple - page_end страницы и список классов Book
+    """
+    page = html.fromstring(raw)
+    end = page_end(page)
+    if end is not None:
+        return end, []
+    return None, BookLoader(AppContext(base_url=base_url)).parse_page(page, status)
@@ -0,0 +1,323 @@
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from lxml import html
+
+from Helpers.driver_pool import DriverPool
+from Helpers.livelib_parser import href_i, page_end
+from Helpers.page_loader import SiteBusyError, download_page, download_page_async
+from Helpers.retry import EmptyPageError, SINGLE_ATTEMPT
+
+logger = logging.getLogger(__name__)
+
+
+class PageFetcher:
+    """
+    Загружает страницы списка (книг или цитат) несколькими потоками, отдавая их строго по порядку
+    """
+
+    def __init__(self, app_context):
+        self.ac = app_context
+
+    @property
+    def workers(self) -> int:
+        # одиночный драйвер силениума нельзя использовать из нескольких потоков, пул браузеров - можно
+        if self.ac.driver and not isinstance(self.ac.driver, DriverPool):
+            return 1
+        return max(1, self.ac.workers)
+
+    def pages(self, href, count, start=1):
+        """
+        Генератор страниц списка. Останавливается на последней или перенаправляющей странице
+        :param href: string - ссылка на список
+        :param count: int - номер последней страницы, которую можно загрузить
+        :param start: int - номер первой загружаемой страницы
+        :return: generator - html-страницы в порядке номеров
+        """
+        for _, page in self.numbered_pages(href, count, start):
+            yield page
+
+    def numbered_pages(self, href, count, start=1, pages=None):
+        """
+        То же, что pages, но вместе с номером каждой страницы
+        :param pages: iterable or None - номера страниц по возрастанию, которые нужно загрузить вместо всех
+        с start по count (например, не загрузившиеся в прошлый раз)
+        :return: generator - пары (номер, html-страница)
+        """
+        for idx, page in self.ordered(href, page_numbers(count, start, pages), self.workers, self.load_page):
+            if self.is_end(page_end(page)):
+                break
+            yield idx, page
+
+    def parsed_pages(self, href, count, parse, *args, start=1, pages=None):
+        """
+        То же, что numbered_pages, но страницы разбираются в пуле процессов ac.parser_pool. Загружается
+        по-прежнему не больше workers страниц одновременно, а разбираться может столько, сколько в пуле процессов
+        :param href: string - ссылка на список
+        :param count: int - номер последней страницы, которую можно загрузить
+        :param parse: function - функция уровня модуля (тело страницы, *args) -> (page_end страницы, объекты)
+        :param args: дополнительные аргументы parse
+        :param start: int - номер первой загружаемой страницы
+        :param pages: iterable or None - номера страниц, которые нужно загрузить (см. numbered_pages)
+        :return: generator - пары (номер, список объектов со страницы)
+        """
+        slots = threading.Semaphore(self.workers)
+
+        def load(link, stop):
+            return self.load_parsed_page(link, stop, slots, parse, args)
+
+        window = self.workers + self.ac.parser_pool.workers
+        for idx, (end, items) in self.ordered(href, page_numbers(count, start, pages), window, load):
+            if self.is_end(end):
+                break
+            yield idx, items
+
+    def is_end(self, end):
+        """
+        :param end: string or None - результат page_end; о перенаправлении на заглушку сообщается ограничителю частоты
+        :return: bool - закончился ли обход
+        """
+        if end == 'redirect':
+            self.ac.report(throttled=True)
+        return end is not None
+
+    @staticmethod
+    def ordered(href, indexes, window, load):
+        """
+        Загружает страницы в пуле потоков, держа в работе до window страниц, и отдает результаты строго по порядку.
+        Страницы, которые не удалось загрузить (load вернул None), пропускаются
+        :param href: string - ссылка на список
+        :param indexes: iterator - номера загружаемых страниц
+        :param window: int - сколько страниц загружать одновременно
+        :param load: function - (ссылка, threading.Event) -> результат или None
+        :return: generator - пары (номер, результат load)
+        """
+        stop = threading.Event()
+        pending = deque()
+        pool = ThreadPoolExecutor(max_workers=window)
+        try:
+            while True:
+                for page_idx in itertools.islice(indexes, window - len(pending)):
+                    pending.append((page_idx, pool.submit(load, href_i(href, page_idx), stop)))
+                if not pending:
+                    break
+
+                idx, future = pending.popleft()
+                result = future.result()
+                # страница, которую не удалось загрузить за все попытки, уже записана в ac.dead_letters
+                if result is None:
+                    continue
+                yield idx, result
+        finally:
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def fetch(self, link, stop=None, dead_letter=None):
+        """
+        Скачивает тело страницы по политике повторов ac.retry_policy, перед каждой попыткой выдерживая паузу.
+        Страница, которую так и не удалось загрузить, записывается в ac.dead_letters
+        :param link: string - ссылка на страницу
+        :param stop: threading.Event - флаг, что страница уже не нужна
+        :param dead_letter: string or None - какую ссылку записать при неудаче (по умолчанию link)
+        :return: string, bytes or None
+        """
+        policy = self.ac.retry_policy or SINGLE_ATTEMPT
+        for attempt in itertools.count(1):
+            started = None
+            try:
+                # свежий ответ из кэша отдается без паузы и не сообщается ограничителю частоты
+                raw = self.cached(link)
+                if raw is None:
+                    self.ac.throttle()
+                    if stop is not None and stop.is_set():
+                        return None
+                    started = time.monotonic()
+                    with self.ac.measure('download'):
+                        raw = download_page(link, self.ac.driver, self.ac.downloader)
+                    if raw is None:
+                        raise EmptyPageError(link)
+            except Exception as e:
+                if not self.retry(link, attempt, e, dead_letter):
+                    return None
+                delay = policy.delay(attempt, e)
+                if stop is not None and stop.wait(delay):
+                    return None
+                if stop is None:
+                    time.sleep(delay)
+                continue
+            if started is not None:
+                self.ac.report(latency=time.monotonic() - started)
+            self.ac.count('pages')
+            self.ac.count('bytes', len(raw))
+            return raw
+
+    def cached(self, link):
+        """
+        Возвращает страницу из кэша ответов (ac.cache), если ее можно отдать без обращения к сайту
+        :param link: string - ссылка на страницу
+        :return: bytes or None
+        """
+        if self.ac.cache is None or self.ac.driver:  # силениум кэшем не пользуется
+            return None
+        return self.ac.cache.fresh(link)
+
+    def retry(self, link, attempt, error, dead_letter=None) -> bool:
+        """
+        Учитывает неудавшуюся попытку загрузки
+        :param link: string - ссылка на страницу
+        :param attempt: int - номер попытки, начиная с 1
+        :param error: Exception - ошибка загрузки
+        :param dead_letter: string or None - какую ссылку записать при окончательной неудаче
+        :return: bool - нужно ли попробовать еще раз
+        """
+        if isinstance(error, SiteBusyError):
+            self.ac.report(throttled=True, retry_after=error.retry_after)
+        if (self.ac.retry_policy or SINGLE_ATTEMPT).should_retry(attempt, error):
+            logger.warning(f'Attempt {attempt} to download {link} failed: {error}')
+            return True
+        logger.error(f'Some error was erupted: {error}')
+        self.give_up(dead_letter or link, error)
+        return False
+
+    def give_up(self, link, error):
+        """
+        Записывает страницу в список незагруженных
+        """
+        if self.ac.dead_letters is not None:
+            self.ac.dead_letters.add(link, error)
+
+    def load_page(self, link, stop=None, dead_letter=None):
+        """
+        Скачивает и разбирает одну страницу
+        :param link: string - ссылка на страницу
+        :param stop: threading.Event - флаг, что страница уже не нужна
+        :param dead_letter: string or None - какую ссылку записать при неудаче (по умолчанию link)
+        :return: html-страница или None
+        """
+        raw = self.fetch(link, stop, dead_letter)
+        if raw is None:
+            return None
+        try:
+            with self.ac.measure('parse_html'):
+                return html.fromstring(raw)
+        except Exception as e:
+            logger.error(f'Some error was erupted while parsing {link}: {e}')
+            self.give_up(dead_letter or link, e)
+            return None
+
+    def load_parsed_page(self, link, stop, slots, parse, args):
+        """
+        Скачивает страницу и ждет ее разбора в пуле процессов
+        :param link: string - ссылка на страницу
+        :param stop: threading.Event - флаг, что страница уже не нужна
+        :param slots: threading.Semaphore - ограничивает число одновременных загрузок
+        :param parse: function - функция разбора (см. parsed_pages)
+        :param args: tuple - дополнительные аргументы parse
+        :return: tuple or None - результат parse или None, если загрузить или разобрать страницу не удалось
+        """
+        with slots:
+            raw = self.fetch(link, stop)
+        if raw is None:
+            return None
+        try:
+            # в пуле процессов метрики не собираются, поэтому разбор замеряется целиком вместе с очередью
+            with self.ac.measure('parse_pool'):
+                end, items = self.ac.parser_pool.submit(parse, raw, *args).result()
+        except Exception as e:
+            logger.error(f'Some error was erupted while parsing {link}: {e}')
+            self.give_up(link, e)
+            return None
+        if end is None:
+            self.ac.observe('items_per_page', len(items))
+        return end, items
+
+    async def pages_async(self, href, count, start=1):
+        """
+        Асинхронный вариант pages: до workers загрузок одновременно в одном цикле событий
+        :param href: string - ссылка на список
+        :param count: int - номер последней страницы, которую можно загрузить
+        :param start: int - номер первой загружаемой страницы
+        :return: async generator - html-страницы в порядке номеров
+        """
+        async for _, page in self.numbered_pages_async(href, count, start):
+            yield page
+
+    async def numbered_pages_async(self, href, count, start=1, pages=None):
+        """
+        То же, что pages_async, но вместе с номером каждой страницы
+        :param pages: iterable or None - номера страниц, которые нужно загрузить (см. numbered_pages)
+        :return: async generator - пары (номер, html-страница)
+        """
+        import asyncio
+
+        indexes = page_numbers(count, start, pages)
+        pending = deque()
+        try:
+            while True:
+                for page_idx in itertools.islice(indexes, self.workers - len(pending)):
+                    pending.append((page_idx, asyncio.ensure_future(self.load_page_async(href_i(href, page_idx)))))
+                if not pending:
+                    break
+
+                idx, task = pending.popleft()
+                page = await task
+                if page is None:
+                    continue
+                if self.is_end(page_end(page)):
+                    break
+                yield idx, page
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def load_page_async(self, link, dead_letter=None):
+        """
+        Асинхронно скачивает и разбирает одну страницу по политике повторов ac.retry_policy
+        :param link: string - ссылка на страницу
+        :param dead_letter: string or None - какую ссылку записать при неудаче (по умолчанию link)
+        :return: html-страница или None
+        """
+        import asyncio
+
+        policy = self.ac.retry_policy or SINGLE_ATTEMPT
+        for attempt in itertools.count(1):
+            started = None
+            try:
+                raw = self.cached(link)
+                if raw is None:
+                    await self.ac.throttle_async()
+                    started = time.monotonic()
+                    with self.ac.measure('download'):
+                        raw = await download_page_async(link, self.ac.downloader)
+            except Exception as e:
+                if not self.retry(link, attempt, e, dead_letter):
+                    return None
+                await asyncio.sleep(policy.delay(attempt, e))
+                continue
+            if started is not None:
+                self.ac.report(latency=time.monotonic() - started)
+            self.ac.count('pages')
+            self.ac.count('bytes', len(raw))
+            try:
+                with self.ac.measure('parse_html'):
+                    return html.fromstring(raw)
+            except Exception as e:
+                logger.error(f'Some error was erupted while parsing {link}: {e}')
+                self.give_up(dead_letter or link, e)
+                return None
+
+
+def page_numbers(count, start=1, pages=None):
+    """
+    :param count: int - номер последней страницы, которую можно загрузить
+    :param start: int - номер первой загружаемой страницы
+    :param pages: iterable or None - явный список номеров
+    :return: iterator - номера загружаемых страниц
+    """
+    if pages is not None:
+        return iter(pages)
+    return itertools.takewhile(lambda idx: idx <= count, itertools.count(start))
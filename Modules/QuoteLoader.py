@@ -1,57 +1,196 @@
+import logging
 import os
+from functools import partial
 
 from lxml import html
-import pandas as pd
 
 from Helpers.book import Book
-from Helpers.livelib_parser import slash_add, href_i, is_last_page, is_redirecting_page, handle_xpath, error_handler
-from Helpers.page_loader import download_page
+from Helpers import xpaths
+from Helpers.livelib_parser import slash_add, handle_xpath, xpath_all, error_handler, page_end, href_i
+from Helpers.csv_reader import iter_quotes_from_csv
+from Helpers.journal import CHECKPOINT_BYTES, Journal, replace_durably
+from Helpers.link_index import LinkIndex, open_link_index
+from Helpers.merge import PageWalk, build_index, iter_merge, QUOTE_FIELDS
 from Helpers.quote import Quote
+from Helpers.metrics import merged_batches
+from Helpers.utils import LIVELIB_URL, add_livelib
+from Modules.AppContext import AppContext
 from Modules.BookLoader import BookLoader
-from export import logger
+from Modules.PageFetcher import PageFetcher
+
+QUOTE_COLUMNS = ['Name', 'Author', 'Quote text', 'Book link', 'Quote link']
+QUOTE_INDEX_COLUMNS = ('Quote link', 'Quote text')
+NOT_FULL = '!!!NOT_FULL###'
+
+logger = logging.getLogger(__name__)
 
 
 class QuoteLoader:
     def __init__(self, app_context):
         self.ac = app_context
 
-    def get_quotes(self):
+    def get_quotes(self, known=None, checkpoint=None):
         """
         Возвращает список цитат (классов Quote)
+        :param known: dict or None - индекс уже сохраненных цитат (см. iter_quotes)
+        :param checkpoint: Checkpoint or None - журнал обхода (см. iter_quotes)
         :return: list - список классов Quote
         """
-        quotes = []
+        return list(self.iter_quotes(known, checkpoint))
+
+    def iter_quotes(self, known=None, checkpoint=None, pages=None):
+        """
+        Отдает цитаты по мере разбора страниц, не накапливая их
+        :param known: dict or None - индекс уже сохраненных цитат; если задан вместе с ac.stop_after,
+        обход прекращается после stop_after страниц подряд без новых или измененных цитат
+        :param checkpoint: Checkpoint or None - журнал обхода; сначала отдаются цитаты с уже пройденных страниц,
+        затем обход продолжается со следующей страницы
+        :param pages: iterable or None - номера страниц, которые нужно загрузить вместо обхода всей ленты
+        :return: generator - классы Quote
+        """
+        seen = set()
         href = slash_add(self.ac.user_href, 'quotes')
-        page_idx = 1
+        walk = PageWalk(checkpoint, known, self.ac.stop_after, QUOTE_FIELDS)
+        for quote in walk.restored():
+            seen.add(quote.link)
+            yield quote
+        if walk.done:
+            return
 
-        while page_idx <= self.ac.quote_count:
-            self.ac.wait_for_delay()
+        fetcher = PageFetcher(self.ac)
+        for idx, parsed in self.iter_pages(href, self.ac.quote_count, walk.start, pages):
+            page_quotes = self.new_quotes(parsed, known, seen)
+            # в случае ошибки цитата пропускается, а в список незагруженных попадает страница ленты,
+            # чтобы повторить ее целиком
+            quote_pages = {quote.link: fetcher.load_page(quote.link, dead_letter=href_i(href, idx))
+                           for quote in page_quotes if quote.text is None}
+            page_quotes = self.complete_page(page_quotes, quote_pages, seen)
+            stop = self.page_done(walk, idx, page_quotes)
+            yield from page_quotes
+            if stop:
+                break
+        walk.finish()
 
-            # если происходит какая-то ошибка с подключением, переходим к следующей странице
-            try:
-                page = html.fromstring(download_page(href_i(href, page_idx), self.ac.driver))
-            except Exception as e:
-                logger.error(f'Some error was erupted: {e}')
+    def new_quotes(self, parsed, known, seen):
+        """
+        Отбирает цитаты страницы, которых еще не было в обходе. Неполный текст (NOT_FULL) берется
+        из сохраненной цитаты, а если ее нет, text становится None: его нужно загрузить со страницы цитаты
+        :param parsed: list - цитаты со страницы ленты
+        :param known: dict or None - индекс сохраненных цитат
+        :param seen: set - ссылки цитат, уже отданных обходом
+        :return: list - классы Quote
+        """
+        quotes = {}
+        for quote in parsed:
+            if quote.link in seen or quote.link in quotes:
                 continue
-            finally:
-                page_idx += 1
+            if quote.text == NOT_FULL:  # обрабатываем случай, когда показан не весь текст цитаты
+                quote.text = self.get_known_text(quote, known)
+            quotes[quote.link] = quote
+        return list(quotes.values())
+
+    def complete_page(self, quotes, quote_pages, seen):
+        """
+        Подставляет полные тексты со страниц цитат (общая часть iter_quotes и get_quotes_async)
+        :param quotes: list - цитаты страницы ленты (см. new_quotes)
+        :param quote_pages: dict - ссылка цитаты -> ее html-страница или None, если ее не удалось загрузить
+        :param seen: set - ссылки цитат, уже отданных обходом; пополняется
+        :return: list - цитаты страницы без тех, чью страницу не удалось загрузить
+        """
+        page_quotes = []
+        for quote in quotes:
+            if quote.text is None:
+                if quote_pages.get(quote.link) is None:
+                    continue
+                quote.text = self.get_quote_text(handle_xpath(quote_pages[quote.link], xpaths.QUOTE_LIST))
+            seen.add(quote.link)
+            page_quotes.append(quote)
+        return page_quotes
+
+    @staticmethod
+    def page_done(walk, idx, page_quotes) -> bool:
+        """
+        Учитывает обработанную страницу ленты
+        :param walk: PageWalk - учет обхода ленты
+        :param idx: int - номер страницы
+        :param page_quotes: list - цитаты со страницы
+        :return: bool - пора ли остановить обход
+        """
+        if not walk.add(idx, page_quotes):
+            return False
+        logger.info(f'No new quotes on the last {walk.stale.stale_pages} pages, stopping.')
+        return True
+
+    def iter_pages(self, href, page_count, start=1, pages=None):
+        """
+        Загружает и разбирает страницы списка цитат: в пуле процессов ac.parser_pool, если он задан,
+        иначе в потоках загрузки
+        :param href: string - ссылка на список
+        :param page_count: int - номер последней страницы, которую можно загрузить
+        :param start: int - номер первой загружаемой страницы
+        :param pages: iterable or None - номера страниц, которые нужно загрузить (см. PageFetcher.numbered_pages)
+        :return: generator - пары (номер страницы, список классов Quote)
+        """
+        fetcher = PageFetcher(self.ac)
+        if self.ac.parser_pool is not None:
+            yield from fetcher.parsed_pages(href, page_count, parse_quote_page, self.ac.quote_file, self.ac.base_url,
+                                            start=start, pages=pages)
+            return
+        for idx, page in fetcher.numbered_pages(href, page_count, start, pages):
+            yield idx, self.parse_page(page)
+
+    async def get_quotes_async(self, known=None, checkpoint=None):
+        """
+        Асинхронный вариант get_quotes
+        :param known: dict or None - индекс уже сохраненных цитат (см. iter_quotes)
+        :param checkpoint: Checkpoint or None - журнал обхода (см. iter_quotes)
+        :return: list - список классов Quote
+        """
+        seen = set()
+        href = slash_add(self.ac.user_href, 'quotes')
+        walk = PageWalk(checkpoint, known, self.ac.stop_after, QUOTE_FIELDS)
+        quotes = list(walk.restored())
+        seen.update(quote.link for quote in quotes)
+        if walk.done:
+            return quotes
 
-            if is_last_page(page) or is_redirecting_page(page):
+        fetcher = PageFetcher(self.ac)
+        async for idx, page in fetcher.numbered_pages_async(href, self.ac.quote_count, walk.start):
+            page_quotes = self.new_quotes(self.parse_page(page), known, seen)
+            quote_pages = {quote.link: await fetcher.load_page_async(quote.link, href_i(href, idx))
+                           for quote in page_quotes if quote.text is None}
+            page_quotes = self.complete_page(page_quotes, quote_pages, seen)
+            quotes.extend(page_quotes)
+            if self.page_done(walk, idx, page_quotes):
                 break
+        walk.finish()
+        return quotes
+
+    @staticmethod
+    def get_known_text(quote, known):
+        """
+        Возвращает полный текст уже сохраненной цитаты, чтобы не загружать ее страницу повторно
+        :param quote: Quote - цитата с неполным текстом
+        :param known: dict or None - индекс сохраненных цитат
+        :return: string or None - None, если цитата еще не сохранена
+        """
+        if known is None or quote.link not in known:
+            return None
+        return known[quote.link].text
 
-            for quote_html in page.xpath('.//article'):
+    def parse_page(self, page):
+        """
+        Парсит страницу списка цитат. Цитаты с неполным текстом помечаются текстом NOT_FULL
+        :param page: html-страница
+        :return: list - список классов Quote
+        """
+        quotes = []
+        with self.ac.measure('parse_quotes'):
+            for quote_html in xpath_all(page, xpaths.QUOTE_LIST):
                 quote = self.quote_parser(quote_html)
-                if quote is not None and quote not in quotes:
-                    if quote.text == '!!!NOT_FULL###':  # обрабатываем случай, когда показан не весь текст цитаты
-                        self.ac.wait_for_delay()
-                        try:  # просматриваем страницу цитаты, в случае ошибки переходим к следующей цитате
-                            quote_page = html.fromstring(download_page(quote.link, self.ac.driver))
-                        except Exception as e:
-                            logger.error(f'Some error was erupted: {e}')
-                            continue
-                        quote.text = self.get_quote_text(handle_xpath(quote_page, './/article'))
+                if quote is not None:
                     quotes.append(quote)
-
+        self.ac.observe('items_per_page', len(quotes))
         return quotes
 
     def quote_parser(self, quote_html):
@@ -60,14 +199,14 @@ class QuoteLoader:
         :param quote_html: html-узел с цитатой
         :return: Quote or None
         """
-        card = handle_xpath(quote_html, './/div[@class="lenta-card"]')
+        card = handle_xpath(quote_html, xpaths.QUOTE_CARD)
         if card is None:
             return error_handler('card', quote_html)
 
         # Просматриваем все ссылки пока не найдем те, что нам подойдут
         link = None
         link_book = None
-        for href in card.xpath('.//a'):
+        for href in xpath_all(card, xpaths.QUOTE_LINKS):
             if link is None:
                 link = self.try_get_quote_link(href.get('href'))
             if link_book is None:
@@ -75,15 +214,16 @@ class QuoteLoader:
 
         text = self.get_quote_text(card)
         # Если мы нашли "Читать дальше...", нужно дать об этом знать и обработать во внешней функции
-        if len(card.xpath('.//a[@class="read-more__link"]')):
-            text = '!!!NOT_FULL###'
+        if len(xpath_all(card, xpaths.QUOTE_READ_MORE)):
+            text = NOT_FULL
 
-        book_card = handle_xpath(card, './/div[@class="lenta-card-book__wrapper"]')
-        book_name = handle_xpath(book_card, './/a[@class="lenta-card__book-title"]/text()')
-        book_author = handle_xpath(book_card, './/p[@class="lenta-card__author-wrap"]/a/text()')
+        book_card = handle_xpath(card, xpaths.QUOTE_BOOK_CARD)
+        book_name = handle_xpath(book_card, xpaths.QUOTE_BOOK_NAME)
+        book_author = handle_xpath(book_card, xpaths.QUOTE_BOOK_AUTHOR)
 
         if link is not None and link_book is not None and text is not None:
-            return Quote(link, text, Book(link_book, name=book_name, author=book_author))
+            return Quote(add_livelib(link, self.ac.base_url), text,
+                         Book(add_livelib(link_book, self.ac.base_url), name=book_name, author=book_author))
         if link is None or link_book is None:
             return error_handler('link', quote_html)
         if text is None:
@@ -97,52 +237,248 @@ class QuoteLoader:
         :return: string or None
         """
 
-        item = handle_xpath(card, './/blockquote')
-        if item is None:
-            item = handle_xpath(card, './/div[@id="lenta-card__text-quote-full"]/p')
-        if item is None:
-            item = handle_xpath(card, './/div[@id="lenta-card__text-quote-full"]/div')
-        if item is None:
-            item = handle_xpath(card, './/p')
+        item = None
+        for request in xpaths.QUOTE_TEXT:
+            item = handle_xpath(card, request)
+            if item is not None:
+                break
 
         quote_text = None if item is None else self.format_quote_text(item.text_content())
         logger.info(f"\tQuote Processed: {quote_text}")
         return quote_text
 
+    def read_quotes_df(self):
+        """
+        Считывает сохраненные цитаты
+        :return: DataFrame - таблица цитат (пустая, если файла нет)
+        """
+        import pandas as pd  # pandas нужен только для таблицы цитат
+
+        quotes_df = pd.DataFrame(columns=QUOTE_COLUMNS)
+        if os.path.exists(self.ac.quote_file) and os.path.getsize(self.ac.quote_file) > 0:
+            if self.ac.quote_file.split('.')[-1] in ['csv']:
+                quotes_df = pd.read_csv(self.ac.quote_file, sep='\t')
+            else:
+                quotes_df = pd.read_excel(self.ac.quote_file)
+        return quotes_df
+
+    def load_index(self):
+        """
+        Строит индекс сохраненных цитат по ссылке
+        :return: dict or LinkIndex - словарь ссылка -> Quote; для таблицы csv - индекс ссылок в файле рядом с ней
+        (полный текст цитаты читается из таблицы, только когда он нужен)
+        """
+        if self.ac.store is not None:
+            return self.ac.store.quote_index()
+        if self.ac.quote_file.split('.')[-1] in ['csv']:
+            return open_link_index(self.ac.quote_file, QUOTE_FIELDS, iter_quotes_from_csv,
+                                   partial(iter_quotes_from_csv, columns=QUOTE_INDEX_COLUMNS))
+        quotes_df = self.read_quotes_df().reindex(columns=QUOTE_COLUMNS).fillna('')
+        return build_index(Quote(link, text) for link, text in zip(quotes_df['Quote link'], quotes_df['Quote text']))
+
     def save_quotes(self, new_quotes):
+        """
+        Переписывает таблицу целиком: тексты сохраненных цитат обновляются, новые дописываются
+        (в режиме rewrite_all таблица состоит только из new_quotes). Новая версия собирается во временном файле
+        и подменяет старую атомарно, поэтому сбой посреди записи не портит копию
+        :param new_quotes: list - цитаты (классы Quote)
+        """
+        import pandas as pd
+
         file_ext = self.ac.quote_file.split('.')[-1]
+        saved_df = pd.DataFrame(columns=QUOTE_COLUMNS) if self.ac.rewrite_all else self.read_quotes_df()
+        quotes_df = self.upsert_quotes(saved_df, new_quotes)
+
+        root, ext = os.path.splitext(self.ac.quote_file)
+        tmp = f'{root}.tmp{ext}'  # pandas выбирает формат таблицы по расширению
+        if file_ext in ['csv']:
+            quotes_df.to_csv(tmp, sep='\t', index=False)
+        else:
+            quotes_df.to_excel(tmp, index=False)
+        replace_durably(tmp, self.ac.quote_file)
 
         if self.ac.rewrite_all:
-            if os.path.exists(self.ac.quote_file):
-                os.remove(self.ac.quote_file)
-            logger.info(f'All quotes were deleted from {self.ac.quote_file}.')
+            logger.info(f'All quotes were replaced in {self.ac.quote_file}.')
+        logger.info(f'The quotes were written to {self.ac.quote_file}.')
 
-        quotes_df = pd.DataFrame(columns=['Name', 'Author', 'Quote text', 'Book link', 'Quote link'])
-        if file_ext in ['csv']:
-            if os.path.exists(self.ac.quote_file):
-                quotes_df = pd.read_csv(self.ac.quote_file, sep='\t')
+    def journal(self):
+        """
+        :return: Journal - журнал записи таблицы цитат
+        """
+        return Journal(f'{self.ac.quote_file}.journal')
+
+    def replay_journal(self, journal):
+        """
+        Переносит в таблицу записи журнала и очищает его. Дописанные в csv пачки записываются заново
+        с того места, где началась первая из них (недописанный при сбое хвост таблицы отрезается),
+        измененные цитаты и все цитаты таблицы xlsx - одной перезаписью таблицы
+        :param journal: Journal
+        :return: int - сколько цитат перенесено
+        """
+        return journal.replay(self.ac.quote_file, self.append_quotes, self.save_quotes,
+                              appendable=self.ac.quote_file.split('.')[-1] in ['csv'])
+
+    def recover(self):
+        """
+        Доводит до конца запись цитат, прерванную сбоем: переносит в таблицу записи, оставшиеся в журнале.
+        В режиме rewrite_all журнал просто очищается - таблица все равно будет собрана заново
+        """
+        if self.ac.store is not None:
+            return
+        journal = self.journal()
+        if not journal.pending():
+            return
+        if self.ac.rewrite_all:
+            journal.clear()
+            return
+        restored = self.replay_journal(journal)
+        logger.warning(f'{restored} quotes were restored from {journal.path} after an interrupted run.')
+
+    def save_quotes_stream(self, quotes, known, batch_size=100):
+        """
+        Сохраняет цитаты по мере загрузки: новые дописываются в csv пачками по batch_size,
+        а измененные (их обычно единицы) обновляются одной перезаписью таблицы в конце.
+        Каждая пачка сначала записывается в журнал (см. Journal), так что после сбоя она не теряется.
+        В режиме rewrite_all таблица собирается во временном файле и подменяет старую только после обхода.
+        Таблицу xlsx дописать нельзя: новые и измененные цитаты копятся в журнале и переносятся в нее
+        одной перезаписью в конце
+        :param quotes: iterable - свежие цитаты (классы Quote)
+        :param known: dict - индекс сохраненных цитат (см. load_index)
+        :param batch_size: int - сколько новых цитат накапливать перед записью на диск
+        """
+        if self.ac.store is not None:
+            self.store_quotes(quotes, known, batch_size)
+            return
+        if self.ac.quote_file.split('.')[-1] not in ['csv']:
+            self.save_quotes_journaled(quotes, known, batch_size)
+            return
+
+        target = self.ac.quote_file + '.tmp' if self.ac.rewrite_all else self.ac.quote_file
+        journal = None
+        if self.ac.rewrite_all:
+            known = {}
+            open(target, 'w').close()
         else:
-            if os.path.exists(self.ac.quote_file):
-                quotes_df = pd.read_excel(self.ac.quote_file)
+            journal = self.journal()
 
-        for nc in new_quotes:
-            if quotes_df[quotes_df['Quote link'] == nc.link].shape[0] > 0:
-                quotes_df.loc[quotes_df['Quote link'] == nc.link, 'text'] = nc.text
-            else:
-                quotes_df.loc[len(quotes_df.index)] = [
-                    nc.book.name,
-                    nc.book.author,
-                    nc.text,
-                    nc.book.link,
-                    nc.link
-                ]
+        changed = []
+        added = 0
+        for batch in merged_batches(self.ac.metrics, quotes,
+                                    lambda items: iter_merge(known, items, QUOTE_FIELDS, changed), batch_size):
+            with self.ac.measure('write'):
+                position = os.path.getsize(target) if os.path.exists(target) else 0
+                if journal is not None:
+                    journal.append('add', batch, position)
+                self.append_quotes(batch, target)
+                if isinstance(known, LinkIndex):
+                    known.extend_from(position)
+                if journal is not None and journal.size > CHECKPOINT_BYTES:
+                    journal.checkpoint(target)
+            added += len(batch)
+            logger.info(f'{added} new quotes were written to {target}.')
+        self.append_quotes([], target)
 
-        if file_ext in ['csv']:
-            quotes_df.to_csv(self.ac.quote_file, sep='\t')
+        if self.ac.rewrite_all:
+            replace_durably(target, self.ac.quote_file)
         else:
-            quotes_df.to_excel(self.ac.quote_file)
+            journal.checkpoint(target)
+            if changed:
+                journal.append('upsert', changed)
+                self.replay_journal(journal)
+                if isinstance(known, LinkIndex):  # таблица переписана целиком, смещения строк изменились
+                    known.rebuild()
+            elif isinstance(known, LinkIndex):
+                known.save()
+        logger.info(f'Quotes added: {added}, changed: {len(changed)}.')
 
-        logger.info(f'The quotes were written to {self.ac.quote_file}.')
+    def save_quotes_journaled(self, quotes, known, batch_size=100):
+        """
+        Сохраняет цитаты в таблицу, которую нельзя дописать (xlsx): новые цитаты пачками по batch_size
+        и измененные записываются в журнал, а затем переносятся в таблицу одной атомарной перезаписью
+        :param quotes: iterable - свежие цитаты (классы Quote)
+        :param known: dict - индекс сохраненных цитат (см. load_index)
+        :param batch_size: int - сколько новых цитат накапливать перед записью в журнал
+        """
+        if self.ac.rewrite_all:
+            self.save_quotes(list(quotes))
+            return
+        journal = self.journal()
+        changed = []
+        added = 0
+        for batch in merged_batches(self.ac.metrics, quotes,
+                                    lambda items: iter_merge(known, items, QUOTE_FIELDS, changed), batch_size):
+            with self.ac.measure('write'):
+                journal.append('add', batch)
+            added += len(batch)
+            logger.info(f'{added} new quotes were written to {journal.path}.')
+        if changed:
+            journal.append('upsert', changed)
+        if journal.pending():
+            with self.ac.measure('write'):
+                self.replay_journal(journal)
+        logger.info(f'Quotes added: {added}, changed: {len(changed)}.')
+
+    def store_quotes(self, quotes, known, batch_size=100):
+        """
+        Записывает новые и измененные цитаты в хранилище (ac.store) пачками по batch_size
+        :param quotes: iterable - свежие цитаты (классы Quote)
+        :param known: dict - индекс сохраненных цитат (см. load_index)
+        :param batch_size: int - сколько новых цитат накапливать перед записью
+        """
+        store = self.ac.store
+        known = {} if self.ac.rewrite_all else known
+        changed, seen = [], set()
+        added = 0
+        for batch in merged_batches(self.ac.metrics, quotes,
+                                    lambda items: iter_merge(known, items, QUOTE_FIELDS, changed, seen), batch_size):
+            with self.ac.measure('write'):
+                store.upsert_quotes(batch)
+            added += len(batch)
+            logger.info(f'{added} new quotes were written to {store.path}.')
+        store.upsert_quotes(changed)
+        if self.ac.rewrite_all:
+            store.retain('quotes', seen)
+        logger.info(f'Quotes added: {added}, changed: {len(changed)}.')
+
+    @staticmethod
+    def append_quotes(quotes, file_path):
+        """
+        Дописывает цитаты в csv-таблицу (заголовок пишется, только если файл пуст)
+        :param quotes: list - цитаты (классы Quote)
+        :param file_path: string - путь к таблице
+        """
+        import pandas as pd
+
+        header = not os.path.exists(file_path) or os.path.getsize(file_path) == 0
+        if not quotes and not header:
+            return
+        pd.DataFrame([[q.book.name, q.book.author, q.text, q.book.link, q.link] for q in quotes],
+                     columns=QUOTE_COLUMNS).to_csv(file_path, sep='\t', index=False, mode='a', header=header)
+
+    @staticmethod
+    def upsert_quotes(quotes_df, new_quotes):
+        """
+        Обновляет тексты уже сохраненных цитат и дописывает новые за одну операцию над индексом
+        :param quotes_df: DataFrame - сохраненные цитаты
+        :param new_quotes: list - новые цитаты (классы Quote)
+        :return: DataFrame - объединенная таблица
+        """
+        import pandas as pd
+
+        # старые версии сохраняли индекс таблицы отдельной колонкой, отбрасываем ее
+        quotes_df = quotes_df.reindex(columns=QUOTE_COLUMNS)
+        new_df = pd.DataFrame([[nc.book.name, nc.book.author, nc.text, nc.book.link, nc.link] for nc in new_quotes],
+                              columns=QUOTE_COLUMNS).drop_duplicates('Quote link', keep='last')
+
+        new_texts = quotes_df['Quote link'].map(new_df.set_index('Quote link')['Quote text'])
+        quotes_df['Quote text'] = new_texts.where(new_texts.notna(), quotes_df['Quote text'])
+
+        added_df = new_df[~new_df['Quote link'].isin(quotes_df['Quote link'])]
+        if added_df.empty:
+            return quotes_df
+        if quotes_df.empty:
+            return added_df.reset_index(drop=True)
+        return pd.concat([quotes_df, added_df], ignore_index=True)
 
     def format_quote_text(self, text):
         """
@@ -165,3 +501,18 @@ class QuoteLoader:
         if "/quote/" in link:
             return link
         return None
+
+
+def parse_quote_page(raw, quote_file, base_url=LIVELIB_URL):
+    """
+    Разбирает скачанную страницу списка цитат. Вызывается в пуле процессов (см. PageFetcher.parsed_pages)
+    :param raw: string or bytes - тело страницы
+    :param quote_file: string - путь к таблице цитат (от ее формата зависит обработка текста)
+    :param base_url: string - адрес сайта, к которому достраиваются ссылки
+    :return: tuple - page_end страницы и список классов Quote
+    """
+    page = html.fromstring(raw)
+    end = page_end(page)
+    if end is not None:
+        return end, []
+    return None, QuoteLoader(AppContext(quote_file=quote_file, base_url=base_url)).parse_page(page)
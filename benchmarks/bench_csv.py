@@ -0,0 +1,90 @@
+"""
+CSV reading benchmark: time and peak allocations of reading a generated book backup with
+csv.reader over the whole file (the reader before the mmap one), with the memory-mapped
+Helpers.csv_reader.iter_csv for all columns, for the columns the link index needs and for the
+Link column alone, and of rebuilding the link index next to the table.
+
+    python -m benchmarks.bench_csv [--records 200000]
+"""
+import argparse
+import csv
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+
+from benchmarks.bench_memory import make_books
+from Helpers.book import Book
+from Helpers.csv_reader import iter_csv, iter_books_from_csv
+from Helpers.csv_writer import save_books
+from Helpers.link_index import LinkIndex
+from Helpers.merge import BOOK_FIELDS
+from export import CSV_INDEX_COLUMNS
+
+
+def read_list(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        reader = csv.reader(file, delimiter='\t')
+        next(reader, None)
+        return sum(1 for _ in list(reader))
+
+
+def read_mmap(path, columns=None):
+    return sum(1 for _ in iter_csv(path, columns))
+
+
+def rebuild_index(path):
+    index = LinkIndex(path, BOOK_FIELDS, iter_books_from_csv, partial(iter_books_from_csv, columns=CSV_INDEX_COLUMNS))
+    index.rebuild()
+    count = len(index)
+    index.close()
+    os.remove(index.path)
+    return count
+
+
+def measure(read):
+    """
+    :param read: function - читает таблицу
+    :return: tuple - время в секундах и пиковый объем выделенной памяти в байтах
+    """
+    gc.collect()
+    started = time.perf_counter()
+    read()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    read()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run(count):
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'book.csv')
+        save_books(make_books(Book, count), path)
+        cases = [
+            ('csv.reader, list', partial(read_list, path)),
+            ('mmap, all columns', partial(read_mmap, path)),
+            ('mmap, index columns', partial(read_mmap, path, list(CSV_INDEX_COLUMNS))),
+            ('mmap, Link only', partial(read_mmap, path, ['Link'])),
+            ('link index rebuild', partial(rebuild_index, path)),
+        ]
+        return os.path.getsize(path), [(name, *measure(read)) for name, read in cases]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CSV reading benchmark')
+    parser.add_argument('--records', type=int, default=200000, help='books in the table (default: 200000)')
+    args = parser.parse_args()
+
+    size, results = run(args.records)
+    print(f'{args.records} books, {size / 2 ** 20:.1f} MB')
+    print('%-22s %10s %14s' % ('reader', 'seconds', 'peak alloc, MB'))
+    for name, elapsed, peak in results:
+        print('%-22s %10.3f %14.1f' % (name, elapsed, peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
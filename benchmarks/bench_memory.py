@@ -0,0 +1,83 @@
+"""
+Memory benchmark: bytes per Book and Quote record held in a link index, for the slotted
+classes in Helpers against the previous layout with a per-instance __dict__.
+
+    python -m benchmarks.bench_memory [--records 100000]
+"""
+import argparse
+import gc
+import tracemalloc
+
+from Helpers.book import Book
+from Helpers.merge import build_index
+from Helpers.quote import Quote
+from Helpers.utils import handle_none, add_livelib
+
+
+class DictBook:
+    """Book as it was before __slots__"""
+
+    def __init__(self, link=None, status=None, name=None, author=None, rating=None, date=None):
+        self.name = handle_none(name)
+        self.author = handle_none(author)
+        self.status = handle_none(status)
+        self.rating = handle_none(rating)
+        self.date = handle_none(date)
+        self.link = add_livelib(handle_none(link))
+
+
+class DictQuote:
+    """Quote as it was before __slots__"""
+
+    def __init__(self, link, text, book=None):
+        self.link = add_livelib(handle_none(link))
+        self.text = handle_none(text)
+        self.book = book
+
+
+def make_books(book_class, count):
+    # статусы, оценки и даты повторяются, как на настоящих страницах, ссылки и названия у каждой книги свои
+    return [book_class(f'/book/{idx}-book-{idx}', 'read', f'Book {idx}', f'Author {idx % 1000}',
+                       str(idx % 5 + 1), '2024-01-01') for idx in range(count)]
+
+
+def make_quotes(quote_class, book_class, count):
+    books = make_books(book_class, count // 10 + 1)
+    return [quote_class(f'/quote/{idx}-quote-{idx}', f'Quote text {idx}', books[idx // 10]) for idx in range(count)]
+
+
+def measure(build):
+    """
+    :param build: function - строит набор объектов
+    :return: int - сколько байт занимает построенный набор
+    """
+    gc.collect()
+    tracemalloc.start()
+    records = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return size
+
+
+def run(count):
+    cases = [
+        ('books', lambda: build_index(make_books(DictBook, count)), lambda: build_index(make_books(Book, count))),
+        ('quotes', lambda: build_index(make_quotes(DictQuote, DictBook, count)),
+         lambda: build_index(make_quotes(Quote, Book, count))),
+    ]
+    return [(name, measure(before) / count, measure(after) / count) for name, before, after in cases]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='record memory benchmark')
+    parser.add_argument('--records', type=int, default=100000, help='records in the index (default: 100000)')
+    args = parser.parse_args()
+
+    print('%-8s %14s %14s %8s' % ('records', '__dict__, B', '__slots__, B', 'saved'))
+    for name, before, after in run(args.records):
+        print('%-8s %14.0f %14.0f %7.0f%%' % (name, before, after, 100 * (1 - after / before)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Parser micro-benchmark: per-page parse time of book and quote list pages with the
+precompiled XPath registry (Helpers.xpaths) against the same queries passed as strings,
+and the throughput of a crawl served from memory (as from the cache) with pages parsed
+in the download threads or in a pool of parser processes.
+
+    python -m benchmarks.bench_parser [--items 1000 5000] [--repeat 5] [--pages 64] [--processes 1 2 4]
+"""
+import argparse
+import time
+import timeit
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from lxml import html
+
+from Helpers import xpaths
+from Helpers.parser_pool import ParserPool
+from Modules.AppContext import AppContext
+from Modules.BookLoader import BookLoader
+from Modules.QuoteLoader import QuoteLoader
+from tests.fixtures.mock_html import make_book_list_page, make_quote_list_page, MOCK_EMPTY_PAGE
+
+
+@contextmanager
+def string_xpaths():
+    """Temporarily replace every compiled expression in the registry with its source string"""
+    saved = {name: value for name, value in vars(xpaths).items() if name.isupper()}
+    for name, value in saved.items():
+        setattr(xpaths, name, tuple(x.path for x in value) if isinstance(value, tuple) else value.path)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(xpaths, name, value)
+
+
+def time_parse(parse, page, repeat):
+    """Best-of-`repeat` time of a single parse call, in milliseconds"""
+    return min(timeit.repeat(lambda: parse(page), number=1, repeat=repeat)) * 1000
+
+
+def run(items, repeat):
+    app_context = AppContext(quote_file='benchmark.csv')
+    book_loader = BookLoader(app_context)
+    quote_loader = QuoteLoader(app_context)
+    cases = [
+        ('books', lambda page: book_loader.parse_page(page, 'read'), make_book_list_page),
+        ('quotes', quote_loader.parse_page, make_quote_list_page),
+    ]
+
+    results = []
+    for count in items:
+        for name, parse, make_page in cases:
+            page = html.fromstring(make_page(count))
+            with string_xpaths():
+                before = time_parse(parse, page, repeat)
+            after = time_parse(parse, page, repeat)
+            results.append((name, count, before, after))
+    return results
+
+
+def run_crawl(pages, items, processes):
+    """
+    Crawl of `pages` book pages with `items` books each, downloaded instantly from memory
+    :return: list - pairs (parser processes, pages per second); 0 processes - parsing in the download threads
+    """
+    raw = [make_book_list_page(items, start=idx * items) for idx in range(pages)]
+
+    def download(link, driver=None, downloader=None):
+        idx = int(link.split('~')[-1])
+        return raw[idx - 1] if idx <= pages else MOCK_EMPTY_PAGE
+
+    results = []
+    for count in [0] + processes:
+        app_context = AppContext(user_href='https://www.livelib.ru/reader/benchmark', min_delay=0, max_delay=-1,
+                                 workers=4)
+        if count:
+            app_context.parser_pool = ParserPool(count)
+            # процессы запускаются при первой странице, их старт не входит в замер
+            for _ in range(count):
+                app_context.parser_pool.submit(len, '').result()
+        with patch('Modules.PageFetcher.download_page', side_effect=download):
+            started = time.perf_counter()
+            BookLoader(app_context).get_books('read')
+            elapsed = time.perf_counter() - started
+        if count:
+            app_context.parser_pool.close()
+        results.append((count, pages / elapsed))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='parser micro-benchmark')
+    parser.add_argument('--items', type=int, nargs='+', default=[1000, 5000],
+                        help='entries per generated page (default: 1000 5000)')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement, best is reported')
+    parser.add_argument('--pages', type=int, default=64, help='pages in the in-memory crawl (default: 64)')
+    parser.add_argument('--page_items', type=int, default=500, help='books per crawled page (default: 500)')
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4],
+                        help='parser pool sizes to compare with parsing in the threads (default: 1 2 4)')
+    args = parser.parse_args()
+
+    print('%-8s %8s %14s %14s %8s' % ('page', 'items', 'strings, ms', 'compiled, ms', 'speedup'))
+    for name, count, before, after in run(args.items, args.repeat):
+        print('%-8s %8d %14.1f %14.1f %7.2fx' % (name, count, before, after, before / after))
+
+    print('\n%-12s %12s %8s' % ('parsers', 'pages/s', 'speedup'))
+    results = run_crawl(args.pages, args.page_items, args.processes)
+    for count, rate in results:
+        print('%-12s %12.1f %7.2fx' % (count or 'threads', rate, rate / results[0][1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Replay benchmark: runs export.py end to end against the local stand-in of the site
+(benchmarks/mock_site.py) with the pauses between requests disabled, and reports throughput,
+peak RSS of the export process and the stage timings from its --metrics summary.
+Every run is appended to a results file together with the commit it was measured on, so that
+results can be compared across commits.
+
+    python -m benchmarks.bench_replay [--pages 50] [--items 20] [--latency 0.02] [--error_rate 0]
+                                      [--workers 1 4] [--drivers requests async] [--compare 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_site import MockSite, SECTIONS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, 'benchmarks', 'replay_results.jsonl')
+
+
+def git_revision():
+    """
+    :return: string - короткий хэш текущего коммита, с пометкой +dirty при незакоммиченных изменениях
+    """
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return revision + ('+dirty' if dirty else '')
+
+
+def run_export(base_url, workdir, driver, workers, extra=()):
+    """
+    Запускает полный обход export.py в отдельном процессе
+    :param base_url: string - адрес заглушки сайта
+    :param workdir: string - каталог для таблиц и сводки метрик
+    :param driver: string - драйвер загрузки (requests/async)
+    :param workers: int - число потоков загрузки
+    :param extra: tuple - дополнительные аргументы export.py
+    :return: tuple - время обхода в секундах, пиковый RSS в мегабайтах, сводка метрик
+    """
+    metrics_path = os.path.join(workdir, 'metrics.json')
+    command = [sys.executable, 'export.py', 'bench', '-R', '--base_url', base_url,
+               '-b', os.path.join(workdir, 'book.csv'), '-q', os.path.join(workdir, 'quote.csv'),
+               '--min_delay', '0', '--max_delay', '0', '--pace_file', os.path.join(workdir, 'pace.json'),
+               '--metrics', metrics_path, '--driver', driver, '--workers', str(workers), *extra]
+    started = time.perf_counter()
+    with open(os.path.join(workdir, 'export.log'), 'w') as log:
+        process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=log)
+        # wait4 отдает ресурсы именно этого процесса, а не максимум по всем завершившимся потомкам
+        _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f'export.py exited with {process.returncode}, see {log.name}')
+    # ru_maxrss в килобайтах в Linux и в байтах в macOS
+    peak_rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    with open(metrics_path, encoding='utf-8') as file:
+        return elapsed, peak_rss, json.load(file)
+
+
+def run(pages, items, latency, error_rate, drivers, workers_list, extra=()):
+    """
+    :return: list - результаты по каждому сочетанию драйвера и числа потоков
+    """
+    results = []
+    revision = git_revision()
+    for driver in drivers:
+        for workers in workers_list:
+            with MockSite(pages, items, latency, error_rate) as site, tempfile.TemporaryDirectory() as workdir:
+                elapsed, peak_rss, metrics = run_export(site.url, workdir, driver, workers, extra)
+                requests, errors = site.requests, site.errors
+            list_pages = len(SECTIONS) * pages
+            results.append({
+                'revision': revision,
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'config': {'pages': pages, 'items': items, 'latency': latency, 'error_rate': error_rate,
+                           'driver': driver, 'workers': workers, 'extra': list(extra)},
+                'seconds': round(elapsed, 3),
+                'pages_per_second': round(list_pages / elapsed, 2),
+                'items_per_second': round(list_pages * items / elapsed, 1),
+                'requests': requests,
+                'errors': errors,
+                'peak_rss_mb': round(peak_rss, 1),
+                'stages': {stage: stats['sum'] for stage, stats in metrics['stages'].items()},
+            })
+    return results
+
+
+def save_results(results, path):
+    with open(path, 'a', encoding='utf-8') as file:
+        for result in results:
+            file.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def print_results(results):
+    print('%-14s %-9s %7s %9s %9s %9s %8s  %s' % ('revision', 'driver', 'workers', 'seconds', 'pages/s', 'items/s',
+                                                  'RSS, MB', 'stages, s'))
+    for result in results:
+        stages = ' '.join(f'{stage}={seconds:.2f}' for stage, seconds in sorted(result['stages'].items()))
+        print('%-14s %-9s %7d %9.2f %9.2f %9.1f %8.1f  %s' % (
+            result['revision'], result['config']['driver'], result['config']['workers'], result['seconds'],
+            result['pages_per_second'], result['items_per_second'], result['peak_rss_mb'], stages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='end-to-end replay benchmark against a local stand-in of the site')
+    parser.add_argument('--pages', type=int, default=50, help='pages in every list (default: 50)')
+    parser.add_argument('--items', type=int, default=20, help='records on a page (default: 20)')
+    parser.add_argument('--latency', type=float, default=0.02, help='largest response delay, s (default: 0.02)')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='share of 503 responses (default: 0)')
+    parser.add_argument('--drivers', nargs='+', default=['requests'], help='drivers to run (default: requests)')
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, 4], help='download threads (default: 1 4)')
+    parser.add_argument('--results', default=RESULTS, help='file the results are appended to')
+    parser.add_argument('--compare', type=int, default=5,
+                        help='also show the last N stored results of the same configuration (default: 5)')
+    parser.add_argument('extra', nargs='*', help='more export.py arguments after --, e.g. -- --parsers 2')
+    args = parser.parse_args()
+
+    history = load_results(args.results)
+    results = run(args.pages, args.items, args.latency, args.error_rate, args.drivers, args.workers, args.extra)
+    save_results(results, args.results)
+    for result in results:
+        previous = [old for old in history if old['config'] == result['config']][-args.compare:]
+        print_results(previous + [result])
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Startup benchmark: import cost of the CLI measured with `python -X importtime export.py --help`
+(argparse exits right after the top-level imports). Fails when the median exceeds the budget or
+when a module that only a particular driver or output format needs is imported eagerly.
+
+    python -m benchmarks.bench_startup [--runs 5] [--budget 400] [--top 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# загружаются только по требованию выбранного --driver или формата файла
+LAZY_MODULES = ('selenium', 'pandas', 'numpy', 'openpyxl', 'pyarrow', 'aiohttp', 'asyncio')
+
+
+def parse_importtime(stderr):
+    """
+    :param stderr: string - вывод `-X importtime`
+    :return: list - тройки (модуль, собственное время, накопленное время) в микросекундах
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.rstrip()[1:], int(self_us), int(cumulative_us)))  # отступ - глубина вложенности
+    return rows
+
+
+def measure():
+    """
+    :return: tuple - суммарное время импорта верхнего уровня (мс) и строки importtime
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', 'export.py', '--help'], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    rows = parse_importtime(result.stderr)
+    # накопленное время модулей верхнего уровня (без отступа) уже включает все вложенные импорты
+    total = sum(cumulative for name, _, cumulative in rows if not name.startswith(' ')) / 1000
+    return total, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI startup benchmark')
+    parser.add_argument('--runs', type=int, default=5, help='interpreter starts, the median is reported')
+    parser.add_argument('--budget', type=float, default=400, help='import time budget, ms (default: 400)')
+    parser.add_argument('--top', type=int, default=10, help='slowest modules to show by self time')
+    args = parser.parse_args()
+
+    totals, rows = [], []
+    for _ in range(args.runs):
+        total, rows = measure()
+        totals.append(total)
+    median = statistics.median(totals)
+
+    print('%-50s %10s %12s' % ('module', 'self, ms', 'cumul., ms'))
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print('%-50s %10.1f %12.1f' % (name.strip(), self_us / 1000, cumulative_us / 1000))
+    print(f'\nimport time: median {median:.1f} ms over {args.runs} runs (budget {args.budget:.0f} ms)')
+
+    imported = {name.strip().split('.')[0] for name, _, _ in rows}
+    eager = sorted(imported.intersection(LAZY_MODULES))
+    failed = False
+    if eager:
+        print(f'FAIL: imported at startup: {", ".join(eager)}')
+        failed = True
+    if median > args.budget:
+        print(f'FAIL: {median:.1f} ms is over the budget')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
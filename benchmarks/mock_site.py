@@ -0,0 +1,171 @@
+"""
+Local stand-in for livelib.ru: serves synthetic reader pages built from the shapes in
+tests/fixtures/mock_html.py, so that export.py can be run end to end without the network.
+
+    /reader/<user>                      profile page
+    /reader/<user>/<status>/~N          book list pages of read/reading/wish, the empty page after the last one
+    /reader/<user>/quotes/~N            quote feed pages, the empty page after the last one
+
+Every list has `pages` pages of `items` records. A response can be delayed by up to `latency`
+seconds and fail with 503 with probability `error_rate`; both are random with a fixed seed.
+
+    python -m benchmarks.mock_site [--port 8000] [--pages 50] [--items 20] [--latency 0.05] [--error_rate 0.01]
+"""
+import argparse
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from tests.fixtures.mock_html import make_book_list_page, make_quote_list_page, MOCK_EMPTY_PAGE, MOCK_USER_PAGE
+
+SECTIONS = ('read', 'reading', 'wish', 'quotes')
+LIST_PATH = re.compile(r'^/reader/[^/]+/(%s)/~(\d+)$' % '|'.join(SECTIONS))
+USER_PATH = re.compile(r'^/reader/[^/]+/?$')
+
+
+def with_charset(page):
+    """
+    Объявляет кодировку в самой странице, как на настоящем сайте: lxml разбирает тело ответа без заголовков
+    и без объявления читал бы кириллицу (даты в списках прочитанного) как latin-1
+    :param page: string - html-страница
+    :return: string
+    """
+    return page.replace('<html>', '<html><head><meta charset="utf-8"></head>', 1)
+
+
+class MockSite:
+    """
+    HTTP-сервер с синтетическими страницами читателя в отдельном потоке
+    """
+
+    def __init__(self, pages=50, items=20, latency=0.0, error_rate=0.0, seed=0, port=0):
+        """
+        :param pages: int - сколько страниц в каждом списке
+        :param items: int - сколько записей на странице
+        :param latency: float - наибольшая задержка ответа в секундах
+        :param error_rate: float - доля ответов 503
+        :param seed: int - начальное значение генератора случайных задержек и ошибок
+        :param port: int - порт, 0 - любой свободный
+        """
+        self.pages = pages
+        self.items = items
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self.server.server_port
+
+    @property
+    def items_per_section(self):
+        return self.pages * self.items
+
+    def page(self, section, idx):
+        """
+        :param section: string - read/reading/wish/quotes
+        :param idx: int - номер страницы
+        :return: string - тело страницы; у каждой записи своя ссылка во всех разделах
+        """
+        if not 1 <= idx <= self.pages:
+            return MOCK_EMPTY_PAGE
+        if (section, idx) not in self.cache:
+            start = SECTIONS.index(section) * self.items_per_section + (idx - 1) * self.items
+            make_page = make_quote_list_page if section == 'quotes' else make_book_list_page
+            self.cache[section, idx] = make_page(self.items, start=start)
+        return self.cache[section, idx]
+
+    def respond(self, path):
+        """
+        :param path: string - путь запроса
+        :return: tuple - код ответа и тело
+        """
+        with self.lock:
+            self.requests += 1
+            delay = self.random.uniform(0, self.latency)
+            failed = self.random.random() < self.error_rate
+            self.errors += failed
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 503, 'Service Unavailable'
+        match = LIST_PATH.match(path)
+        if match:
+            return 200, with_charset(self.page(match.group(1), int(match.group(2))))
+        if USER_PATH.match(path):
+            return 200, with_charset(MOCK_USER_PAGE)
+        return 404, 'Not Found'
+
+    def start(self):
+        """
+        Запускает сервер в фоновом потоке
+        :return: string - адрес сайта для --base_url
+        """
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # постоянные соединения, как у настоящего сайта
+            # заголовки и тело уходят отдельными пакетами, с алгоритмом Нейгла каждый ответ ждал бы подтверждения
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                status, body = site.respond(self.path)
+                body = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='local livelib stand-in')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on (default: 8000)')
+    parser.add_argument('--pages', type=int, default=50, help='pages in every list (default: 50)')
+    parser.add_argument('--items', type=int, default=20, help='records on a page (default: 20)')
+    parser.add_argument('--latency', type=float, default=0.0, help='largest response delay, s (default: 0)')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='share of 503 responses (default: 0)')
+    args = parser.parse_args()
+
+    site = MockSite(args.pages, args.items, args.latency, args.error_rate, port=args.port)
+    site.start()
+    print(f'Serving {args.pages} pages of {args.items} records per list at {site.url}, Ctrl+C to stop')
+    try:
+        site.thread.join()
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,12 +2,18 @@
 Pytest configuration and shared fixtures for livelib-backup tests
 """
 import pytest
+import asyncio
 import os
+import random
 import tempfile
-from unittest.mock import Mock
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from unittest.mock import Mock, patch
 from Modules.AppContext import AppContext
 from Helpers.book import Book
 from Helpers.quote import Quote
+from tests.fixtures.mock_html import MOCK_EMPTY_PAGE
 
 
 @pytest.fixture
@@ -22,14 +28,32 @@ def app_context():
     return context
 
 
+@pytest.fixture(scope='session')
+def parser_pool():
+    """Process pool parsing pages, shared by the tests (its processes are slow to start)"""
+    from Helpers.parser_pool import ParserPool
+
+    pool = ParserPool(2)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def parquet_dir(tmp_path):
+    """Path of a parquet archive (skips the test if pyarrow is not installed)"""
+    pytest.importorskip('pyarrow')
+    return str(tmp_path / 'backup.parquet')
+
+
 @pytest.fixture
 def temp_csv_file():
     """Create a temporary CSV file for testing"""
     fd, path = tempfile.mkstemp(suffix='.csv')
     yield path
     os.close(fd)
-    if os.path.exists(path):
-        os.remove(path)
+    for name in (path, path + '.idx'):
+        if os.path.exists(name):
+            os.remove(name)
 
 
 @pytest.fixture
@@ -178,3 +202,96 @@ def mock_requests_response():
     response.text = "<html><body>Mock response</body></html>"
     response.content = b"<html><body>Mock response</body></html>"
     return response
+
+
+@pytest.fixture
+def etag_server():
+    """Local HTTP server answering with an ETag and honouring If-None-Match"""
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen.append(self.headers.get('If-None-Match'))
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = b'<html>page</html>'
+            self.send_response(200)
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:%d/reader/u' % server.server_port, seen
+    server.shutdown()
+    server.server_close()
+
+
+class FakeSite:
+    """
+    Stand-in for download_page and download_page_async. Page idx of a list link ending in ~idx is
+    content(link, idx) (idx is None for other links); None means a page past the last one and is answered
+    with `last`. content may raise to make a page fail. Every request is recorded in `requested`
+    """
+
+    def __init__(self, content, last=MOCK_EMPTY_PAGE, latency=0, jitter=False):
+        self.content = content
+        self.last = last
+        self.latency = latency
+        self.jitter = jitter
+        self.requested = []
+        self.in_flight = 0
+        self.peak = 0
+
+    @property
+    def numbers(self):
+        """Page numbers of the requested list links, in request order"""
+        return [int(link.split('~')[-1]) for link in self.requested if '~' in link]
+
+    def delay(self):
+        return random.uniform(0, self.latency) if self.jitter else self.latency
+
+    def answer(self, link):
+        self.requested.append(link)
+        page = self.content(link, int(link.split('~')[-1]) if '~' in link else None)
+        return self.last if page is None else page
+
+    def download(self, link, driver=None, downloader=None):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            if self.latency:
+                time.sleep(self.delay())
+            return self.answer(link)
+        finally:
+            self.in_flight -= 1
+
+    async def download_async(self, link, downloader=None):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay())
+            return self.answer(link)
+        finally:
+            self.in_flight -= 1
+
+    def patch(self):
+        """Serve the site to the sync page loaders"""
+        return patch('Modules.PageFetcher.download_page', side_effect=self.download)
+
+    def patch_async(self):
+        """Serve the site to the async page loaders"""
+        return patch('Modules.PageFetcher.download_page_async', side_effect=self.download_async)
+
+
+@pytest.fixture
+def fake_site():
+    """Factory of fake sites (see FakeSite): fake_site(content, last=..., latency=..., jitter=...)"""
+    return FakeSite
@@ -1,15 +1,26 @@
 import logging
-
-from selenium import webdriver
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from functools import partial
 
 from Helpers.livelib_parser import slash_add
-from Helpers.csv_reader import read_books_from_csv
-from Helpers.csv_writer import save_books
+from Helpers.checkpoint import Checkpoint
+from Helpers.csv_reader import read_books_from_csv, read_books_from_parquet, iter_books_from_csv
+from Helpers.csv_writer import save_books, update_books, is_parquet, ParquetBookWriter
+from Helpers.driver_pool import DriverPool
+from Helpers.journal import CHECKPOINT_BYTES, Journal, replace_durably
+from Helpers.link_index import LinkIndex, open_link_index
+from Helpers.merge import merge_items, build_index, iter_merge, BOOK_FIELDS
+from Helpers.page_loader import PageDownloader, AsyncPageDownloader
+from Helpers.parser_pool import ParserPool
+from Helpers.rate_limiter import TokenBucket, AdaptiveDelay, load_delay, save_delay
+from Helpers.retry import RetryPolicy, DeadLetters
+from Helpers.metrics import Metrics, merged_batches
 from Helpers.arguments import get_arguments
-import requests
 import math
 import os
 import sys
+from urllib.parse import urlsplit
 
 from Modules.AppContext import AppContext
 from Modules.BookLoader import BookLoader
@@ -17,13 +28,503 @@ from Modules.BookLoader import BookLoader
 logger = logging.getLogger(__name__)
 app_context = AppContext()
 
+STATUSES = ('read', 'reading', 'wish')
+PARQUET_INDEX_COLUMNS = ['Link', 'status', 'My Rating', 'Date']
+CSV_INDEX_COLUMNS = ('Link', 'Status', 'My Rating', 'Date')
+
 
 def get_new_items(old_data, new_data):
-    items = []
-    for new in new_data:
-        if new not in old_data and new not in items:
-            items.append(new)
-    return items
+    return merge_items(old_data, new_data, fields=()).added
+
+
+def user_name(app_context):
+    """
+    :param app_context: AppContext
+    :return: string - имя пользователя из ссылки на его страницу
+    """
+    return app_context.user_href.rstrip('/').rsplit('/', 1)[-1]
+
+
+def state_path(app_context, name):
+    """
+    Путь к служебному файлу пользователя (журналу обхода, списку незагруженных страниц) рядом с таблицей книг.
+    Архив parquet общий для всех пользователей, поэтому там файл лежит внутри каталога архива под скрытым именем,
+    которое pyarrow не читает как часть набора
+    :param app_context: AppContext
+    :param name: string - окончание имени файла
+    :return: string - путь к файлу
+    """
+    if is_parquet(app_context.book_file):
+        os.makedirs(app_context.book_file, exist_ok=True)
+        return os.path.join(app_context.book_file, f'.{user_name(app_context)}.{name}')
+    return f'{app_context.book_file}.{name}'
+
+
+def failed_pages(links):
+    """
+    Группирует незагруженные страницы по разделам
+    :param links: iterable - ссылки на страницы списков вида .../reader/<user>/<раздел>/~<номер>
+    :return: dict - раздел (статус книг или 'quotes') -> номера страниц по возрастанию
+    """
+    pages = {}
+    for link in links:
+        href, _, idx = link.rpartition('/~')
+        if idx.isdigit():
+            pages.setdefault(href.rsplit('/', 1)[-1], set()).add(int(idx))
+    return {section: sorted(numbers) for section, numbers in pages.items()}
+
+
+def load_book_index(app_context):
+    """
+    Строит индекс уже сохраненных книг (пустой в режиме rewrite_all)
+    :param app_context: AppContext
+    :return: dict or LinkIndex - словарь ссылка -> Book; для таблицы csv - индекс ссылок в файле рядом с ней
+    """
+    if app_context.rewrite_all:
+        return {}
+    if app_context.store is not None:
+        return app_context.store.book_index()
+    logger.info(f'Started reading the books from {app_context.book_file}.')
+    if is_parquet(app_context.book_file):
+        # для сравнения нужны только ссылка и сравниваемые поля, название и автор не читаются
+        return build_index(read_books_from_parquet(app_context.book_file, user_name(app_context), PARQUET_INDEX_COLUMNS))
+    if app_context.book_file.endswith('.csv'):
+        # книги не считываются в память: индекс хранит хэши ссылок и полей и перестраивается, если таблица изменилась;
+        # для его построения название и автор не читаются
+        return open_link_index(app_context.book_file, BOOK_FIELDS, iter_books_from_csv,
+                               partial(iter_books_from_csv, columns=CSV_INDEX_COLUMNS))
+    return build_index(read_books_from_csv(app_context.book_file))
+
+
+def book_journal(app_context):
+    """
+    :param app_context: AppContext
+    :return: Journal or None - журнал записи таблицы книг (у хранилища и архива parquet своя защита от сбоев)
+    """
+    if app_context.store is not None or is_parquet(app_context.book_file):
+        return None
+    return Journal(state_path(app_context, 'journal'))
+
+
+def apply_book_updates(app_context, journal, books, known=None):
+    """
+    Обновляет в таблице книги, у которых изменились статус, оценка или дата (см. csv_writer.update_books).
+    Изменения сначала записываются в журнал, поэтому прерванное обновление доводится до конца следующим запуском
+    :param app_context: AppContext
+    :param journal: Journal - журнал таблицы книг (без незакрепленных записей)
+    :param books: list - новые версии книг
+    :param known: dict or LinkIndex - индекс сохраненных книг; по LinkIndex строки находятся без чтения таблицы
+    """
+    journal.append('upsert', books)
+    index = known if isinstance(known, LinkIndex) else None
+    in_place, rewritten = update_books(books, app_context.book_file, index.offset if index is not None else None)
+    if index is not None:
+        if rewritten:  # строки сдвинулись, смещения в индексе устарели
+            index.rebuild()
+        else:
+            index.extend(in_place)
+    journal.checkpoint(app_context.book_file)
+    logger.info(f'Books updated: {len(books)}, in place: {len(in_place)}'
+                f'{", the table was rewritten" if rewritten else ""}.')
+
+
+def recover_books(app_context):
+    """
+    Доводит до конца запись книг, прерванную сбоем: переносит в таблицу записи, оставшиеся в журнале.
+    В режиме rewrite_all журнал просто очищается - таблица все равно будет собрана заново
+    :param app_context: AppContext
+    """
+    journal = book_journal(app_context)
+    if journal is None or not journal.pending():
+        return
+    if app_context.rewrite_all:
+        journal.clear()
+        return
+    def update(books):
+        if os.path.exists(app_context.book_file):
+            update_books(books, app_context.book_file)
+
+    restored = journal.replay(app_context.book_file, save_books, update)
+    logger.warning(f'{restored} books were restored from {journal.path} after an interrupted run.')
+
+
+def open_checkpoints(app_context, skip=None, resume=False):
+    """
+    Открывает журналы обхода разделов; они лежат рядом с таблицами, поэтому у каждого пользователя свои
+    :param app_context: AppContext
+    :param skip: string - пропускаемый раздел (books/quotes)
+    :param resume: bool - продолжить прерванный обход (иначе журналы начинаются заново)
+    :return: dict - словарь раздел (статус книг или 'quotes') -> Checkpoint
+    """
+    paths = {}
+    if skip != 'books':
+        paths.update({status: state_path(app_context, f'{status}.checkpoint') for status in STATUSES})
+    if skip != 'quotes':
+        paths['quotes'] = f'{app_context.quote_file}.checkpoint'
+
+    checkpoints = {section: Checkpoint(path, resume) for section, path in paths.items()}
+    for section, checkpoint in checkpoints.items():
+        if checkpoint.done:
+            logger.info(f'The section "{section}" was already crawled, restoring it from {checkpoint.path}.')
+        elif checkpoint.page:
+            logger.info(f'Resuming the section "{section}" from page {checkpoint.page + 1}.')
+    return checkpoints
+
+
+def iter_books(app_context, read_count=math.inf, known=None, checkpoints=None):
+    """
+    Скачивает книги всех статусов по очереди, отдавая их по мере разбора страниц
+    :param app_context: AppContext
+    :param read_count: int - максимальное число страниц прочитанных книг
+    :param known: dict or None - индекс сохраненных книг для раннего завершения обхода (см. BookLoader.iter_books)
+    :param checkpoints: dict or None - журналы обхода по статусам (см. open_checkpoints)
+    :return: generator - классы Book
+    """
+    bl = BookLoader(app_context)
+    checkpoints = checkpoints or {}
+    for status in STATUSES:
+        logger.info(f'Started parsing the book pages with status "{status}".')
+        yield from bl.iter_books(status, read_count if status == 'read' else math.inf, known,
+                                 checkpoints.get(status))
+        logger.info(f'The book pages with status "{status}" were parsed.')
+
+
+async def load_all_async(app_context, read_count=math.inf, skip=None, pool_size=10, known_books=None,
+                         known_quotes=None, checkpoints=None, per_host=None):
+    """
+    Скачивает книги всех статусов и цитаты одновременно в одном цикле событий
+    :param app_context: AppContext
+    :param read_count: int - максимальное число страниц прочитанных книг
+    :param skip: string - пропускаемый раздел (books/quotes)
+    :param pool_size: int - число одновременно открытых соединений
+    :param known_books: dict or None - индекс сохраненных книг для раннего завершения обхода
+    :param known_quotes: dict or None - индекс сохраненных цитат для раннего завершения обхода
+    :param checkpoints: dict or None - журналы обхода разделов (см. open_checkpoints)
+    :param per_host: int or None - сколько запросов к одному хосту может идти одновременно
+    :return: tuple - список книг (или None) и список цитат (или None)
+    """
+    import asyncio
+    from Modules.QuoteLoader import QuoteLoader
+
+    cache = getattr(app_context.downloader, 'cache', None)
+    checkpoints = checkpoints or {}
+    async with AsyncPageDownloader(pool_size=pool_size, cache=cache, per_host=per_host) as downloader:
+        ac = replace(app_context, downloader=downloader)
+        sections = []
+        if skip != 'books':
+            bl = BookLoader(ac)
+            sections += [bl.get_books_async(status, read_count if status == 'read' else math.inf, known_books,
+                                            checkpoints.get(status)) for status in STATUSES]
+        if skip != 'quotes':
+            sections.append(QuoteLoader(ac).get_quotes_async(known_quotes, checkpoints.get('quotes')))
+        logger.info('Started parsing the book and quote pages concurrently.')
+        results = await asyncio.gather(*sections)
+
+    books = [book for result in results[:len(STATUSES)] for book in result] if skip != 'books' else None
+    quotes = results[-1] if skip != 'quotes' else None
+    return books, quotes
+
+
+def save_new_books(app_context, books, known, batch_size=100, report_missing=True):
+    """
+    Дописывает в таблицу книги, которых в ней еще нет, пачками по мере их загрузки.
+    Каждая пачка сначала записывается в журнал (см. Journal), так что после сбоя она не теряется.
+    В режиме rewrite_all таблица собирается во временном файле и подменяет старую только после обхода
+    (в архиве parquet старые файлы пользователя удаляются после успешной записи новых).
+    У сохраненных книг, изменивших статус, оценку или дату, эти поля обновляются в таблице (см. apply_book_updates);
+    в архив parquet их новые версии дописываются, а прежние строки удаляются (см. ParquetBookWriter.drop_links).
+    Если задано хранилище (ac.store), новые и измененные книги записываются в него, а таблица не трогается
+    :param app_context: AppContext
+    :param books: iterable - свежие книги (классы Book)
+    :param known: dict - индекс сохраненных книг (см. load_book_index)
+    :param batch_size: int - сколько новых книг накапливать перед записью на диск
+    :param report_missing: bool - сообщать, сколько сохраненных книг не нашлось на сайте (только после полного обхода)
+    """
+    store = app_context.store
+    parquet = store is None and is_parquet(app_context.book_file)
+    target = app_context.book_file + '.tmp' if app_context.rewrite_all and not parquet else app_context.book_file
+    if store is not None:
+        write = store.upsert_books
+    elif parquet:
+        # в архиве parquet старые файлы не трогаются до конца обхода, новые книги пишутся в новые файлы
+        writer = ParquetBookWriter(app_context.book_file, user_name(app_context))
+        write = writer.write
+    else:
+        journal = None if app_context.rewrite_all else book_journal(app_context)
+        if app_context.rewrite_all:
+            open(target, 'w').close()
+
+        def write(batch):
+            position = os.path.getsize(target) if os.path.exists(target) else 0
+            if journal is not None:
+                journal.append('add', batch, position)
+            save_books(batch, target)
+            if isinstance(known, LinkIndex):
+                known.extend_from(position)
+            if journal is not None and journal.size > CHECKPOINT_BYTES:
+                journal.checkpoint(target)
+
+    changed, seen = [], set()
+    added = 0
+    completed = False
+    try:
+        for batch in merged_batches(app_context.metrics, books,
+                                    lambda items: iter_merge(known, items, changed=changed, seen=seen), batch_size):
+            with app_context.measure('write'):
+                write(batch)
+            added += len(batch)
+            logger.info(f'{added} new books were written to {store.path if store is not None else target}.')
+        if parquet and changed:
+            # новые версии измененных книг идут в файлы этого запуска, прежние строки удаляются после их записи
+            with app_context.measure('write'):
+                writer.write(changed)
+        completed = True
+    finally:
+        if parquet:  # прерванная перезапись не должна оставить в архиве и старые, и новые файлы
+            writer.close(commit=completed or not app_context.rewrite_all)
+
+    if store is not None:
+        store.upsert_books(changed)
+        if app_context.rewrite_all:
+            store.retain('books', seen)
+    elif parquet:
+        if app_context.rewrite_all:
+            writer.drop_other_files()
+        elif changed:
+            writer.drop_links(book.link for book in changed)
+    else:
+        save_books([], target)
+        if app_context.rewrite_all:
+            replace_durably(target, app_context.book_file)
+            logger.info(f'The old books were replaced in {app_context.book_file}.')
+        else:
+            journal.checkpoint(target)
+            # у сохраненных книг меняются статус, оценка и дата, ссылка остается прежней
+            if changed:
+                apply_book_updates(app_context, journal, changed, known)
+            if isinstance(known, LinkIndex):
+                known.save()
+
+    logger.info(f'Books added: {added}, changed: {len(changed)}.')
+    # при раннем завершении обхода непросмотренные книги не считаются пропавшими
+    if report_missing and not app_context.stop_after:
+        logger.info(f'Books not found on the site: {len(known) - sum(link in known for link in seen)}.')
+    logger.info(f'The books were written to {store.path if store is not None else app_context.book_file}.')
+
+
+def retry_failed_pages(app_context, known_books, known_quotes, skip=None, batch_size=100):
+    """
+    Загружает только страницы из списка незагруженных (ac.dead_letters) и дописывает найденное в копию.
+    Страницы, которые не загрузятся и теперь, снова попадут в список. Новый список собирается в отдельном файле
+    и заменяет старый только после прохода, так что прерванная повторная загрузка не теряет страниц
+    :param app_context: AppContext
+    :param known_books: dict or None - индекс сохраненных книг
+    :param known_quotes: dict or None - индекс сохраненных цитат
+    :param skip: string - пропускаемый раздел (books/quotes), его страницы остаются в списке
+    :param batch_size: int - сколько новых записей накапливать перед записью на диск
+    """
+    from Modules.QuoteLoader import QuoteLoader
+
+    dead_letters = app_context.dead_letters
+    links = dead_letters.links()
+    pages = failed_pages(links)
+    failed = DeadLetters(dead_letters.path + '.retry')
+    failed.clear()  # остаток прерванной повторной загрузки
+    skipped = STATUSES if skip == 'books' else ('quotes',) if skip == 'quotes' else ()
+    for link in links:
+        if link.rpartition('/~')[0].rsplit('/', 1)[-1] in skipped:
+            failed.add(link, RuntimeError('skipped'))
+    logger.info(f'Retrying {sum(len(pages[section]) for section in pages if section not in skipped)} failed pages.')
+
+    # явно заданные страницы загружаются все, без остановки на страницах без новых записей
+    ac = replace(app_context, stop_after=0, dead_letters=failed)
+    if skip != 'books' and any(status in pages for status in STATUSES):
+        bl = BookLoader(ac)
+        books = (book for status in STATUSES if status in pages
+                 for book in bl.iter_books(status, pages=pages[status]))
+        # загружаются не все страницы списков, так что непросмотренные книги не считаются пропавшими
+        save_new_books(ac, books, known_books, batch_size, report_missing=False)
+    if skip != 'quotes' and 'quotes' in pages:
+        ql = QuoteLoader(ac)
+        ql.save_quotes_stream(ql.iter_quotes(known_quotes, pages=pages['quotes']), known_quotes, batch_size)
+    dead_letters.replace_with(failed)
+
+
+def export_views(app_context, skip=None, batch_size=1000):
+    """
+    Собирает таблицы книг и цитат (csv/xlsx) из хранилища
+    :param app_context: AppContext - с заданным хранилищем (ac.store)
+    :param skip: string - пропускаемый раздел (books/quotes)
+    :param batch_size: int - сколько записей переносить за раз
+    """
+    from Modules.QuoteLoader import QuoteLoader
+
+    store = app_context.store
+    ac = replace(app_context, rewrite_all=True, store=None, stop_after=0)
+    if skip != 'books':
+        save_new_books(ac, store.iter_books(), {}, batch_size)
+    if skip != 'quotes':
+        QuoteLoader(ac).save_quotes_stream(store.iter_quotes(), {}, batch_size)
+
+
+def read_users(file_path):
+    """
+    Считывает список пользователей: по одному имени в строке, пустые строки и строки с # пропускаются
+    :param file_path: string - путь к файлу
+    :return: list - имена пользователей без повторов, в порядке файла
+    """
+    with open(file_path, encoding='utf-8') as file:
+        users = [line.strip() for line in file]
+    return list(dict.fromkeys(user for user in users if user and not user.startswith('#')))
+
+
+def user_path(template, default, user):
+    """
+    :param template: string or None - путь из командной строки, {user} заменяется именем пользователя
+    :param default: string - путь по умолчанию с %s вместо имени
+    :param user: string - имя пользователя
+    :return: string - путь к файлу пользователя
+    """
+    return template.replace('{user}', user) if template else default % user
+
+
+def backup_user(app_context, user, args):
+    """
+    Делает резервную копию книг и цитат одного пользователя
+    :param app_context: AppContext - общий для всех пользователей (загрузчик, ограничитель частоты, драйвер)
+    :param user: string - имя пользователя
+    :param args: Namespace - аргументы командной строки
+    :return: bool - удалось ли сделать копию
+    """
+    from Modules.QuoteLoader import QuoteLoader
+
+    app_context = replace(app_context, user_href=slash_add(slash_add(args.base_url.rstrip('/'), 'reader'), user),
+                          base_url=args.base_url.rstrip('/'),
+                          book_file=user_path(args.books_backup, 'backup_%s_book.csv', user),
+                          quote_file=user_path(args.quotes_backup, 'backup_%s_quote.csv', user))
+    if args.store:
+        from Helpers.sqlite_store import open_store
+        app_context.store = open_store(args.store.replace('{user}', user))
+    try:
+        if args.export:
+            export_views(app_context, args.skip, args.batch_size)
+            logger.info(f'The tables {app_context.book_file} and {app_context.quote_file} were exported '
+                        f'from {app_context.store.path}.')
+            return True
+
+        try:
+            app_context.downloader.download(app_context.user_href)
+        except Exception as ex:
+            logger.error(f'ERROR: Some troubles with downloading {app_context.user_href}: {ex}')
+            logger.error('Double-check your username')
+            return False
+
+        if app_context.store is not None:
+            logger.info(f'Data from the page {app_context.user_href} will be saved to {app_context.store.path}')
+        else:
+            logger.info(f'Data from the page {app_context.user_href} will be saved to files {app_context.book_file} '
+                        f'and {app_context.quote_file}')
+
+        # страницы, не загруженные за все попытки, копятся до запуска с --retry_failed
+        app_context.dead_letters = DeadLetters(state_path(app_context, 'failed'))
+        if app_context.rewrite_all:
+            app_context.dead_letters.clear()
+        ql = QuoteLoader(app_context)
+        # запись, прерванная прошлым запуском, доводится до конца до того, как таблицы будут прочитаны
+        if args.skip != 'books':
+            recover_books(app_context)
+        if args.skip != 'quotes':
+            ql.recover()
+        known_books = load_book_index(app_context) if args.skip != 'books' else None
+        known_quotes = ql.load_index() if args.skip != 'quotes' and not app_context.rewrite_all else {}
+        # индексы передаются загрузчикам только в инкрементальном режиме, иначе обходятся все страницы
+        crawl_books = known_books if app_context.stop_after else None
+        crawl_quotes = known_quotes if app_context.stop_after else None
+
+        if args.retry_failed:
+            retry_failed_pages(app_context, known_books, known_quotes, args.skip, args.batch_size)
+            return True
+
+        checkpoints = open_checkpoints(app_context, args.skip, args.resume)
+
+        books, quotes = None, None
+        if args.driver == 'async':
+            import asyncio
+            books, quotes = asyncio.run(load_all_async(app_context, args.read_count, args.skip,
+                                                       max(args.pool_size, args.workers), crawl_books, crawl_quotes,
+                                                       checkpoints, args.per_host))
+
+        # страницы скачиваются, разбираются и записываются на диск потоком, в памяти держатся только индексы
+        if args.skip != 'books':
+            if books is None:
+                books = iter_books(app_context, args.read_count, crawl_books, checkpoints)
+            save_new_books(app_context, books, known_books, args.batch_size)
+
+        if args.skip != 'quotes':
+            if quotes is None:
+                logger.info(f'Started parsing the quote pages of {user}.')
+                quotes = ql.iter_quotes(crawl_quotes, checkpoints['quotes'])
+            ql.save_quotes_stream(quotes, known_quotes, args.batch_size)
+            logger.info(f'The quote pages of {user} were parsed.')
+
+        # журналы обхода удаляются, только когда оба раздела сохранены: после сбоя на цитатах --resume
+        # не обходит заново страницы книг
+        for checkpoint in checkpoints.values():
+            checkpoint.clear()
+        return True
+    finally:
+        if app_context.store is not None:
+            app_context.store.close()
+
+
+def backup_users(app_context, users, args, user_workers=1):
+    """
+    Делает резервные копии нескольких пользователей в одном процессе. Все загрузки идут через общий пул
+    соединений и общий ограничитель частоты, поэтому запросы разных пользователей чередуются, а суммарная
+    нагрузка на сайт не растет с числом пользователей
+    :param app_context: AppContext - общий контекст
+    :param users: list - имена пользователей
+    :param args: Namespace - аргументы командной строки
+    :param user_workers: int - сколько пользователей обрабатывать одновременно
+    :return: list - пользователи, копию которых сделать не удалось
+    """
+    def run(user):
+        try:
+            return backup_user(app_context, user, args)
+        except Exception as e:
+            logger.error(f'Backup of {user} failed: {e}')
+            return False
+
+    with ThreadPoolExecutor(max_workers=max(1, user_workers), thread_name_prefix='user') as pool:
+        results = list(pool.map(run, users))
+    return [user for user, ok in zip(users, results) if not ok]
+
+
+def write_metrics(metrics, cache=None, json_path=None, prometheus_path=None, openmetrics=False):
+    """
+    Подводит итог метрик запуска: пишет краткую сводку в лог и сохраняет ее в файлы
+    :param metrics: Metrics
+    :param cache: HttpCache or None - кэш ответов, его попадания добавляются в счетчики
+    :param json_path: string or None - куда сохранить сводку в json
+    :param prometheus_path: string or None - куда сохранить метрики в текстовом формате Prometheus
+    :param openmetrics: bool - сохранить в формате OpenMetrics вместо Prometheus
+    """
+    if cache is not None:
+        metrics.count('cache_hits', cache.hits)
+        metrics.count('cache_revalidated', cache.revalidated)
+        metrics.count('cache_misses', cache.misses)
+    summary = metrics.summary()
+    stages = ', '.join(f'{stage} {stats["sum"]:.1f}s/{stats["count"]}' for stage, stats in summary['stages'].items())
+    logger.info(f'Run took {summary["wall_seconds"]:.1f}s, sleeping {summary["sleep_seconds"]:.1f}s and working '
+                f'{summary["work_seconds"]:.1f}s over all threads; {summary["counters"].get("pages", 0)} pages, '
+                f'{summary["counters"].get("bytes", 0)} bytes, cache hit ratio {summary["cache_hit_ratio"]:.0%}. '
+                f'Stages: {stages or "none"}.')
+    if json_path:
+        metrics.write_json(json_path)
+        logger.info(f'The run metrics were written to {json_path}.')
+    if prometheus_path:
+        metrics.write_prometheus(prometheus_path, openmetrics)
+        logger.info(f'The run metrics were written to {prometheus_path}.')
 
 
 def configure_logging() -> None:
@@ -33,55 +534,53 @@ def configure_logging() -> None:
 if __name__ == "__main__":
     args = get_arguments()
     configure_logging()
+    users = read_users(args.users_file) if args.users_file else [args.user]
+    # модули драйверов загружаются, только если драйвер выбран
     if args.driver == 'silenium':
-        app_context.driver = webdriver.Chrome()
+        # браузеры запускаются по мере надобности, не больше одного на поток загрузки
+        app_context.driver = DriverPool(max(1, args.workers))
 
-    ll_href = 'https://www.livelib.ru/reader'
-    app_context.user_href = slash_add(ll_href, args.user)
+    app_context.workers = args.workers
+    app_context.metrics = Metrics()
+    if args.parsers:
+        app_context.parser_pool = ParserPool(args.parsers)
+    cache = None
+    if args.cache:
+        from Helpers.http_cache import HttpCache
+        cache = HttpCache(args.cache, ttl=args.cache_ttl, max_age=args.cache_max_age * 24 * 3600,
+                          max_size=args.cache_size and args.cache_size * 1024 * 1024, offline=args.offline)
+    app_context.downloader = PageDownloader(pool_size=max(args.pool_size, args.workers), cache=cache,
+                                            per_host=args.per_host)
+    app_context.cache = cache
+    # ограничитель частоты общий для всех потоков и пользователей
+    app_context.min_delay, app_context.max_delay = args.min_delay, args.max_delay
+    ll_host = urlsplit(args.base_url).netloc
+    if args.offline:  # страницы берутся из кэша, ждать незачем
+        app_context.min_delay = app_context.max_delay = 0
+    elif args.rate:
+        app_context.rate_limiter = TokenBucket(args.rate, args.burst)
+    else:
+        # пауза подстраивается под ответы сайта и начинается с той, на которой закончился прошлый запуск;
+        # --max_delay -1 (как и до адаптивной паузы) - пауза min_delay, растущая только при сопротивлении сайта
+        max_delay = args.min_delay if args.max_delay == -1 else args.max_delay
+        app_context.rate_limiter = AdaptiveDelay(args.min_delay, max_delay, load_delay(args.pace_file, ll_host))
 
-    try:
-        requests.get(app_context.user_href)
-    except Exception as ex:
-        logger.error(f'ERROR: Some troubles with downloading {app_context.user_href}:', ex)
-        logger.error('Double-check your username')
-        sys.exit(1)
-
-    app_context.book_file = args.books_backup or 'backup_%s_book.csv' % args.user
-    app_context.quote_file = args.quotes_backup or 'backup_%s_quote.csv' % args.user
-    logger.info(f'Data from the page {app_context.user_href} will be saved to files {app_context.book_file} and '
-                f'{app_context.quote_file}')
+    app_context.retry_policy = RetryPolicy(max_attempts=args.retries)
     app_context.rewrite_all = args.rewrite_all
+    app_context.quote_count = args.quote_count or math.inf
+    app_context.stop_after = 0 if args.rewrite_all else args.stop_after
 
-    if args.skip != 'books':
-        bl = BookLoader(app_context)
-        books = []
-        for status in ('read', 'reading', 'wish'):
-            logger.info(f'Started parsing the book pages with status "{status}".')
-            app_context.read_count = args.read_count if status == 'read' else math.inf
-            books = books + bl.get_books(status)
-            logger.info(f'The book pages with status "{status}" were parsed.')
-
-        new_books = []
-        if args.rewrite_all:
-            new_books = books
-            if os.path.exists(app_context.book_file):
-                os.remove(app_context.book_file)
-            logger.info(f'All books were deleted {app_context.book_file}.')
-        else:
-            logger.info(f'Started reading the books from {app_context.book_file}.')
-            books_csv = read_books_from_csv(app_context.book_file)
-
-            logger.info(f'Started calculating the newly added books.')
-            new_books = get_new_items(books_csv, books)
-
-        save_books(new_books, app_context.book_file)
-        logger.info(f'The books were written to {app_context.book_file}.')
-
-    if args.skip != 'quotes':
-        logger.info('Started parsing the quote pages.')
-        app_context.quote_count = args.quote_count or math.inf
-        from Modules.QuoteLoader import QuoteLoader
-        ql = QuoteLoader(app_context)
-        quotes = ql.get_quotes()
-        logger.info('The quote pages were parsed.')
-        ql.save_quotes(quotes)
+    try:
+        failed = backup_users(app_context, users, args, args.user_workers)
+    finally:
+        write_metrics(app_context.metrics, cache, args.metrics, args.prometheus, args.openmetrics)
+        if isinstance(app_context.rate_limiter, AdaptiveDelay):
+            save_delay(args.pace_file, ll_host, app_context.rate_limiter.delay)
+        app_context.downloader.close()
+        if app_context.driver is not None:
+            app_context.driver.close()
+        if app_context.parser_pool is not None:
+            app_context.parser_pool.close()
+    if failed:
+        logger.error(f'Backups failed for: {", ".join(failed)}')
+        sys.exit(1)
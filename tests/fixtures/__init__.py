@@ -6,7 +6,9 @@ from .mock_html import (
     MOCK_QUOTE_LIST_PAGE,
     MOCK_EMPTY_PAGE,
     MOCK_404_PAGE,
-    get_mock_html
+    get_mock_html,
+    make_book_list_page,
+    make_quote_list_page
 )
 
 __all__ = [
@@ -14,5 +16,7 @@ __all__ = [
     'MOCK_QUOTE_LIST_PAGE',
     'MOCK_EMPTY_PAGE',
     'MOCK_404_PAGE',
-    'get_mock_html'
+    'get_mock_html',
+    'make_book_list_page',
+    'make_quote_list_page'
 ]
@@ -138,6 +138,65 @@ MOCK_BOOK_DETAIL_PAGE = """
 """
 
 
+BOOK_LIST_ITEM = """
+        <div>
+            <div><div><div class="brow-data"><div>
+                <a href="/book/{idx}-book-{idx}" class="brow-book-name">Book {idx}</a>
+                <a href="/author/{idx}-author" class="brow-book-author">Author {idx}</a>
+                <div class="brow-ratings"><span><span><span>{rating}</span></span></span></div>
+            </div></div></div></div>
+        </div>"""
+
+
+QUOTE_LIST_ITEM = """
+    <article>
+        <div class="lenta-card">
+            <a href="/quote/{idx}-quote-{idx}">Quote</a>
+            <a href="/book/{idx}-book-{idx}">Book</a>
+            <blockquote>Quote text {idx}</blockquote>
+            <div class="lenta-card-book__wrapper">
+                <a class="lenta-card__book-title">Book {idx}</a>
+                <p class="lenta-card__author-wrap"><a>Author {idx}</a></p>
+            </div>
+        </div>
+    </article>"""
+
+
+def make_book_list_page(count, start=0, books_per_date=10):
+    """
+    Build a book list page shaped like livelib's reader list
+
+    Args:
+        count: Number of books on the page
+        start: Index of the first book (books get links /book/<idx>-...)
+        books_per_date: How many books share one "month year" header
+
+    Returns:
+        HTML string
+    """
+    items = []
+    for idx in range(start, start + count):
+        if (idx - start) % books_per_date == 0:
+            items.append('<div><h2>Январь %d г.</h2></div>' % (2000 + idx // books_per_date % 25))
+        items.append(BOOK_LIST_ITEM.format(idx=idx, rating=idx % 5 + 1))
+    return '<html><body><div id="booklist">%s</div></body></html>' % ''.join(items)
+
+
+def make_quote_list_page(count, start=0):
+    """
+    Build a quote list page shaped like livelib's quote feed
+
+    Args:
+        count: Number of quotes on the page
+        start: Index of the first quote (quotes get links /quote/<idx>-...)
+
+    Returns:
+        HTML string
+    """
+    items = [QUOTE_LIST_ITEM.format(idx=idx) for idx in range(start, start + count)]
+    return '<html><body>%s</body></html>' % ''.join(items)
+
+
 def get_mock_html(page_type):
     """
     Get mock HTML for different page types
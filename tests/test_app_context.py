@@ -4,6 +4,7 @@ Unit tests for AppContext class
 import pytest
 import math
 import time
+from unittest.mock import Mock, patch
 from Modules.AppContext import AppContext
 
 
@@ -106,3 +107,23 @@ class TestWaitForDelay:
             duration = time.time() - start
             assert duration >= 0
             assert duration < 2
+
+
+class TestThrottle:
+    """Tests for throttle method"""
+
+    def test_throttle_uses_rate_limiter(self):
+        """Test that the rate limiter replaces random delays when set"""
+        limiter = Mock()
+        context = AppContext(min_delay=10, max_delay=10, rate_limiter=limiter)
+        start = time.time()
+        context.throttle()
+        assert time.time() - start < 0.1
+        limiter.acquire.assert_called_once()
+
+    def test_throttle_falls_back_to_delay(self):
+        """Test that throttle sleeps the random delay without a limiter"""
+        context = AppContext(min_delay=0, max_delay=0)
+        with patch.object(context, 'wait_for_delay') as wait:
+            context.throttle()
+        wait.assert_called_once()
@@ -0,0 +1,27 @@
+"""
+Unit tests for arguments module
+"""
+import pytest
+from unittest.mock import patch
+from Helpers.arguments import get_arguments
+
+
+def parse(*argv):
+    with patch('sys.argv', ['export.py', 'user', *argv]):
+        return get_arguments()
+
+
+class TestDelayArguments:
+    """Tests for the validation of --min_delay and --max_delay"""
+
+    def test_fixed_pause_mode_accepted(self):
+        """Test that --max_delay -1 is still accepted with any --min_delay"""
+        args = parse('--min_delay', '10', '--max_delay', '-1')
+        assert (args.min_delay, args.max_delay) == (10, -1)
+
+    @pytest.mark.parametrize('argv', [('--min_delay', '10', '--max_delay', '5'), ('--max_delay', '-2')])
+    def test_invalid_bounds_rejected(self, argv, capsys):
+        """Test that inverted bounds and other negative values are rejected with a message"""
+        with pytest.raises(SystemExit):
+            parse(*argv)
+        assert '--max_delay' in capsys.readouterr().err
@@ -1,6 +1,8 @@
 """
 Unit tests for Book class
 """
+import warnings
+
 import pytest
 from Helpers.book import Book
 from Helpers.utils import handle_none, add_livelib
@@ -45,6 +47,11 @@ class TestAddLivelib:
         result = add_livelib('')
         assert result == 'https://www.livelib.ru'
 
+    def test_add_livelib_base_url(self):
+        """Test that relative links are resolved against a mirror and its own links are kept"""
+        assert add_livelib('/book/123', 'http://127.0.0.1:8000/') == 'http://127.0.0.1:8000/book/123'
+        assert add_livelib('http://127.0.0.1:8000/book/1', 'http://127.0.0.1:8000') == 'http://127.0.0.1:8000/book/1'
+
 
 class TestBook:
     """Tests for Book class"""
@@ -114,6 +121,14 @@ class TestBook:
         assert book1 != book2
         assert not (book1 != book1)
 
+    def test_book_inequality_other_type(self):
+        """Test that a book is not equal to a value of another type, without warnings"""
+        book = Book(link='/book/111')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            assert book != '/book/111'
+            assert book != None  # noqa: E711
+
     def test_book_to_list(self):
         """Test converting book to list"""
         book = Book(
@@ -130,6 +145,26 @@ class TestBook:
         assert 'Someone' in result
         assert 'wish' in result
 
+    def test_book_to_dict_field_order(self):
+        """Test that serialization follows FIELDS"""
+        book = Book(link='/book/1', status='read', name='N', author='A', rating='5', date='2024-01-01')
+        assert list(book.to_dict()) == list(Book.FIELDS)
+        assert book.to_list() == ('N', 'A', 'read', '5', '2024-01-01', 'https://www.livelib.ru/book/1')
+
+    def test_book_hash_follows_link(self):
+        """Test that equal books hash equally, so sets and dicts dedupe by link"""
+        book1 = Book(link='/book/111', name='Book A')
+        book2 = Book(link='https://www.livelib.ru/book/111', name='Book B')
+        assert hash(book1) == hash(book2)
+        assert len({book1, book2, Book(link='/book/222')}) == 2
+
+    def test_book_has_no_instance_dict(self):
+        """Test that books are slotted"""
+        book = Book(link='/book/1')
+        assert not hasattr(book, '__dict__')
+        with pytest.raises(AttributeError):
+            book.extra = 1
+
     def test_book_add_name(self):
         """Test adding name to book"""
         book = Book(link='/book/123')
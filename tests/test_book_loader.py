@@ -0,0 +1,195 @@
+"""
+Unit tests for BookLoader module
+"""
+import pytest
+import asyncio
+from lxml import html
+from Helpers.checkpoint import Checkpoint
+from Helpers.merge import build_index
+from Modules.AppContext import AppContext
+from Modules.BookLoader import BookLoader
+from tests.fixtures.mock_html import make_book_list_page
+
+
+def book_pages(pages, per_page=5):
+    """Site content for fake_site: `pages` book list pages"""
+    def content(link, idx):
+        return make_book_list_page(per_page, start=(idx - 1) * per_page) if idx <= pages else None
+    return content
+
+
+class TestParsePage:
+    """Tests for BookLoader.parse_page"""
+
+    def test_parse_page_books(self, app_context):
+        """Test that every book div becomes a Book"""
+        page = html.fromstring(make_book_list_page(12, books_per_date=10))
+        books = BookLoader(app_context).parse_page(page, 'read')
+        assert len(books) == 12
+        assert books[0].name == 'Book 0'
+        assert books[0].author == 'Author 0'
+        assert books[0].rating == '1'
+        assert books[0].link == 'https://www.livelib.ru/book/0-book-0'
+
+    def test_parse_page_dates_only_for_read(self, app_context):
+        """Test that month headers set the date of read books only"""
+        page = html.fromstring(make_book_list_page(12, books_per_date=10))
+        loader = BookLoader(app_context)
+        read = loader.parse_page(page, 'read')
+        assert read[0].date == '2000-01-01'
+        assert read[11].date == '2001-01-01'
+        wish = loader.parse_page(page, 'wish')
+        assert all(book.date == '' and book.rating == '' for book in wish)
+
+
+class TestGetBooks:
+    """Tests for BookLoader.get_books and get_books_async"""
+
+    def test_get_books(self, app_context, fake_site):
+        """Test collecting books from all pages"""
+        site = fake_site(book_pages(3))
+        with site.patch():
+            books = BookLoader(app_context).get_books('read')
+        assert len(books) == 15
+
+    def test_get_books_page_count(self, app_context, fake_site):
+        """Test that the explicit page count limits the crawl"""
+        site = fake_site(book_pages(3))
+        with site.patch():
+            books = BookLoader(app_context).get_books('read', page_count=2)
+        assert len(books) == 10
+
+    def test_iter_books_is_lazy(self, app_context, fake_site):
+        """Test that pages are downloaded only as the books are consumed"""
+        site = fake_site(book_pages(10))
+        with site.patch():
+            books = BookLoader(app_context).iter_books('read')
+            first = [next(books) for _ in range(5)]
+            books.close()
+        assert [book.name for book in first] == ['Book 0', 'Book 1', 'Book 2', 'Book 3', 'Book 4']
+        assert len(site.requested) < 3
+
+    def test_get_books_with_parser_pool(self, app_context, parser_pool, fake_site):
+        """Test that pages parsed in the process pool give the same books"""
+        site = fake_site(book_pages(3))
+        with site.patch():
+            expected = BookLoader(app_context).get_books('read')
+            app_context.parser_pool = parser_pool
+            books = BookLoader(app_context).get_books('read')
+        assert [str(b) for b in books] == [str(b) for b in expected]
+        assert [b.date for b in books] == [b.date for b in expected]
+
+    def test_get_books_async(self, app_context, fake_site):
+        """Test the coroutine version yields the same books"""
+        site = fake_site(book_pages(3))
+        with site.patch():
+            expected = BookLoader(app_context).get_books('reading')
+        with site.patch_async():
+            books = asyncio.run(BookLoader(app_context).get_books_async('reading'))
+        assert [str(b) for b in books] == [str(b) for b in expected]
+
+
+class TestIncrementalCrawl:
+    """Tests for stopping the crawl at already saved pages"""
+
+    def saved_index(self, pages, per_page=5):
+        books = []
+        for idx in range(1, pages + 1):
+            books += BookLoader(AppContext()).parse_page(
+                html.fromstring(make_book_list_page(per_page, start=(idx - 1) * per_page)), 'read')
+        return build_index(books)
+
+    def test_stops_after_stale_pages(self, app_context, fake_site):
+        """Test that paging stops after stop_after pages with only saved books"""
+        app_context.stop_after = 2
+        site = fake_site(book_pages(30))
+        with site.patch():
+            books = BookLoader(app_context).get_books('read', known=self.saved_index(30))
+        assert len(site.requested) == 2
+        assert len(books) == 10
+
+    def test_continues_while_pages_have_news(self, app_context, fake_site):
+        """Test that the count restarts on a page with a new book"""
+        app_context.stop_after = 1
+        known = self.saved_index(30)
+        del known['https://www.livelib.ru/book/12-book-12']  # book on page 3
+        site = fake_site(book_pages(30))
+        with site.patch():
+            books = BookLoader(app_context).get_books('read', known=known)
+        assert len(books) == 5
+        app_context.stop_after = 3
+        with site.patch():
+            books = BookLoader(app_context).get_books('read', known=known)
+        assert len(books) == 30
+
+    def test_changed_book_is_news(self, app_context, fake_site):
+        """Test that a saved book with a new status keeps the crawl going"""
+        app_context.stop_after = 1
+        known = self.saved_index(30)
+        known['https://www.livelib.ru/book/0-book-0'].status = 'wish'
+        site = fake_site(book_pages(30))
+        with site.patch():
+            books = BookLoader(app_context).get_books('read', known=known)
+        assert len(books) == 10
+
+    def test_without_index_reads_everything(self, app_context, fake_site):
+        """Test that stop_after alone does not stop the crawl"""
+        app_context.stop_after = 1
+        site = fake_site(book_pages(4))
+        with site.patch():
+            assert len(BookLoader(app_context).get_books('read')) == 20
+
+    def test_async_stops_after_stale_pages(self, app_context, fake_site):
+        """Test early stop in the coroutine version"""
+        app_context.stop_after = 1
+        site = fake_site(book_pages(30))
+        with site.patch_async():
+            books = asyncio.run(BookLoader(app_context).get_books_async('read', known=self.saved_index(30)))
+        assert len(books) == 5
+        assert len(site.requested) == 1
+
+
+class TestResume:
+    """Tests for resuming a crawl from a checkpoint"""
+
+    def test_resume_after_interruption(self, app_context, tmp_path, fake_site):
+        """Test that an interrupted crawl continues from the next page and restores parsed books"""
+        path = str(tmp_path / 'read.checkpoint')
+        site = fake_site(book_pages(4))
+
+        with site.patch():
+            books = BookLoader(app_context).iter_books('read', checkpoint=Checkpoint(path))
+            first = [next(books) for _ in range(10)]
+            books.close()  # прерывание после двух страниц
+
+        site.requested.clear()
+        with site.patch():
+            resumed = BookLoader(app_context).get_books('read', checkpoint=Checkpoint(path, resume=True))
+        assert min(site.numbers) == 3
+        assert [b.link for b in resumed[:10]] == [b.link for b in first]
+        assert len(resumed) == 20
+
+    def test_finished_section_is_not_crawled(self, app_context, tmp_path, fake_site):
+        """Test that a completed section is restored without requests"""
+        path = str(tmp_path / 'read.checkpoint')
+        site = fake_site(book_pages(2))
+        with site.patch():
+            BookLoader(app_context).get_books('read', checkpoint=Checkpoint(path))
+        site.requested.clear()
+        with site.patch():
+            books = BookLoader(app_context).get_books('read', checkpoint=Checkpoint(path, resume=True))
+        assert site.requested == []
+        assert len(books) == 10
+
+    def test_resume_async(self, app_context, tmp_path, fake_site):
+        """Test that the coroutine version continues from the checkpoint"""
+        path = str(tmp_path / 'read.checkpoint')
+        site = fake_site(book_pages(3))
+        checkpoint = Checkpoint(path)
+        checkpoint.add(1, BookLoader(app_context).parse_page(html.fromstring(site.content('x~1', 1)), 'read'))
+
+        with site.patch_async():
+            books = asyncio.run(BookLoader(app_context).get_books_async('read',
+                                                                          checkpoint=Checkpoint(path, resume=True)))
+        assert 1 not in site.numbers
+        assert len(books) == 15
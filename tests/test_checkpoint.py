@@ -0,0 +1,85 @@
+"""
+Unit tests for checkpoint module
+"""
+import pytest
+from Helpers.book import Book
+from Helpers.quote import Quote
+from Helpers.checkpoint import Checkpoint, item_from_dict, item_to_dict
+
+
+@pytest.fixture
+def checkpoint_path(tmp_path):
+    return str(tmp_path / 'backup_user_book.csv.read.checkpoint')
+
+
+class TestItemSerialization:
+    """Tests for item_to_dict and item_from_dict"""
+
+    def test_book_round_trip(self, sample_books):
+        """Test that every book field survives the round trip"""
+        book = item_from_dict(item_to_dict(sample_books[0]))
+        assert isinstance(book, Book)
+        assert book.to_dict() == sample_books[0].to_dict()
+
+    def test_quote_round_trip(self, sample_quotes):
+        """Test that a quote keeps its text and book"""
+        quote = item_from_dict(item_to_dict(sample_quotes[0]))
+        assert isinstance(quote, Quote)
+        assert (quote.link, quote.text) == (sample_quotes[0].link, sample_quotes[0].text)
+        assert quote.book.to_dict() == sample_quotes[0].book.to_dict()
+
+
+class TestCheckpoint:
+    """Tests for Checkpoint"""
+
+    def test_new_checkpoint_is_empty(self, checkpoint_path):
+        """Test a checkpoint without a file"""
+        checkpoint = Checkpoint(checkpoint_path, resume=True)
+        assert checkpoint.page == 0
+        assert not checkpoint.done
+        assert list(checkpoint.items()) == []
+
+    def test_resume_restores_pages_and_items(self, checkpoint_path, sample_books):
+        """Test that a resumed checkpoint knows the last page and the parsed books"""
+        checkpoint = Checkpoint(checkpoint_path)
+        checkpoint.add(1, sample_books[:2])
+        checkpoint.add(2, sample_books[2:])
+
+        resumed = Checkpoint(checkpoint_path, resume=True)
+        assert resumed.page == 2
+        assert not resumed.done
+        assert [book.link for book in resumed.items()] == [book.link for book in sample_books]
+
+    def test_without_resume_starts_over(self, checkpoint_path, sample_books):
+        """Test that a fresh run discards the old checkpoint"""
+        Checkpoint(checkpoint_path).add(1, sample_books)
+        checkpoint = Checkpoint(checkpoint_path)
+        assert checkpoint.page == 0
+        assert list(checkpoint.items()) == []
+
+    def test_finish(self, checkpoint_path, sample_books):
+        """Test that a finished section is remembered"""
+        checkpoint = Checkpoint(checkpoint_path)
+        checkpoint.add(1, sample_books)
+        checkpoint.finish()
+        assert Checkpoint(checkpoint_path, resume=True).done
+
+    def test_truncated_record_is_dropped(self, checkpoint_path, sample_books):
+        """Test that a half-written line is cut off and new records stay readable"""
+        checkpoint = Checkpoint(checkpoint_path)
+        checkpoint.add(1, sample_books[:1])
+        with open(checkpoint_path, 'a', encoding='utf-8') as file:
+            file.write('{"page": 2, "items": [{"na')
+
+        resumed = Checkpoint(checkpoint_path, resume=True)
+        assert resumed.page == 1
+        resumed.add(2, sample_books[1:2])
+        assert Checkpoint(checkpoint_path, resume=True).page == 2
+        assert len(list(resumed.items())) == 2
+
+    def test_clear(self, checkpoint_path, sample_books):
+        """Test that clear removes the file"""
+        checkpoint = Checkpoint(checkpoint_path)
+        checkpoint.add(1, sample_books)
+        checkpoint.clear()
+        assert Checkpoint(checkpoint_path, resume=True).page == 0
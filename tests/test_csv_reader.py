@@ -9,8 +9,13 @@ from Helpers.csv_reader import (
     convert_csv_to_books,
     convert_csv_to_quotes,
     read_books_from_csv,
-    read_quotes_from_csv
+    read_quotes_from_csv,
+    read_books_from_parquet,
+    iter_csv,
+    iter_books_from_csv,
+    iter_links_from_csv
 )
+from Helpers.csv_writer import save_books, save_books_parquet
 from Helpers.book import Book
 from Helpers.quote import Quote
 
@@ -59,6 +64,66 @@ class TestReadCsv:
         assert result[0] == ['Война и мир', 'Толстой']
 
 
+
+class TestIterCsv:
+    """Tests for the memory-mapped iter_csv reader"""
+
+    @staticmethod
+    def write(path, text):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+
+    def test_missing_and_empty_files(self, temp_csv_file):
+        """Test that there is nothing to read without a table or a header"""
+        assert list(iter_csv('/nonexistent/file.csv')) == []
+        assert list(iter_csv(temp_csv_file)) == []
+
+    def test_rows_are_lazy(self, temp_csv_file):
+        """Test that rows are yielded one by one with their byte offsets"""
+        self.write(temp_csv_file, 'Name\tLink\nКнига\t/book/1\nBook2\t/book/2\n')
+        rows = iter_csv(temp_csv_file)
+        assert next(rows) == (10, ['Книга', '/book/1'])
+        assert next(rows) == (10 + len('Книга\t/book/1\n'.encode('utf-8')), ['Book2', '/book/2'])
+        assert next(rows, None) is None
+
+    def test_column_projection(self, temp_csv_file):
+        """Test that only the requested columns are returned, in the requested order"""
+        self.write(temp_csv_file, 'Name\tAuthor\tLink\nBook1\tAuthor1\t/book/1\nBook2\n')
+        assert [row for _, row in iter_csv(temp_csv_file, ['Link', 'Name', 'Missing'])] == \
+            [['/book/1', 'Book1', ''], ['', 'Book2', '']]
+
+    def test_quoted_multiline_record(self, temp_csv_file):
+        """Test that a quoted field spanning lines is one record and the next record follows it"""
+        self.write(temp_csv_file, 'Text\tLink\n"line 1\nline 2"\t/quote/1\nplain\t/quote/2\n')
+        rows = list(iter_csv(temp_csv_file, ['Link', 'Text']))
+        assert [row for _, row in rows] == [['/quote/1', 'line 1\nline 2'], ['/quote/2', 'plain']]
+        assert list(iter_csv(temp_csv_file, start=rows[1][0])) == [(rows[1][0], ['plain', '/quote/2'])]
+
+    def test_crlf_and_blank_lines(self, temp_csv_file):
+        """Test Windows line endings, blank lines and a missing final newline"""
+        self.write(temp_csv_file, 'Name\tLink\r\nBook1\t/book/1\r\n\r\n\nBook2\t/book/2')
+        assert [row for _, row in iter_csv(temp_csv_file)] == [['Book1', '/book/1'], ['Book2', '/book/2']]
+        assert [row for _, row in iter_csv(temp_csv_file, ['Link'])] == [['/book/1'], ['/book/2']]
+
+    def test_last_column_only(self, temp_csv_file):
+        """Test the last-column path: its place in the projection, quoted records and short rows"""
+        self.write(temp_csv_file, 'Name\tAuthor\tLink\nКнига\tАвтор\t/book/1\r\n"a\nb"\tX\t/book/2\nBook3\n')
+        assert [row for _, row in iter_csv(temp_csv_file, [None, 'Link', 'Missing'])] == \
+            [['', '/book/1', ''], ['', '/book/2', ''], ['', '', '']]
+
+    def test_links_only(self, temp_csv_file, sample_books):
+        """Test the link-only fast path against a saved table"""
+        save_books(sample_books, temp_csv_file)
+        assert list(iter_links_from_csv(temp_csv_file)) == [b.link for b in sample_books]
+
+    def test_books_projection(self, temp_csv_file, sample_books):
+        """Test that unread book fields stay empty"""
+        save_books(sample_books, temp_csv_file)
+        books = [book for _, book in iter_books_from_csv(temp_csv_file, columns=('Link', 'Status'))]
+        assert [(b.link, b.status, b.name, b.rating) for b in books] == \
+            [(b.link, b.status, '', '') for b in sample_books]
+
+
 class TestConvertCsvToBooks:
     """Tests for convert_csv_to_books function"""
 
@@ -185,3 +250,40 @@ class TestReadQuotesFromCsv:
             f.write('Book2\tAuthor2\tQuote2\t/book/2\t/quote/2\n')
         result = read_quotes_from_csv(temp_csv_file)
         assert len(result) == 2
+
+
+class TestReadBooksFromParquet:
+    """Tests for read_books_from_parquet function"""
+
+    def test_missing_archive(self, parquet_dir):
+        """Test that a missing archive gives no books"""
+        assert read_books_from_parquet(parquet_dir) == []
+
+    def test_round_trip(self, parquet_dir, sample_books):
+        """Test that all fields are restored, status from the partition"""
+        save_books_parquet(sample_books, parquet_dir, 'alice')
+        books = sorted(read_books_from_parquet(parquet_dir, 'alice'), key=lambda b: b.link)
+        assert [b.to_dict() for b in books] == [b.to_dict() for b in sorted(sample_books, key=lambda b: b.link)]
+
+    def test_filter_by_user(self, parquet_dir, sample_books):
+        """Test that other users' partitions are not returned"""
+        save_books_parquet(sample_books[:1], parquet_dir, 'alice')
+        save_books_parquet(sample_books[1:], parquet_dir, '12345')
+        assert [b.link for b in read_books_from_parquet(parquet_dir, 'alice')] == [sample_books[0].link]
+        assert len(read_books_from_parquet(parquet_dir, '12345')) == 2
+        assert len(read_books_from_parquet(parquet_dir)) == 3
+
+    def test_link_projection(self, parquet_dir, sample_books):
+        """Test that only the requested columns are read"""
+        save_books_parquet(sample_books, parquet_dir, 'alice')
+        books = read_books_from_parquet(parquet_dir, 'alice', columns=['Link'])
+        assert {b.link for b in books} == {b.link for b in sample_books}
+        assert all(b.name == '' and b.status == '' for b in books)
+
+    def test_newest_file_wins(self, parquet_dir, sample_books):
+        """Test that a book left in an older file is returned once, as written last"""
+        save_books_parquet(sample_books[:1], parquet_dir, 'alice')
+        moved = Book(link=sample_books[0].link, status='reading', name=sample_books[0].name)
+        save_books_parquet([moved], parquet_dir, 'alice')
+        books = read_books_from_parquet(parquet_dir, 'alice', columns=['Link', 'status'])
+        assert [(b.link, b.status) for b in books] == [(moved.link, 'reading')]
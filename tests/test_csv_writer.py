@@ -3,7 +3,8 @@ Unit tests for CSV writer module
 """
 import pytest
 import os
-from Helpers.csv_writer import save_books, save_quotes
+from Helpers.csv_writer import save_books, save_quotes, save_books_parquet, ParquetBookWriter, update_books
+from Helpers.csv_reader import iter_books_from_csv, read_books_from_csv, read_books_from_parquet
 from Helpers.book import Book
 from Helpers.quote import Quote
 
@@ -69,6 +70,47 @@ class TestSaveBooks:
         assert 'Толстой' in content
 
 
+
+class TestUpdateBooks:
+    """Tests for update_books function"""
+
+    @staticmethod
+    def offsets(path):
+        return {book.link: offset for offset, book in iter_books_from_csv(path)}
+
+    def test_same_length_is_updated_in_place(self, temp_csv_file, sample_books):
+        """Test that a row of the same length is overwritten where it is"""
+        save_books(sample_books, temp_csv_file)
+        size = os.path.getsize(temp_csv_file)
+        offsets = self.offsets(temp_csv_file)
+        moved = Book(link=sample_books[0].link, status='wish', name='Name from the site', rating='1', date='31.12.2024')
+        in_place, rewritten = update_books([moved], temp_csv_file, offsets.get)
+        assert not rewritten and in_place == [(offsets[moved.link], moved)]
+        assert os.path.getsize(temp_csv_file) == size
+        books = read_books_from_csv(temp_csv_file)
+        assert (books[0].status, books[0].rating, books[0].date) == ('wish', '1', '31.12.2024')
+        assert books[0].name == sample_books[0].name  # the stored name is kept
+        assert [b.to_dict() for b in books[1:]] == [b.to_dict() for b in sample_books[1:]]
+
+    def test_other_length_rewrites_table(self, temp_csv_file, sample_books):
+        """Test that a longer row is written by one atomic pass over the table, keeping the row order"""
+        save_books(sample_books, temp_csv_file)
+        moved = Book(link=sample_books[0].link, status='reading', rating='', date='')
+        in_place, rewritten = update_books([moved], temp_csv_file, self.offsets(temp_csv_file).get)
+        assert rewritten and in_place == []
+        books = read_books_from_csv(temp_csv_file)
+        assert [b.link for b in books] == [b.link for b in sample_books]
+        assert (books[0].status, books[0].name) == ('reading', sample_books[0].name)
+        assert not os.path.exists(temp_csv_file + '.tmp')
+
+    def test_without_offsets(self, temp_csv_file, sample_books):
+        """Test that books are found by a scan when their rows are not known"""
+        save_books(sample_books, temp_csv_file)
+        moved = Book(link=sample_books[2].link, status='read', rating='3', date=sample_books[2].date)
+        assert update_books([moved], temp_csv_file) == ([], True)
+        assert read_books_from_csv(temp_csv_file)[2].rating == '3'
+
+
 class TestSaveQuotes:
     """Tests for save_quotes function"""
 
@@ -134,3 +176,62 @@ class TestSaveQuotes:
             content = f.read()
         assert 'Русская цитата' in content
         assert 'Книга' in content
+
+
+class TestSaveBooksParquet:
+    """Tests for save_books_parquet and ParquetBookWriter"""
+
+    def test_partitioned_by_user_and_status(self, parquet_dir, sample_books):
+        """Test that files land in user=/status= directories"""
+        save_books_parquet(sample_books, parquet_dir, 'alice')
+        statuses = sorted(os.listdir(os.path.join(parquet_dir, 'user=alice')))
+        assert statuses == sorted(f'status={b.status}' for b in {b.status: b for b in sample_books}.values())
+
+    def test_append_adds_new_files(self, parquet_dir, sample_books):
+        """Test that every save writes a new file and never rewrites old ones"""
+        save_books_parquet(sample_books[:1], parquet_dir, 'alice')
+        status_dir = os.path.join(parquet_dir, 'user=alice', f'status={sample_books[0].status}')
+        first = os.listdir(status_dir)
+        save_books_parquet([Book(link='/book/9', status=sample_books[0].status)], parquet_dir, 'alice')
+        files = os.listdir(status_dir)
+        assert len(files) == 2
+        assert set(first) < set(files)
+
+    def test_batches_become_row_groups(self, parquet_dir):
+        """Test that each written batch is a row group of one file"""
+        import pyarrow.parquet as pq
+        with ParquetBookWriter(parquet_dir, 'alice') as writer:
+            writer.write([Book(link='/book/1', status='read')])
+            writer.write([Book(link='/book/2', status='read')])
+        status_dir = os.path.join(parquet_dir, 'user=alice', 'status=read')
+        [name] = os.listdir(status_dir)
+        assert pq.ParquetFile(os.path.join(status_dir, name)).num_row_groups == 2
+
+    def test_author_is_dictionary_encoded(self, parquet_dir, sample_books):
+        """Test the arrow type of the author column"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        save_books_parquet(sample_books[:1], parquet_dir, 'alice')
+        status_dir = os.path.join(parquet_dir, 'user=alice', f'status={sample_books[0].status}')
+        [name] = os.listdir(status_dir)
+        assert pa.types.is_dictionary(pq.read_schema(os.path.join(status_dir, name)).field('Author').type)
+
+    def test_aborted_write_leaves_no_file(self, parquet_dir):
+        """Test that an interrupted writer does not publish its file"""
+        with pytest.raises(RuntimeError):
+            with ParquetBookWriter(parquet_dir, 'alice') as writer:
+                writer.write([Book(link='/book/1', status='read')])
+                raise RuntimeError('interrupted')
+        assert os.listdir(os.path.join(parquet_dir, 'user=alice', 'status=read')) == []
+
+    def test_drop_links_removes_old_rows(self, parquet_dir, sample_books):
+        """Test that superseded rows are removed from older files and emptied files are deleted"""
+        save_books_parquet(sample_books, parquet_dir, 'alice')
+        with ParquetBookWriter(parquet_dir, 'alice') as writer:
+            writer.write([Book(link=sample_books[2].link, status='read'), Book(link=sample_books[1].link, status='read')])
+        writer.drop_links([sample_books[2].link, sample_books[1].link])
+        rows = sorted((b.link, b.status) for b in read_books_from_parquet(parquet_dir, 'alice'))
+        assert rows == sorted([(sample_books[0].link, 'read'), (sample_books[1].link, 'read'),
+                               (sample_books[2].link, 'read')])
+        assert os.listdir(os.path.join(parquet_dir, 'user=alice', f'status={sample_books[2].status}')) == []
+
@@ -0,0 +1,149 @@
+"""
+Unit tests for driver_pool module
+"""
+import pytest
+import shutil
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from lxml import html
+from selenium.common.exceptions import NoSuchElementException
+from Helpers.driver_pool import DriverPool, wait_until_ready
+from tests.fixtures.mock_html import make_book_list_page, make_quote_list_page, MOCK_EMPTY_PAGE, MOCK_404_PAGE
+
+LOCATORS = {
+    'id': '//*[@id="%s"]',
+    'tag name': '//%s',
+    'class name': '//*[contains(concat(" ", normalize-space(@class), " "), " %s ")]',
+}
+
+
+class StaticDriver:
+    """Stands in for a browser: loads pages with urllib and finds elements with lxml"""
+
+    def __init__(self, in_flight=None):
+        self.page_source = None
+        self.in_flight = in_flight
+        self.quit_called = False
+
+    def get(self, link):
+        if self.in_flight is not None:
+            with self.in_flight['lock']:
+                self.in_flight['now'] += 1
+                self.in_flight['peak'] = max(self.in_flight['peak'], self.in_flight['now'])
+        with urllib.request.urlopen(link) as response:
+            self.page_source = response.read().decode('utf-8')
+        if self.in_flight is not None:
+            with self.in_flight['lock']:
+                self.in_flight['now'] -= 1
+
+    def find_element(self, by, value):
+        found = html.fromstring(self.page_source).xpath(LOCATORS[by] % value)
+        if not found:
+            raise NoSuchElementException(f'{by}={value}')
+        return found[0].tag  # lxml elements without children are falsy, unlike WebElement
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture
+def static_site():
+    """Static HTTP server serving fixture list pages"""
+    pages = {
+        '/reader/u/read/~1': make_book_list_page(3),
+        '/reader/u/read/~2': MOCK_EMPTY_PAGE,
+        '/reader/u/quotes/~1': make_quote_list_page(2),
+        '/reader/bot': MOCK_404_PAGE,
+        '/reader/blank': '<html><body><div class="main-body"></div></body></html>',
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(0.05)
+            body = pages.get(self.path, MOCK_EMPTY_PAGE).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:%d' % server.server_port
+    server.shutdown()
+    server.server_close()
+
+
+class TestWaitUntilReady:
+    """Tests for wait_until_ready"""
+
+    @pytest.mark.parametrize('path', ['/reader/u/read/~1', '/reader/u/read/~2', '/reader/u/quotes/~1', '/reader/bot'])
+    def test_ready_on_content_or_sentinel(self, static_site, path):
+        """Test that list pages and the last/redirect sentinels are ready at once"""
+        driver = StaticDriver()
+        driver.get(static_site + path)
+        started = time.monotonic()
+        wait_until_ready(driver, timeout=5)
+        assert time.monotonic() - started < 1
+
+    def test_times_out_without_ready_element(self, static_site):
+        """Test that a page without any ready element is not accepted"""
+        driver = StaticDriver()
+        driver.get(static_site + '/reader/blank')
+        with pytest.raises(Exception):
+            wait_until_ready(driver, timeout=0.3)
+
+
+class TestDriverPool:
+    """Tests for DriverPool"""
+
+    def test_download_returns_page_source(self, static_site):
+        """Test that a page is loaded in a browser of the pool"""
+        pool = DriverPool(2, factory=StaticDriver, timeout=5)
+        page = pool.download(static_site + '/reader/u/read/~1')
+        assert 'booklist' in page
+        assert len(pool.drivers) == 1
+
+    def test_parallel_downloads_bounded_by_size(self, static_site):
+        """Test that pages load in parallel in at most `size` browsers"""
+        in_flight = {'now': 0, 'peak': 0, 'lock': threading.Lock()}
+        pool = DriverPool(3, factory=lambda: StaticDriver(in_flight), timeout=5)
+        links = [static_site + '/reader/u/read/~1'] * 9
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            pages = list(executor.map(pool.download, links))
+        assert all('booklist' in page for page in pages)
+        assert len(pool.drivers) == 3
+        assert in_flight['peak'] == 3
+
+    def test_not_ready_page_returns_none(self, static_site):
+        """Test that a page that never gets ready is reported as failed and the browser is reused"""
+        pool = DriverPool(1, factory=StaticDriver, timeout=0.3)
+        assert pool.download(static_site + '/reader/blank') is None
+        assert pool.download(static_site + '/reader/bot') is not None
+        assert len(pool.drivers) == 1
+
+    def test_close_quits_browsers(self, static_site):
+        """Test that close quits every started browser"""
+        pool = DriverPool(2, factory=StaticDriver, timeout=5)
+        with pool.acquire() as first, pool.acquire() as second:
+            pass
+        pool.close()
+        assert first.quit_called and second.quit_called
+        assert pool.drivers == []
+
+    @pytest.mark.skipif(shutil.which('chromedriver') is None, reason='chromedriver is not installed')
+    def test_headless_chrome(self, static_site):
+        """Test the real headless browser against the static server"""
+        pool = DriverPool(1, timeout=30)
+        try:
+            page = pool.download(static_site + '/reader/u/quotes/~1')
+        finally:
+            pool.close()
+        assert 'lenta-card' in page
@@ -2,9 +2,35 @@
 Unit tests for export.py functions
 """
 import pytest
-from export import get_new_items
+import asyncio
+import os
+import subprocess
+import sys
+from argparse import Namespace
+from dataclasses import replace
+from unittest.mock import Mock, patch
+from export import get_new_items, iter_books, load_all_async, load_book_index, open_checkpoints, save_new_books, \
+    export_views, read_users, backup_user, backup_users, failed_pages
+from Helpers.csv_reader import read_books_from_csv, read_books_from_parquet
 from Helpers.book import Book
+from Helpers.merge import iter_merge
 from Helpers.quote import Quote
+from Helpers.retry import DeadLetters
+from Helpers.sqlite_store import SqliteStore
+from tests.fixtures.mock_html import make_book_list_page, make_quote_list_page
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def user_pages(link, idx):
+    """Site content for fake_site: one page of two books per shelf and of two quotes for every user"""
+    if idx > 1:
+        return None
+    user = link.split('/reader/')[1].split('/')[0]
+    offset = 1000 * int(user[-1]) + 100 * ['read', 'reading', 'wish', 'quotes'].index(link.split('/')[-2])
+    if '/quotes/' in link:
+        return make_quote_list_page(2, start=offset)
+    return make_book_list_page(2, start=offset)
 
 
 class TestGetNewItems:
@@ -96,3 +122,456 @@ class TestGetNewItems:
         ]
         result = get_new_items(old_data, new_data)
         assert result == []
+
+
+class TestLoadAllAsync:
+    """Tests for load_all_async"""
+
+    @staticmethod
+    def section_pages(pages):
+        """Site content for fake_site: `pages` pages of two books or quotes in every section"""
+        def content(link, idx):
+            if idx > pages:
+                return None
+            if '/quotes/' in link:
+                return make_quote_list_page(2, start=idx * 10)
+            return make_book_list_page(2, start=idx * 10)
+        return content
+
+    def test_sections_crawl_concurrently(self, app_context, fake_site):
+        """Test that all sections share one loop and overlap in time"""
+        site = fake_site(self.section_pages(3), latency=0.05)
+        with site.patch_async():
+            books, quotes = asyncio.run(load_all_async(app_context))
+        assert len(books) == 3 * 3 * 2
+        assert len(quotes) == 3 * 2
+        assert {book.status for book in books} == {'read', 'reading', 'wish'}
+        # sections crawled one after another would never have more than one request in flight
+        assert site.peak == 4
+
+    def test_skip_sections(self, app_context, fake_site):
+        """Test that skipped sections are not crawled"""
+        with fake_site(self.section_pages(1)).patch_async():
+            books, quotes = asyncio.run(load_all_async(app_context, skip='quotes'))
+        assert quotes is None
+        assert len(books) == 3 * 2
+
+        with fake_site(self.section_pages(1)).patch_async():
+            books, quotes = asyncio.run(load_all_async(app_context, skip='books'))
+        assert books is None
+        assert len(quotes) == 2
+
+    def test_read_count_limits_read_section(self, app_context, fake_site):
+        """Test that read_count only limits the read section"""
+        with fake_site(self.section_pages(3)).patch_async():
+            books, _ = asyncio.run(load_all_async(app_context, read_count=1, skip='quotes'))
+        assert len([b for b in books if b.status == 'read']) == 2
+        assert len([b for b in books if b.status == 'wish']) == 6
+
+
+class TestSaveNewBooks:
+    """Tests for load_book_index and save_new_books"""
+
+    def test_save_only_added_books(self, app_context, temp_csv_file, sample_books):
+        """Test that only books missing from the index are appended"""
+        app_context.book_file = temp_csv_file
+        save_new_books(app_context, sample_books[:2], load_book_index(app_context))
+        save_new_books(app_context, sample_books, load_book_index(app_context))
+        assert [b.link for b in read_books_from_csv(temp_csv_file)] == [b.link for b in sample_books]
+
+    def test_rewrite_all_ignores_saved_books(self, app_context, temp_csv_file, sample_books):
+        """Test that rewrite mode starts from an empty index and file"""
+        app_context.book_file = temp_csv_file
+        save_new_books(app_context, sample_books, load_book_index(app_context))
+        app_context.rewrite_all = True
+        assert load_book_index(app_context) == {}
+        save_new_books(app_context, sample_books[:1], load_book_index(app_context))
+        assert len(read_books_from_csv(temp_csv_file)) == 1
+
+    def test_save_writes_in_batches(self, app_context, temp_csv_file, sample_books):
+        """Test that new books are flushed to disk every batch_size items while the stream is consumed"""
+        app_context.book_file = temp_csv_file
+        sizes = []
+
+        def stream():
+            for book in sample_books:
+                sizes.append(len(read_books_from_csv(temp_csv_file)))
+                yield book
+
+        save_new_books(app_context, stream(), {}, batch_size=2)
+        assert sizes == [0, 0, 2]
+        assert len(read_books_from_csv(temp_csv_file)) == 3
+
+    def test_save_skips_duplicates_in_stream(self, app_context, temp_csv_file, sample_books):
+        """Test that a book repeated in the stream is written once"""
+        app_context.book_file = temp_csv_file
+        save_new_books(app_context, iter(sample_books + sample_books[:1]), {}, batch_size=1)
+        assert len(read_books_from_csv(temp_csv_file)) == 3
+
+    def test_rewrite_keeps_old_file_until_done(self, app_context, temp_csv_file, sample_books):
+        """Test that an interrupted rewrite leaves the previous backup untouched"""
+        app_context.book_file = temp_csv_file
+        save_new_books(app_context, sample_books, {})
+        app_context.rewrite_all = True
+
+        def broken_stream():
+            yield sample_books[0]
+            raise ConnectionError('network is down')
+
+        with pytest.raises(ConnectionError):
+            save_new_books(app_context, broken_stream(), {}, batch_size=1)
+        assert len(read_books_from_csv(temp_csv_file)) == 3
+
+    def test_changed_books_are_updated(self, app_context, temp_csv_file, sample_books):
+        """Test that a book which moved to another list gets its new status, rating and date in the table"""
+        app_context.book_file = temp_csv_file
+        save_new_books(app_context, sample_books, load_book_index(app_context))
+        moved = [Book(link=sample_books[0].link, status='wish', rating='', date='2025-01-01'),
+                 Book(link=sample_books[1].link, status='read', rating='5', date='2025-02-01')]
+        save_new_books(app_context, moved + sample_books[2:], load_book_index(app_context))
+        books = read_books_from_csv(temp_csv_file)
+        assert [(b.link, b.status, b.rating, b.date) for b in books[:2]] == \
+            [(b.link, b.status, b.rating, b.date) for b in moved]
+        assert len(books) == len(sample_books)
+        changed = []  # the index next to the table knows the new versions
+        assert list(iter_merge(load_book_index(app_context), moved, changed=changed)) == []
+        assert changed == []
+
+    def test_same_length_change_is_written_in_place(self, app_context, temp_csv_file, sample_books):
+        """Test that a status change of the same length only overwrites its row, found through the link index"""
+        app_context.book_file = temp_csv_file
+        save_new_books(app_context, sample_books, load_book_index(app_context))
+        size = os.path.getsize(temp_csv_file)
+        moved = Book(link=sample_books[0].link, status='wish', rating='5', date='01.01.2024')
+        with patch('Helpers.journal.replace_durably') as rewrite:
+            save_new_books(app_context, [moved], load_book_index(app_context))
+        rewrite.assert_not_called()
+        assert os.path.getsize(temp_csv_file) == size
+        assert [b.status for b in read_books_from_csv(temp_csv_file)] == ['wish', 'reading', 'wish']
+
+    def test_iter_books_streams_all_statuses(self, app_context, fake_site):
+        """Test that iter_books chains the statuses lazily"""
+        with fake_site(lambda link, idx: make_book_list_page(2) if idx == 1 else None).patch():
+            books = iter_books(app_context)
+            assert next(books).status == 'read'
+            assert [book.status for book in books] == ['read', 'reading', 'reading', 'wish', 'wish']
+
+
+class Interrupted(BaseException):
+    """Stands in for Ctrl+C: not swallowed by the page loaders, unlike ordinary errors"""
+
+
+class TestCheckpoints:
+    """Tests for open_checkpoints"""
+
+    def test_checkpoints_next_to_backups(self, app_context, tmp_path):
+        """Test that every section gets its own checkpoint file beside its table"""
+        app_context.book_file = str(tmp_path / 'backup_user_book.csv')
+        app_context.quote_file = str(tmp_path / 'backup_user_quote.csv')
+        checkpoints = open_checkpoints(app_context)
+        assert set(checkpoints) == {'read', 'reading', 'wish', 'quotes'}
+        assert checkpoints['read'].path == app_context.book_file + '.read.checkpoint'
+        assert checkpoints['quotes'].path == app_context.quote_file + '.checkpoint'
+        assert set(open_checkpoints(app_context, skip='books')) == {'quotes'}
+
+    def test_interrupted_export_resumes(self, app_context, tmp_path, fake_site):
+        """Test that rerunning with resume writes every book once without refetching finished pages"""
+        app_context.book_file = str(tmp_path / 'backup_user_book.csv')
+        app_context.quote_file = str(tmp_path / 'backup_user_quote.csv')
+        interrupted = []
+
+        def content(link, idx):
+            if link.endswith('/read/~3') and not interrupted:
+                interrupted.append(link)
+                raise Interrupted
+            offset = 100 * ['read', 'reading', 'wish'].index(link.split('/')[-2])
+            return make_book_list_page(2, start=offset + idx * 10) if idx <= 3 else None
+
+        site = fake_site(content)
+        with site.patch():
+            with pytest.raises(Interrupted):
+                save_new_books(app_context, iter_books(app_context, checkpoints=open_checkpoints(app_context)), {})
+            site.requested.clear()
+            save_new_books(app_context, iter_books(app_context, checkpoints=open_checkpoints(app_context, resume=True)),
+                           load_book_index(app_context))
+
+        assert not any(link.endswith('/read/~1') or link.endswith('/read/~2') for link in site.requested)
+        assert len(read_books_from_csv(app_context.book_file)) == 3 * 3 * 2
+
+    def test_quote_crash_keeps_book_checkpoints(self, app_context, tmp_path, fake_site):
+        """Test that a crash in the quote phase lets --resume skip the finished book sections"""
+        app_context.downloader = Mock()
+        def content(link, idx):
+            if '/quotes/' in link and not args.resume:
+                raise Interrupted
+            return user_pages(link, idx)
+
+        site = fake_site(content)
+        args = TestMultiUser.make_args(tmp_path)
+        with site.patch(), pytest.raises(Interrupted):
+            backup_user(app_context, 'user1', args)
+        site.requested.clear()
+        args.resume = True
+        with site.patch():
+            assert backup_user(app_context, 'user1', args)
+        assert all('/quotes/' in link for link in site.requested)
+        assert len(read_books_from_csv(str(tmp_path / 'user1_book.csv'))) == 3 * 2
+        assert not any(name.endswith('.checkpoint') for name in os.listdir(tmp_path))
+
+
+class TestStore:
+    """Tests for saving into a SqliteStore and exporting the tables"""
+
+    @pytest.fixture
+    def store_context(self, app_context, tmp_path):
+        app_context.book_file = str(tmp_path / 'backup_user_book.csv')
+        app_context.quote_file = str(tmp_path / 'backup_user_quote.csv')
+        app_context.store = SqliteStore(str(tmp_path / 'library.db'))
+        yield app_context
+        app_context.store.close()
+
+    def test_save_books_into_store(self, store_context, sample_books):
+        """Test that new and changed books are upserted and the table is not written"""
+        save_new_books(store_context, sample_books[:2], load_book_index(store_context))
+        changed = Book(link=sample_books[0].link, status='wish')
+        save_new_books(store_context, [changed, sample_books[2]], load_book_index(store_context), batch_size=1)
+        books = {b.link: b for b in store_context.store.iter_books()}
+        assert len(books) == 3
+        assert books[changed.link].status == 'wish'
+        assert not os.path.exists(store_context.book_file)
+
+    def test_rewrite_all_drops_missing_books(self, store_context, sample_books):
+        """Test that rewrite mode keeps only the crawled books"""
+        save_new_books(store_context, sample_books, load_book_index(store_context))
+        store_context.rewrite_all = True
+        save_new_books(store_context, sample_books[:1], load_book_index(store_context))
+        assert [b.link for b in store_context.store.iter_books()] == [sample_books[0].link]
+
+    def test_export_views(self, store_context, sample_books, sample_quotes):
+        """Test that the tables are regenerated from the store"""
+        store_context.store.upsert_books(sample_books)
+        store_context.store.upsert_quotes(sample_quotes)
+        export_views(store_context)
+        assert [b.link for b in read_books_from_csv(store_context.book_file)] == [b.link for b in sample_books]
+        with open(store_context.quote_file, encoding='utf-8') as file:
+            assert len(file.read().splitlines()) == 1 + len(sample_quotes)
+
+
+class TestParquetArchive:
+    """Tests for saving books into a parquet archive"""
+
+    @pytest.fixture
+    def parquet_context(self, app_context, parquet_dir):
+        app_context.book_file = parquet_dir
+        return app_context
+
+    def test_incremental_save(self, parquet_context, sample_books):
+        """Test that a second run appends only new books"""
+        save_new_books(parquet_context, sample_books[:2], load_book_index(parquet_context))
+        index = load_book_index(parquet_context)
+        assert set(index) == {b.link for b in sample_books[:2]}
+        save_new_books(parquet_context, sample_books, index)
+        assert len(read_books_from_parquet(parquet_context.book_file, 'testuser')) == 3
+
+    def test_index_skips_wide_columns(self, parquet_context, sample_books):
+        """Test that the index carries the compared fields but not names"""
+        save_new_books(parquet_context, sample_books, {})
+        book = load_book_index(parquet_context)[sample_books[0].link]
+        assert (book.status, book.rating, book.date) == (sample_books[0].status, sample_books[0].rating,
+                                                         sample_books[0].date)
+        assert book.name == ''
+
+    def test_changed_book_is_updated(self, parquet_context, sample_books):
+        """Test that a book that changed status is read back with the new fields and a single row"""
+        save_new_books(parquet_context, sample_books, {})
+        wished = sample_books[2]
+        finished = Book(link=wished.link, status='read', name=wished.name, author=wished.author, rating='5',
+                        date='01.02.2024')
+        save_new_books(parquet_context, [finished], load_book_index(parquet_context))
+        book = load_book_index(parquet_context)[wished.link]
+        assert (book.status, book.rating, book.date) == ('read', '5', '01.02.2024')
+        assert [b.link for b in read_books_from_parquet(parquet_context.book_file, 'testuser')].count(wished.link) == 1
+
+    def test_rewrite_replaces_user_files(self, parquet_context, sample_books):
+        """Test that rewrite mode keeps only the new files of the user"""
+        save_new_books(parquet_context, sample_books, {})
+        parquet_context.rewrite_all = True
+        save_new_books(parquet_context, sample_books[:1], load_book_index(parquet_context))
+        assert [b.link for b in read_books_from_parquet(parquet_context.book_file)] == [sample_books[0].link]
+
+    def test_interrupted_rewrite_keeps_archive(self, parquet_context, sample_books):
+        """Test that a failed rewrite publishes nothing and deletes nothing"""
+        save_new_books(parquet_context, sample_books, {})
+        parquet_context.rewrite_all = True
+
+        def broken_stream():
+            yield sample_books[0]
+            raise ConnectionError('network is down')
+
+        with pytest.raises(ConnectionError):
+            save_new_books(parquet_context, broken_stream(), {}, batch_size=1)
+        assert len(read_books_from_parquet(parquet_context.book_file)) == 3
+
+    def test_first_backup_into_empty_archive(self, app_context, tmp_path, fake_site):
+        """Test that backup_user runs end to end when the archive directory has no part files yet"""
+        app_context.downloader = Mock()
+        archive = str(tmp_path / 'books.parquet')
+        os.makedirs(archive)
+        args = TestMultiUser.make_args(tmp_path, books_backup=archive)
+        with fake_site(user_pages).patch():
+            assert backup_user(app_context, 'user1', args)
+        assert len(read_books_from_parquet(archive, 'user1')) == 3 * 2
+
+
+class TestMultiUser:
+    """Tests for read_users and the multi-user batch mode"""
+
+    @staticmethod
+    def make_args(tmp_path, **kwargs):
+        values = dict(books_backup=str(tmp_path / '{user}_book.csv'), quotes_backup=str(tmp_path / '{user}_quote.csv'),
+                      store=None, export=False, skip=None, batch_size=100, driver=None, read_count=float('inf'),
+                      pool_size=10, workers=1, per_host=None, resume=False, retry_failed=False,
+                      base_url='https://www.livelib.ru')
+        values.update(kwargs)
+        return Namespace(**values)
+
+    def test_read_users(self, tmp_path):
+        """Test that blank lines, comments and repeats are skipped"""
+        path = tmp_path / 'users.txt'
+        path.write_text('alice\n\n# paused\nbob \nalice\n', encoding='utf-8')
+        assert read_users(str(path)) == ['alice', 'bob']
+
+    def test_users_get_own_files(self, app_context, tmp_path, fake_site):
+        """Test that every user is saved to the files named after them through the shared downloader"""
+        app_context.downloader = Mock()
+        with fake_site(user_pages).patch():
+            failed = backup_users(app_context, ['user1', 'user2'], self.make_args(tmp_path), user_workers=2)
+
+        assert failed == []
+        for user in ('user1', 'user2'):
+            books = read_books_from_csv(str(tmp_path / f'{user}_book.csv'))
+            assert len(books) == 3 * 2
+            assert all(f'/book/{user[-1]}' in book.link for book in books)
+            assert os.path.exists(tmp_path / f'{user}_quote.csv')
+        assert app_context.downloader.download.call_count == 2
+        assert app_context.user_href == 'https://www.livelib.ru/reader/testuser'
+
+    def test_failed_user_does_not_stop_others(self, app_context, tmp_path, fake_site):
+        """Test that an unknown user is reported and the rest are backed up"""
+        app_context.downloader = Mock()
+        app_context.downloader.download.side_effect = \
+            lambda link: (_ for _ in ()).throw(IOError('404')) if link.endswith('user1') else None
+        with fake_site(user_pages).patch():
+            failed = backup_users(app_context, ['user1', 'user2'], self.make_args(tmp_path))
+        assert failed == ['user1']
+        assert not os.path.exists(tmp_path / 'user1_book.csv')
+        assert os.path.exists(tmp_path / 'user2_book.csv')
+
+    def test_store_per_user(self, app_context, tmp_path, fake_site):
+        """Test that {user} in the store path opens a separate database per user"""
+        app_context.downloader = Mock()
+        args = self.make_args(tmp_path, store='sqlite:' + str(tmp_path / '{user}.db'), skip='quotes')
+        with fake_site(user_pages).patch():
+            assert backup_user(app_context, 'user3', args)
+        store = SqliteStore(str(tmp_path / 'user3.db'))
+        assert store.count('books') == 3 * 2
+        store.close()
+
+
+class TestRetryFailed:
+    """Tests for the failed page list and --retry_failed"""
+
+    def test_failed_pages_grouped_by_section(self):
+        """Test that failed links are grouped by list and sorted by page number"""
+        links = ['https://www.livelib.ru/reader/u/read/~5', 'https://www.livelib.ru/reader/u/quotes/~2',
+                 'https://www.livelib.ru/reader/u/read/~2', 'https://www.livelib.ru/reader/u']
+        assert failed_pages(links) == {'read': [2, 5], 'quotes': [2]}
+
+    def test_retry_fills_the_gap(self, app_context, tmp_path, fake_site):
+        """Test that a page failed in a run is loaded alone by the --retry_failed run"""
+        app_context.downloader = Mock()
+        down = {'read/~2'}
+
+        def content(link, idx):
+            if any(link.endswith(page) for page in down):
+                raise ConnectionError('network is down')
+            if '/read/' not in link or idx > 3:
+                return None
+            return make_book_list_page(2, start=10 * idx)
+
+        site = fake_site(content)
+        args = TestMultiUser.make_args(tmp_path, skip='quotes')
+        with site.patch():
+            assert backup_user(app_context, 'user1', args)
+        book_file = str(tmp_path / 'user1_book.csv')
+        assert len(read_books_from_csv(book_file)) == 4
+        assert DeadLetters(book_file + '.failed').links() == ['https://www.livelib.ru/reader/user1/read/~2']
+
+        down.clear()
+        site.requested.clear()
+        args.retry_failed = True
+        with site.patch():
+            assert backup_user(app_context, 'user1', args)
+        assert site.requested == ['https://www.livelib.ru/reader/user1/read/~2']
+        assert len(read_books_from_csv(book_file)) == 6
+        assert DeadLetters(book_file + '.failed').links() == []
+
+    @staticmethod
+    def fail_run(app_context, tmp_path, fake_site, pages):
+        """Runs a backup in which the given read pages fail, returns the args and the failed page list"""
+        app_context.downloader = Mock()
+
+        def content(link, idx):
+            if '/read/' in link and idx in pages:
+                raise ConnectionError('network is down')
+            return make_book_list_page(2, start=10 * idx) if '/read/' in link and idx <= 3 else None
+
+        args = TestMultiUser.make_args(tmp_path, skip='quotes')
+        with fake_site(content).patch():
+            assert backup_user(app_context, 'user1', args)
+        args.retry_failed = True
+        return args, DeadLetters(str(tmp_path / 'user1_book.csv.failed'))
+
+    def test_page_failed_again_stays_listed(self, app_context, tmp_path, fake_site):
+        """Test that a retry keeps the pages that failed again and drops the loaded ones"""
+        args, dead_letters = self.fail_run(app_context, tmp_path, fake_site, (2, 3))
+
+        def content(link, idx):
+            if link.endswith('read/~3'):
+                raise ConnectionError('still down')
+            return make_book_list_page(2, start=10 * idx)
+
+        with fake_site(content).patch(), patch('export.logger') as logger:
+            assert backup_user(app_context, 'user1', args)
+        assert dead_letters.links() == ['https://www.livelib.ru/reader/user1/read/~3']
+        assert not any('not found on the site' in str(call) for call in logger.info.call_args_list)
+
+    def test_interrupted_retry_keeps_list(self, app_context, tmp_path, fake_site):
+        """Test that the failed page list survives a retry run that crashes mid-way"""
+        args, dead_letters = self.fail_run(app_context, tmp_path, fake_site, (2, 3))
+        before = dead_letters.links()
+        with patch('Modules.PageFetcher.download_page', side_effect=KeyboardInterrupt), \
+                pytest.raises(KeyboardInterrupt):
+            backup_user(app_context, 'user1', args)
+        assert dead_letters.links() == before == ['https://www.livelib.ru/reader/user1/read/~2',
+                                                  'https://www.livelib.ru/reader/user1/read/~3']
+
+    def test_parquet_state_files_per_user(self, app_context, tmp_path):
+        """Test that users sharing a parquet archive keep separate hidden state files inside it"""
+        from export import state_path
+        archive = str(tmp_path / 'books.parquet')
+        paths = {state_path(replace(app_context, book_file=archive, user_href=f'https://www.livelib.ru/reader/{user}'), 'failed')
+                 for user in ('alice', 'bob')}
+        assert paths == {os.path.join(archive, '.alice.failed'), os.path.join(archive, '.bob.failed')}
+
+
+class TestLazyImports:
+    """Tests that driver and format dependencies are not imported at startup"""
+
+    def test_heavy_modules_not_imported(self):
+        """Test that importing export loads neither selenium nor pandas nor the async stack"""
+        code = ('import sys, export; '
+                'print(",".join(m for m in ("selenium", "pandas", "numpy", "openpyxl", "pyarrow", "aiohttp", '
+                '"asyncio") if m in sys.modules))')
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == ''
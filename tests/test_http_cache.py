@@ -0,0 +1,184 @@
+"""
+Unit tests for http_cache module
+"""
+import pytest
+import os
+import tempfile
+import time
+from unittest.mock import patch
+from Helpers.http_cache import HttpCache, CacheMissError
+from Helpers.page_loader import PageDownloader
+
+
+@pytest.fixture
+def cache_path():
+    """Temporary path for a cache database"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield os.path.join(tmpdir, 'cache.db')
+
+
+class TestHttpCache:
+    """Tests for HttpCache class"""
+
+    def test_put_and_get(self, cache_path):
+        """Test that a stored response is returned with its validators"""
+        cache = HttpCache(cache_path)
+        cache.put('https://www.livelib.ru/a', b'body', etag='"v1"', last_modified='Mon, 01 Jan 2024 00:00:00 GMT')
+        entry = cache.get('https://www.livelib.ru/a')
+        assert entry.body == b'body'
+        assert entry.etag == '"v1"'
+        assert cache.get('https://www.livelib.ru/b') is None
+
+    def test_persists_between_instances(self, cache_path):
+        """Test that the cache survives reopening"""
+        HttpCache(cache_path).put('https://www.livelib.ru/a', b'body')
+        assert HttpCache(cache_path).get('https://www.livelib.ru/a').body == b'body'
+
+    def test_identical_bodies_stored_once(self, cache_path):
+        """Test content addressing of bodies"""
+        cache = HttpCache(cache_path)
+        cache.put('https://www.livelib.ru/a', b'same')
+        cache.put('https://www.livelib.ru/b', b'same')
+        assert cache.size() == 4
+
+    def test_freshness_by_ttl(self, cache_path):
+        """Test that entries are usable only within ttl"""
+        cache = HttpCache(cache_path, ttl=60)
+        cache.put('https://www.livelib.ru/a', b'body')
+        entry = cache.get('https://www.livelib.ru/a')
+        assert cache.is_usable(entry)
+        entry.fetched_at -= 120
+        assert not cache.is_usable(entry)
+        assert not cache.is_usable(None)
+
+    def test_offline_serves_stale_and_raises_on_miss(self, cache_path):
+        """Test cache-only replay mode"""
+        cache = HttpCache(cache_path, offline=True)
+        cache.put('https://www.livelib.ru/a', b'body')
+        entry = cache.get('https://www.livelib.ru/a')
+        entry.fetched_at = 0
+        assert cache.is_usable(entry)
+        with pytest.raises(CacheMissError):
+            cache.is_usable(None, 'https://www.livelib.ru/b')
+
+    def test_revalidation_headers(self, cache_path):
+        """Test conditional request headers"""
+        cache = HttpCache(cache_path)
+        cache.put('https://www.livelib.ru/a', b'body', etag='"v1"', last_modified='yesterday')
+        headers = cache.revalidation_headers(cache.get('https://www.livelib.ru/a'))
+        assert headers == {'If-None-Match': '"v1"', 'If-Modified-Since': 'yesterday'}
+        assert cache.revalidation_headers(None) == {}
+
+    def test_update_not_modified(self, cache_path):
+        """Test that 304 keeps the cached body and refreshes its age"""
+        cache = HttpCache(cache_path, ttl=60)
+        cache.put('https://www.livelib.ru/a', b'body', etag='"v1"')
+        entry = cache.get('https://www.livelib.ru/a')
+        entry.fetched_at = 0
+        assert cache.update('https://www.livelib.ru/a', entry, 304, b'', {}) == b'body'
+        assert cache.is_usable(cache.get('https://www.livelib.ru/a'))
+        assert cache.revalidated == 1
+
+    def test_update_stores_only_successful_responses(self, cache_path):
+        """Test that error responses are passed through without caching"""
+        cache = HttpCache(cache_path)
+        assert cache.update('https://www.livelib.ru/a', None, 500, b'error', {}) == b'error'
+        assert cache.get('https://www.livelib.ru/a') is None
+        cache.update('https://www.livelib.ru/a', None, 200, b'ok', {'ETag': '"v2"'})
+        assert cache.get('https://www.livelib.ru/a').etag == '"v2"'
+
+    def test_bot_page_not_stored(self, cache_path):
+        """Test that the bot redirect page is not cached as a valid answer"""
+        from tests.fixtures.mock_html import MOCK_404_PAGE
+        cache = HttpCache(cache_path, ttl=3600)
+        body = MOCK_404_PAGE.encode()
+        assert cache.update('https://www.livelib.ru/a', None, 200, body, {}) == body
+        assert cache.get('https://www.livelib.ru/a') is None
+
+    def test_fresh(self, cache_path):
+        """Test that fresh returns usable bodies only and counts them as hits"""
+        cache = HttpCache(cache_path, ttl=60)
+        assert cache.fresh('https://www.livelib.ru/a') is None
+        cache.put('https://www.livelib.ru/a', b'a')
+        assert cache.fresh('https://www.livelib.ru/a') == b'a'
+        cache.ttl = 0
+        assert cache.fresh('https://www.livelib.ru/a') is None
+        assert (cache.hits, cache.misses) == (1, 0)
+
+    def test_evict_by_age(self, cache_path):
+        """Test that entries older than max_age are dropped"""
+        cache = HttpCache(cache_path, max_age=60)
+        with patch('Helpers.http_cache.time.time', return_value=time.time() - 120):
+            cache.put('https://www.livelib.ru/old', b'old')
+        cache.put('https://www.livelib.ru/new', b'new')
+        cache.evict()
+        assert cache.get('https://www.livelib.ru/old') is None
+        assert cache.get('https://www.livelib.ru/new') is not None
+        assert cache.size() == 3
+
+    def test_evict_by_size(self, cache_path):
+        """Test that least recently read entries are dropped to fit max_size"""
+        cache = HttpCache(cache_path, max_size=10)
+        for i, name in enumerate(['a', 'b', 'c']):
+            with patch('Helpers.http_cache.time.time', return_value=1000.0 + i):
+                cache.put(f'https://www.livelib.ru/{name}', name.encode() * 5)
+        cache.get('https://www.livelib.ru/a')  # a becomes the most recently read
+        cache.max_age = None
+        cache.evict()
+        assert cache.size() <= 10
+        assert cache.get('https://www.livelib.ru/b') is None
+        assert cache.get('https://www.livelib.ru/a') is not None
+
+
+    def test_size_checked_while_writing(self, cache_path):
+        """Test that puts keep the cache within max_size without waiting for close"""
+        cache = HttpCache(cache_path, max_size=10)
+        with patch('Helpers.http_cache.EVICT_EVERY', 2):
+            for i, name in enumerate(['a', 'b', 'c', 'd']):
+                with patch('Helpers.http_cache.time.time', return_value=time.time() + i):
+                    cache.put(f'https://www.livelib.ru/{name}', name.encode() * 5)
+        assert cache.size() <= 10
+        assert cache.get('https://www.livelib.ru/d') is not None
+
+    def test_counters_from_threads(self, cache_path):
+        """Test that hit and miss counters are not lost when updated from several threads"""
+        from concurrent.futures import ThreadPoolExecutor
+        cache = HttpCache(cache_path, ttl=3600)
+        cache.put('https://www.livelib.ru/a', b'a')
+        entry = cache.get('https://www.livelib.ru/a')
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda i: cache.is_usable(entry if i % 2 else None), range(2000)))
+        assert (cache.hits, cache.misses) == (1000, 1000)
+
+
+class TestPageDownloaderCache:
+    """Tests for PageDownloader with a cache"""
+
+    def test_conditional_get_against_local_server(self, cache_path, etag_server):
+        """Test that the second download revalidates with ETag and reuses the body"""
+        url, requests_seen = etag_server
+        downloader = PageDownloader(cache=HttpCache(cache_path))
+        assert downloader.download(url) == b'<html>page</html>'
+        assert downloader.download(url) == b'<html>page</html>'
+        assert requests_seen == [None, '"v1"']
+        assert downloader.cache.revalidated == 1
+
+    def test_fresh_entry_skips_network(self, cache_path, etag_server):
+        """Test that fresh entries are served without a request"""
+        url, requests_seen = etag_server
+        downloader = PageDownloader(cache=HttpCache(cache_path, ttl=60))
+        downloader.download(url)
+        downloader.download(url)
+        assert len(requests_seen) == 1
+        assert downloader.cache.hits == 1
+
+    def test_offline_replay(self, cache_path, etag_server):
+        """Test replaying cached pages without network"""
+        url, _ = etag_server
+        PageDownloader(cache=HttpCache(cache_path)).download(url)
+        offline = PageDownloader(cache=HttpCache(cache_path, offline=True))
+        with patch.object(offline.session, 'get') as get:
+            assert offline.download(url) == b'<html>page</html>'
+            with pytest.raises(CacheMissError):
+                offline.download(url + '/other')
+        get.assert_not_called()
@@ -254,3 +254,39 @@ class TestRewriteMode:
         assert len(loaded) == 2
         assert loaded[0].name == 'New Book 1'
         assert '/book/1' not in [b.link for b in loaded]
+
+
+class TestEndToEnd:
+    """End-to-end runs of export.py against the local stand-in of the site"""
+
+    @staticmethod
+    def export(site, tmp_path, *extra):
+        import subprocess
+        import sys
+
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        command = [sys.executable, 'export.py', 'bench', '--base_url', site.url,
+                   '-b', str(tmp_path / 'book.csv'), '-q', str(tmp_path / 'quote.csv'),
+                   '--min_delay', '0', '--max_delay', '0', '--pace_file', str(tmp_path / 'pace.json'), *extra]
+        subprocess.run(command, cwd=root, capture_output=True, check=True, timeout=60)
+
+    def test_full_then_incremental_backup(self, tmp_path):
+        """Test that a full run saves every list and a repeated run with --stop_after adds nothing"""
+        from benchmarks.mock_site import MockSite
+
+        with MockSite(pages=2, items=3) as site:
+            url = site.url
+            self.export(site, tmp_path, '--workers', '2')
+            requests = site.requests
+            self.export(site, tmp_path, '--stop_after', '1')
+            repeated = site.requests - requests
+
+        books = read_books_from_csv(str(tmp_path / 'book.csv'))
+        assert len(books) == 3 * 2 * 3
+        assert {book.status for book in books} == {'read', 'reading', 'wish'}
+        assert len(read_quotes_from_csv(str(tmp_path / 'quote.csv'))) == 2 * 3
+        # кириллические заголовки дат разобраны, а ссылки ведут на заглушку, а не на livelib.ru
+        assert all(book.date for book in books if book.status == 'read')
+        assert all(book.link.startswith(url) for book in books)
+        # профиль и по одной странице на каждый из четырех списков
+        assert repeated == 1 + 4
@@ -0,0 +1,198 @@
+"""
+Unit tests for journal module and crash recovery of the backup tables
+"""
+import os
+from unittest.mock import patch
+
+import pytest
+from Helpers.book import Book
+from Helpers.csv_reader import read_books_from_csv
+from Helpers.csv_writer import save_books
+from Helpers.journal import Journal, RECORD
+from Helpers.quote import Quote
+from Modules.QuoteLoader import QuoteLoader
+from export import book_journal, recover_books, save_new_books, load_book_index
+
+
+def make_books(count, start=0):
+    return [Book(f'/book/{idx}', 'read', f'Book {idx}', f'Author {idx}', '5', '2024-01-01')
+            for idx in range(start, start + count)]
+
+
+class TestJournal:
+    """Tests for Journal class"""
+
+    def test_round_trip(self, tmp_path, sample_books, sample_quotes):
+        """Test that records come back in order with their kind and position"""
+        journal = Journal(str(tmp_path / 'book.csv.journal'))
+        assert not journal.pending()
+        journal.append('add', sample_books[:2], 10)
+        journal.append('upsert', sample_quotes[:1])
+        records = list(journal.records())
+        assert [(op, position, [item.link for item in items]) for op, position, items in records] == \
+            [('add', 10, [b.link for b in sample_books[:2]]), ('upsert', None, [sample_quotes[0].link])]
+        assert records[1][2][0].text == sample_quotes[0].text
+
+    def test_torn_record_is_ignored(self, tmp_path, sample_books):
+        """Test that a record cut off by a crash is not replayed"""
+        journal = Journal(str(tmp_path / 'book.csv.journal'))
+        journal.append('add', sample_books[:1], 0)
+        journal.append('add', sample_books[1:], 100)
+        with open(journal.path, 'r+b') as file:
+            file.truncate(journal.size - 5)
+        assert [position for _, position, _ in journal.records()] == [0]
+
+    def test_corrupt_record_stops_replay(self, tmp_path, sample_books):
+        """Test that a record with a wrong checksum ends the journal"""
+        journal = Journal(str(tmp_path / 'book.csv.journal'))
+        journal.append('add', sample_books[:1], 0)
+        with open(journal.path, 'r+b') as file:
+            file.seek(RECORD.size + 3)
+            file.write(b'X')
+        assert list(journal.records()) == []
+
+    def test_checkpoint_clears(self, tmp_path, sample_books):
+        """Test that a checkpoint leaves no pending records"""
+        table = str(tmp_path / 'book.csv')
+        save_books(sample_books, table)
+        journal = Journal(table + '.journal')
+        journal.append('add', sample_books, 0)
+        journal.checkpoint(table)
+        assert not journal.pending() and not os.path.exists(journal.path)
+
+    @pytest.mark.parametrize('appendable', [True, False])
+    def test_replay(self, tmp_path, sample_books, appendable):
+        """Test that added batches are re-appended from their position, or all go to update when appending is off"""
+        table = tmp_path / 'book.csv'
+        table.write_bytes(b'head|torn tail')
+        journal = Journal(str(table) + '.journal')
+        journal.append('add', sample_books[:1], 5)
+        journal.append('add', sample_books[1:2], 40)
+        journal.append('upsert', sample_books[2:])
+        appended, updated = [], []
+
+        def append(items, path):
+            appended.extend(items)
+            with open(path, 'ab') as file:
+                file.write(b'|new')
+
+        restored = journal.replay(str(table), append, updated.extend, appendable)
+        assert restored == len(sample_books) and not journal.pending()
+        if appendable:
+            assert appended == sample_books[:2] and updated == sample_books[2:]
+            assert table.read_bytes() == b'head||new'
+        else:
+            assert appended == [] and updated == sample_books
+            assert table.read_bytes() == b'head|torn tail'
+
+
+class TestBookRecovery:
+    """Tests for the journaled book table"""
+
+    def test_successful_run_leaves_no_journal(self, app_context, temp_csv_file):
+        """Test that the journal is checkpointed at the end of save_new_books"""
+        app_context.book_file = temp_csv_file
+        save_new_books(app_context, make_books(5), load_book_index(app_context), batch_size=2)
+        assert not book_journal(app_context).pending()
+        assert len(read_books_from_csv(temp_csv_file)) == 5
+
+    def test_one_record_per_batch(self, app_context, temp_csv_file):
+        """Test group commit: every batch is one journal record"""
+        app_context.book_file = temp_csv_file
+        with patch.object(Journal, 'checkpoint'):
+            save_new_books(app_context, make_books(5), {}, batch_size=2)
+        assert [len(items) for _, _, items in book_journal(app_context).records()] == [2, 2, 1]
+
+    def test_torn_table_is_repaired(self, app_context, temp_csv_file):
+        """Test that books journaled before a crash are restored once, past a half-written line"""
+        app_context.book_file = temp_csv_file
+        save_books(make_books(2), temp_csv_file)
+        journal = book_journal(app_context)
+        journal.append('add', make_books(2, start=2), os.path.getsize(temp_csv_file))
+        journal.append('add', make_books(2, start=4), os.path.getsize(temp_csv_file) + 1000)
+        save_books(make_books(1, start=2), temp_csv_file)
+        with open(temp_csv_file, 'a', encoding='utf-8') as file:
+            file.write('Book 3\tAuth')  # запись прервана на середине строки
+
+        recover_books(app_context)
+        assert [b.link for b in read_books_from_csv(temp_csv_file)] == [b.link for b in make_books(6)]
+        assert not journal.pending()
+
+    def test_interrupted_save_is_recovered(self, app_context, temp_csv_file):
+        """Test that a crawl that failed mid-way keeps its journal and recovery does not duplicate books"""
+        app_context.book_file = temp_csv_file
+
+        def broken_stream():
+            yield from make_books(3)
+            raise ConnectionError('network is down')
+
+        with patch.object(Journal, 'checkpoint'), pytest.raises(ConnectionError):
+            save_new_books(app_context, broken_stream(), load_book_index(app_context), batch_size=1)
+        assert book_journal(app_context).pending()
+        recover_books(app_context)
+        assert [b.link for b in read_books_from_csv(temp_csv_file)] == [b.link for b in make_books(3)]
+
+    def test_interrupted_update_is_recovered(self, app_context, temp_csv_file):
+        """Test that journaled status changes reach the table on the next run"""
+        app_context.book_file = temp_csv_file
+        save_books(make_books(3), temp_csv_file)
+        moved = Book('/book/1', 'reading', rating='', date='2025-01-01')
+        book_journal(app_context).append('upsert', [moved])
+        recover_books(app_context)
+        books = read_books_from_csv(temp_csv_file)
+        assert [(b.status, b.name) for b in books] == [('read', 'Book 0'), ('reading', 'Book 1'), ('read', 'Book 2')]
+
+    def test_rewrite_discards_journal(self, app_context, temp_csv_file):
+        """Test that a full rewrite does not replay a stale journal"""
+        app_context.book_file = temp_csv_file
+        book_journal(app_context).append('add', make_books(1), 0)
+        app_context.rewrite_all = True
+        recover_books(app_context)
+        assert not book_journal(app_context).pending()
+        assert read_books_from_csv(temp_csv_file) == []
+
+
+class TestQuoteRecovery:
+    """Tests for the journaled quote table"""
+
+    @pytest.fixture
+    def quote_loader(self, app_context, tmp_path):
+        app_context.quote_file = str(tmp_path / 'quote.csv')
+        return QuoteLoader(app_context)
+
+    def test_changed_quotes_are_journaled(self, quote_loader, sample_quotes):
+        """Test that the rewrite of changed texts goes through the journal and leaves none behind"""
+        quote_loader.save_quotes_stream(iter(sample_quotes), quote_loader.load_index())
+        edited = Quote(sample_quotes[0].link, 'Edited text', sample_quotes[0].book)
+        with patch.object(QuoteLoader, 'save_quotes', side_effect=OSError('disk full')), pytest.raises(OSError):
+            quote_loader.save_quotes_stream(iter([edited]), quote_loader.load_index())
+        assert [op for op, _, _ in quote_loader.journal().records()] == ['upsert']
+
+        quote_loader.recover()
+        assert quote_loader.load_index()[edited.link].text == 'Edited text'
+        assert not quote_loader.journal().pending()
+
+    def test_failed_rewrite_keeps_old_table(self, quote_loader, sample_quotes):
+        """Test that the table is replaced atomically"""
+        quote_loader.save_quotes(sample_quotes)
+        with open(quote_loader.ac.quote_file, 'rb') as file:
+            before = file.read()
+        with patch('pandas.DataFrame.to_csv', side_effect=OSError('disk full')), pytest.raises(OSError):
+            quote_loader.save_quotes([Quote(sample_quotes[0].link, 'Edited text', sample_quotes[0].book)])
+        with open(quote_loader.ac.quote_file, 'rb') as file:
+            assert file.read() == before
+
+    def test_xlsx_quotes_are_compacted(self, quote_loader, sample_quotes, tmp_path):
+        """Test that xlsx quotes collected in the journal are written with one rewrite"""
+        quote_loader.ac.quote_file = str(tmp_path / 'quote.xlsx')
+        quote_loader.save_quotes_stream(iter(sample_quotes[:2]), quote_loader.load_index(), batch_size=1)
+        quote_loader.save_quotes_stream(iter(sample_quotes), quote_loader.load_index(), batch_size=1)
+        assert set(quote_loader.load_index()) == {q.link for q in sample_quotes}
+        assert not quote_loader.journal().pending()
+
+    def test_xlsx_crash_recovery(self, quote_loader, sample_quotes, tmp_path):
+        """Test that quotes journaled before a crash reach the xlsx table on the next run"""
+        quote_loader.ac.quote_file = str(tmp_path / 'quote.xlsx')
+        quote_loader.journal().append('add', sample_quotes[:2])
+        quote_loader.recover()
+        assert set(quote_loader.load_index()) == {q.link for q in sample_quotes[:2]}
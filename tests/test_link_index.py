@@ -0,0 +1,133 @@
+"""
+Unit tests for link_index module
+"""
+import os
+
+from Helpers.book import Book
+from Helpers.csv_reader import iter_books_from_csv, iter_quotes_from_csv
+from Helpers.csv_writer import save_books
+from Helpers.link_index import LinkIndex, open_link_index, fields_digest
+from Helpers.merge import BOOK_FIELDS, QUOTE_FIELDS, iter_merge
+from Helpers.quote import Quote
+from Modules.QuoteLoader import QuoteLoader
+from export import load_book_index, save_new_books
+
+
+def open_books(path):
+    return open_link_index(path, BOOK_FIELDS, iter_books_from_csv)
+
+
+class TestLinkIndex:
+    """Tests for LinkIndex and open_link_index"""
+
+    def test_missing_table_gives_empty_index(self, tmp_path):
+        """Test that there is nothing to index before the first backup"""
+        assert open_books(str(tmp_path / 'book.csv')) == {}
+
+    def test_lookup(self, temp_csv_file, sample_books):
+        """Test membership, length and the sidecar file next to the table"""
+        save_books(sample_books, temp_csv_file)
+        index = open_books(temp_csv_file)
+        assert isinstance(index, LinkIndex)
+        assert os.path.exists(temp_csv_file + '.idx')
+        assert len(index) == len(sample_books)
+        assert all(book.link in index for book in sample_books)
+        assert '/book/0' not in index
+
+    def test_item_is_read_by_offset(self, temp_csv_file, sample_books):
+        """Test that the saved book is read back from its line of the table"""
+        save_books(sample_books, temp_csv_file)
+        index = open_books(temp_csv_file)
+        book = index[sample_books[1].link]
+        assert (book.link, book.name, book.author) == (sample_books[1].link, sample_books[1].name,
+                                                       sample_books[1].author)
+
+    def test_digest_detects_changes(self, temp_csv_file, sample_books):
+        """Test that iter_merge compares against stored field digests without loading the books"""
+        save_books(sample_books, temp_csv_file)
+        index = open_books(temp_csv_file)
+        assert index.get(sample_books[0].link) == fields_digest(sample_books[0], BOOK_FIELDS)
+        rated = Book(link=sample_books[0].link, status=sample_books[0].status, name=sample_books[0].name,
+                     author=sample_books[0].author, rating='1', date=sample_books[0].date)
+        changed = []
+        assert list(iter_merge(index, sample_books + [rated], changed=changed)) == []
+        assert changed == []
+        assert list(iter_merge(index, [rated], changed=changed)) == []
+        assert changed == [rated]
+
+    def test_reused_when_table_unchanged(self, temp_csv_file, sample_books):
+        """Test that an up-to-date sidecar is mapped instead of re-reading the table"""
+        save_books(sample_books, temp_csv_file)
+        open_books(temp_csv_file).close()
+
+        def fail(path, start):
+            raise AssertionError('table should not be read')
+
+        index = open_link_index(temp_csv_file, BOOK_FIELDS, fail)
+        assert sample_books[0].link in index
+
+    def test_rebuilt_when_table_changed(self, temp_csv_file, sample_books):
+        """Test that a table changed behind the index's back (size or mtime) triggers a rebuild"""
+        save_books(sample_books[:1], temp_csv_file)
+        open_books(temp_csv_file).close()
+        save_books(sample_books[1:], temp_csv_file)
+        index = open_books(temp_csv_file)
+        assert len(index) == len(sample_books)
+        stat = os.stat(temp_csv_file)
+        os.utime(temp_csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert not LinkIndex(temp_csv_file, BOOK_FIELDS, iter_books_from_csv).load()
+
+    def test_corrupt_sidecar_is_rebuilt(self, temp_csv_file, sample_books):
+        """Test that a truncated sidecar is not trusted"""
+        save_books(sample_books, temp_csv_file)
+        open_books(temp_csv_file).close()
+        with open(temp_csv_file + '.idx', 'r+b') as file:
+            file.truncate(20)
+        assert len(open_books(temp_csv_file)) == len(sample_books)
+
+    def test_extend_and_save(self, temp_csv_file, sample_books):
+        """Test that rows appended during the run are found before and after the sidecar is saved"""
+        save_books(sample_books[:2], temp_csv_file)
+        index = open_books(temp_csv_file)
+        position = os.path.getsize(temp_csv_file)
+        save_books(sample_books[2:], temp_csv_file)
+        index.extend_from(position)
+        assert sample_books[2].link in index and len(index) == 3
+        index.save()
+        assert index.added == {} and len(index) == 3
+        reopened = LinkIndex(temp_csv_file, BOOK_FIELDS, iter_books_from_csv)
+        assert reopened.load()
+        assert [reopened[book.link].name for book in sample_books] == [book.name for book in sample_books]
+
+    def test_multiline_quotes(self, temp_csv_file, sample_books):
+        """Test offsets of quotes whose text spans several lines"""
+        quotes = [Quote('https://www.livelib.ru/quote/1', 'first line\nsecond line', sample_books[0]),
+                  Quote('https://www.livelib.ru/quote/2', 'plain', sample_books[1])]
+        QuoteLoader.append_quotes(quotes, temp_csv_file)
+        index = open_link_index(temp_csv_file, QUOTE_FIELDS, iter_quotes_from_csv)
+        assert [index[quote.link].text for quote in quotes] == ['first line\nsecond line', 'plain']
+
+
+class TestExportIndex:
+    """Tests for the indexes used by export"""
+
+    def test_sidecar_follows_appends(self, app_context, temp_csv_file, sample_books):
+        """Test that the sidecar is updated by save_new_books and reused by the next run"""
+        app_context.book_file = temp_csv_file
+        save_new_books(app_context, sample_books[:2], load_book_index(app_context))
+        save_new_books(app_context, sample_books, load_book_index(app_context))
+        index = LinkIndex(temp_csv_file, BOOK_FIELDS, iter_books_from_csv)
+        assert index.load()
+        assert len(index) == len(sample_books)
+
+    def test_quote_index_after_update(self, app_context, temp_csv_file, sample_quotes):
+        """Test that the quote sidecar tracks appended quotes and is rebuilt after changed texts are rewritten"""
+        app_context.quote_file = temp_csv_file
+        quote_loader = QuoteLoader(app_context)
+        quote_loader.save_quotes_stream(iter(sample_quotes[:2]), quote_loader.load_index(), batch_size=1)
+        edited = Quote(sample_quotes[0].link, 'Edited text', sample_quotes[0].book)
+        quote_loader.save_quotes_stream(iter([edited] + sample_quotes[1:]), quote_loader.load_index(), batch_size=1)
+        index = LinkIndex(temp_csv_file, QUOTE_FIELDS, iter_quotes_from_csv)
+        assert index.load()
+        assert len(index) == len(sample_quotes)
+        assert index[edited.link].text == 'Edited text'
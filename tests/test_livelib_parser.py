@@ -10,8 +10,11 @@ from Helpers.livelib_parser import (
     href_i,
     date_parser,
     handle_xpath,
+    error_handler,
+    xpath_all,
     slash_add
 )
+from Helpers import xpaths
 
 
 class TestTryParseMonth:
@@ -192,6 +195,35 @@ class TestHandleXpath:
         result = handle_xpath(node, '//p', i=2)
         assert result.text == '3'
 
+    def test_handle_xpath_compiled(self):
+        """Test xpath with a precompiled expression"""
+        node = etree.HTML('<html><div>First</div><div>Second</div></html>')
+        assert handle_xpath(node, etree.XPath('//div'), i=1).text == 'Second'
+        assert handle_xpath(node, etree.XPath('//p')) is None
+
+
+class TestXpathAll:
+    """Tests for xpath_all function and the compiled registry"""
+
+    def test_xpath_all_string_and_compiled_agree(self):
+        """Test that string and compiled requests give the same nodes"""
+        node = etree.HTML('<html><p>1</p><p>2</p></html>')
+        assert xpath_all(node, '//p') == xpath_all(node, etree.XPath('//p'))
+
+    def test_registry_is_compiled(self):
+        """Test that every registry entry is a compiled XPath"""
+        entries = [value for name, value in vars(xpaths).items() if name.isupper()]
+        compiled = [item for entry in entries for item in (entry if isinstance(entry, tuple) else (entry,))]
+        assert compiled
+        assert all(isinstance(item, etree.XPath) for item in compiled)
+
+    def test_text_requests_return_plain_strings(self):
+        """Test that text results do not keep the page tree alive"""
+        node = etree.HTML('<html><div><h2>Январь 2024 г.</h2></div></html>')
+        result = xpaths.BOOK_DATE(node)
+        assert result == ['Январь 2024 г.']
+        assert type(result[0]) is str
+
 
 class TestSlashAdd:
     """Tests for slash_add function"""
@@ -217,3 +249,14 @@ class TestSlashAdd:
         """Test slash_add with empty left part"""
         result = slash_add('', 'path')
         assert result == '/path'
+
+
+class TestErrorHandler:
+    """Tests for error_handler function"""
+
+    def test_logs_to_module_logger(self, caplog):
+        """Test that parsing errors go to the parser's own logger"""
+        with caplog.at_level('ERROR', logger='Helpers.livelib_parser'):
+            assert error_handler('book name', etree.HTML('<p>raw</p>')) is None
+        assert [record.name for record in caplog.records] == ['Helpers.livelib_parser']
+        assert 'book name not parsed' in caplog.text
@@ -0,0 +1,175 @@
+"""
+Unit tests for merge module
+"""
+import pytest
+from Helpers.book import Book
+from Helpers.quote import Quote
+from Helpers.merge import MergeResult, PageWalk, StalePageCounter, build_index, has_news, iter_merge, merge_items, \
+    QUOTE_FIELDS
+
+
+class TestBuildIndex:
+    """Tests for build_index function"""
+
+    def test_build_index_keys_are_normalized_links(self):
+        """Test that relative and absolute links map to the same key"""
+        index = build_index([Book(link='/book/1'), Book(link='https://www.livelib.ru/book/2')])
+        assert set(index) == {'https://www.livelib.ru/book/1', 'https://www.livelib.ru/book/2'}
+
+    def test_build_index_empty(self):
+        """Test building index from empty list"""
+        assert build_index([]) == {}
+
+
+class TestMergeItems:
+    """Tests for merge_items function"""
+
+    def test_merge_empty(self):
+        """Test merging two empty collections"""
+        assert merge_items([], []) == MergeResult()
+
+    def test_merge_added(self):
+        """Test that unknown links are reported as added"""
+        old = [Book(link='/book/1', status='read')]
+        new = [Book(link='/book/1', status='read'), Book(link='/book/2', status='wish')]
+        result = merge_items(old, new)
+        assert [b.link for b in result.added] == ['https://www.livelib.ru/book/2']
+        assert result.changed == []
+        assert result.removed == []
+
+    def test_merge_changed_status(self):
+        """Test that a book with a different status is reported as changed"""
+        old = [Book(link='/book/1', status='wish')]
+        new = [Book(link='/book/1', status='read', rating='5', date='2024-01-01')]
+        result = merge_items(old, new)
+        assert result.added == []
+        assert len(result.changed) == 1
+        assert result.changed[0].status == 'read'
+
+    def test_merge_changed_rating_and_date(self):
+        """Test that rating and date differences are detected"""
+        old = [Book(link='/book/1', status='read', rating='4', date='2024-01-01'),
+               Book(link='/book/2', status='read', rating='5', date='2024-01-01')]
+        new = [Book(link='/book/1', status='read', rating='5', date='2024-01-01'),
+               Book(link='/book/2', status='read', rating='5', date='2024-02-01')]
+        result = merge_items(old, new)
+        assert len(result.changed) == 2
+
+    def test_merge_name_change_is_ignored(self):
+        """Test that fields outside the compared set are ignored"""
+        old = [Book(link='/book/1', name='Old name', status='read')]
+        new = [Book(link='/book/1', name='New name', status='read')]
+        assert merge_items(old, new).changed == []
+
+    def test_merge_removed(self):
+        """Test that saved links absent from the new data are reported as removed"""
+        old = [Book(link='/book/1'), Book(link='/book/2')]
+        new = [Book(link='/book/2')]
+        result = merge_items(old, new)
+        assert [b.link for b in result.removed] == ['https://www.livelib.ru/book/1']
+
+    def test_merge_duplicates_in_new_data(self):
+        """Test that the first occurrence of a link wins"""
+        new = [Book(link='/book/1', status='read'), Book(link='/book/1', status='wish')]
+        result = merge_items([], new)
+        assert len(result.added) == 1
+        assert result.added[0].status == 'read'
+
+    def test_merge_accepts_prebuilt_index(self):
+        """Test passing an index instead of a list"""
+        index = build_index([Book(link='/book/1', status='wish')])
+        result = merge_items(index, [Book(link='/book/1', status='read')])
+        assert len(result.changed) == 1
+
+    def test_merge_quotes(self):
+        """Test merging quotes by text"""
+        book = Book(link='/book/1')
+        old = [Quote(link='/quote/1', text='Old text', book=book)]
+        new = [Quote(link='/quote/1', text='New text', book=book),
+               Quote(link='/quote/2', text='Text', book=book)]
+        result = merge_items(old, new, fields=QUOTE_FIELDS)
+        assert len(result.added) == 1
+        assert len(result.changed) == 1
+
+    def test_iter_merge_is_lazy(self):
+        """Test that iter_merge consumes the input one item at a time"""
+        index = build_index([Book(link='/book/1', status='wish')])
+        consumed = []
+
+        def stream():
+            for i in range(1, 4):
+                consumed.append(i)
+                yield Book(link=f'/book/{i}', status='read')
+
+        changed = []
+        added = iter_merge(index, stream(), changed=changed)
+        assert next(added).link == 'https://www.livelib.ru/book/2'
+        assert consumed == [1, 2]
+        assert [b.link for b in changed] == ['https://www.livelib.ru/book/1']
+
+    @pytest.mark.slow
+    def test_merge_large_collections(self):
+        """Test that merging large collections stays fast"""
+        old = [Book(link=f'/book/{i}', status='read') for i in range(20000)]
+        new = [Book(link=f'/book/{i}', status='read') for i in range(1000, 21000)]
+        result = merge_items(old, new)
+        assert len(result.added) == 1000
+        assert len(result.removed) == 1000
+
+
+class TestStalePageCounter:
+    """Tests for has_news and StalePageCounter"""
+
+    def test_has_news(self):
+        """Test detection of new and changed items"""
+        index = build_index([Book(link='/book/1', status='read')])
+        assert not has_news([Book(link='/book/1', status='read')], index)
+        assert has_news([Book(link='/book/1', status='wish')], index)
+        assert has_news([Book(link='/book/2')], index)
+        assert not has_news([], index)
+
+    def test_counter_disabled_without_index_or_limit(self):
+        """Test that the counter never stops without an index or a limit"""
+        assert not StalePageCounter(None, 1).feed([])
+        assert not StalePageCounter({}, 0).feed([])
+
+    def test_counter_stops_after_consecutive_stale_pages(self):
+        """Test stopping after `limit` pages in a row without news"""
+        index = build_index([Book(link=f'/book/{i}') for i in range(10)])
+        counter = StalePageCounter(index, 2)
+        assert not counter.feed([Book(link='/book/1')])
+        assert counter.feed([Book(link='/book/2')])
+
+    def test_counter_resets_on_news(self):
+        """Test that a page with news resets the count"""
+        index = build_index([Book(link=f'/book/{i}') for i in range(10)])
+        counter = StalePageCounter(index, 2)
+        assert not counter.feed([Book(link='/book/1')])
+        assert not counter.feed([Book(link='/book/100')])
+        assert not counter.feed([Book(link='/book/2')])
+        assert counter.stale_pages == 1
+
+
+class TestPageWalk:
+    """Tests for PageWalk"""
+
+    def test_without_checkpoint(self):
+        """Test that a walk without a journal starts at page 1 and only counts stale pages"""
+        walk = PageWalk(None, build_index([Book(link='/book/1')]), 1)
+        assert (walk.start, walk.done, list(walk.restored())) == (1, False, [])
+        assert walk.add(1, [Book(link='/book/1')])
+        walk.finish()
+
+    def test_resumes_from_checkpoint(self, tmp_path):
+        """Test that pages go to the journal and a resumed walk restores them and starts after them"""
+        from Helpers.checkpoint import Checkpoint
+        path = str(tmp_path / 'read.checkpoint')
+        walk = PageWalk(Checkpoint(path), None, 0)
+        assert not walk.add(1, [Book(link='/book/1')])
+        assert not walk.add(2, [Book(link='/book/2')])
+        resumed = PageWalk(Checkpoint(path, resume=True), None, 0)
+        assert resumed.start == 3 and not resumed.done
+        assert [b.link for b in resumed.restored()] == [Book(link=f'/book/{i}').link for i in (1, 2)]
+        resumed.finish()
+        assert PageWalk(Checkpoint(path, resume=True), None, 0).done
+
@@ -0,0 +1,143 @@
+"""
+Unit tests for metrics module
+"""
+import pytest
+import json
+import threading
+import time
+from unittest.mock import Mock
+from Helpers.metrics import Histogram, Metrics, merged_batches
+from export import write_metrics
+from tests.fixtures.mock_html import make_book_list_page, MOCK_EMPTY_PAGE
+
+
+class TestHistogram:
+    """Tests for Histogram class"""
+
+    def test_counts_and_quantiles(self):
+        """Test bucket counts and the interpolated quantiles"""
+        histogram = Histogram((1, 2, 4))
+        for value in (0.5, 1.5, 1.5, 3, 10):
+            histogram.add(value)
+        assert histogram.counts == [1, 2, 1, 1]
+        assert histogram.count == 5 and histogram.sum == pytest.approx(16.5)
+        assert 1 <= histogram.quantile(0.5) <= 2
+        assert histogram.quantile(1) == 10
+
+    def test_empty(self):
+        """Test that an empty histogram reports zeros"""
+        assert Histogram((1,)).to_dict() == {'count': 0, 'sum': 0.0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+
+
+class TestMetrics:
+    """Tests for Metrics class"""
+
+    def test_measure_records_failed_block(self):
+        """Test that a block is timed even when it raises"""
+        metrics = Metrics()
+        with pytest.raises(ConnectionError):
+            with metrics.measure('download'):
+                raise ConnectionError('reset')
+        assert metrics.summary()['stages']['download']['count'] == 1
+
+    def test_shared_between_threads(self):
+        """Test that counters from several threads add up"""
+        metrics = Metrics()
+
+        def work():
+            for _ in range(1000):
+                metrics.count('pages')
+                metrics.observe('download', 0.01)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        summary = metrics.summary()
+        assert summary['counters']['pages'] == 4000
+        assert summary['stages']['download']['count'] == 4000
+
+    def test_summary_derived_values(self):
+        """Test the sleep share, the cache hit ratio and the items per page histogram"""
+        metrics = Metrics()
+        metrics.observe('sleep', 3)
+        metrics.observe('download', 0.5)
+        metrics.observe('download', 0.5)
+        metrics.observe('parse_books', 0.5)
+        metrics.observe('items_per_page', 20)
+        metrics.count('cache_hits')
+        summary = metrics.summary()
+        assert summary['sleep_share'] == pytest.approx(3 / 4.5, abs=0.001)
+        assert summary['cache_hit_ratio'] == 0.5
+        assert summary['items_per_page']['mean'] == 20
+        assert 'items_per_page' not in summary['stages']
+
+    @pytest.mark.parametrize('openmetrics', [False, True])
+    def test_prometheus_text(self, openmetrics):
+        """Test the exposition format of histograms and counters"""
+        metrics = Metrics()
+        metrics.observe('download', 0.2)
+        metrics.observe('download', 7)
+        metrics.count('bytes', 1024)
+        lines = metrics.to_prometheus(openmetrics).splitlines()
+        assert 'livelib_stage_seconds_bucket{stage="download",le="0.25"} 1' in lines
+        assert 'livelib_stage_seconds_bucket{stage="download",le="+Inf"} 2' in lines
+        assert 'livelib_stage_seconds_count{stage="download"} 2' in lines
+        assert 'livelib_bytes_total 1024' in lines
+        family = 'livelib_bytes' if openmetrics else 'livelib_bytes_total'
+        assert f'# TYPE {family} counter' in lines
+        assert (lines[-1] == '# EOF') == openmetrics
+
+    def test_write_metrics_files(self, tmp_path):
+        """Test that the summary and the textfile are written, with the cache counters"""
+        metrics = Metrics()
+        metrics.observe('download', 0.1)
+        cache = Mock(hits=3, revalidated=1, misses=2)
+        json_path, prom_path = str(tmp_path / 'run.json'), str(tmp_path / 'run.prom')
+        write_metrics(metrics, cache, json_path, prom_path)
+        summary = json.loads(open(json_path, encoding='utf-8').read())
+        assert summary['counters'] == {'cache_hits': 3, 'cache_misses': 2, 'cache_revalidated': 1}
+        assert 'livelib_cache_hits_total 3' in open(prom_path, encoding='utf-8').read()
+
+
+class TestMergedBatches:
+    """Tests for merged_batches"""
+
+    def test_merge_time_excludes_source(self):
+        """Test that the time spent producing items is not counted as merge time"""
+        metrics = Metrics()
+
+        def slow_source():
+            for idx in range(4):
+                time.sleep(0.05)
+                yield idx
+
+        batches = list(merged_batches(metrics, slow_source(), lambda items: (i for i in items if i % 2), 1))
+        assert batches == [[1], [3]]
+        assert metrics.summary()['stages']['merge']['sum'] < 0.05
+
+    def test_without_metrics(self):
+        """Test that batches are the same when metrics are off"""
+        assert list(merged_batches(None, range(5), lambda items: items, 2)) == [[0, 1], [2, 3], [4]]
+
+
+class TestCrawlMetrics:
+    """Tests for the stages recorded during a crawl"""
+
+    def test_book_crawl_records_stages(self, app_context, fake_site):
+        """Test that downloads, bytes, parsing and items per page are recorded"""
+        from Modules.BookLoader import BookLoader
+
+        app_context.metrics = Metrics()
+        pages = {1: make_book_list_page(3), 2: make_book_list_page(2, start=3)}
+        with fake_site(lambda link, idx: pages.get(idx)).patch():
+            books = BookLoader(app_context).get_books('read')
+        summary = app_context.metrics.summary()
+        assert len(books) == 5
+        assert summary['counters']['pages'] == 3
+        assert summary['counters']['bytes'] == sum(len(page) for page in pages.values()) + len(MOCK_EMPTY_PAGE)
+        assert summary['stages']['download']['count'] == 3
+        assert summary['stages']['parse_books']['count'] == 2
+        assert summary['items_per_page']['sum'] == 5
+        assert summary['stages']['sleep']['count'] == 3
@@ -0,0 +1,246 @@
+"""
+Unit tests for PageFetcher module
+"""
+import pytest
+import asyncio
+import re
+from unittest.mock import Mock
+from Helpers.driver_pool import DriverPool
+from Helpers.page_loader import SiteBusyError
+from Helpers.retry import RetryPolicy, DeadLetters
+from Modules.PageFetcher import PageFetcher
+from tests.fixtures.mock_html import MOCK_404_PAGE
+
+
+def numbered_page(i):
+    return f'<html><body><div id="page">{i}</div></body></html>'
+
+
+def numbered(last_page, failing=None):
+    """
+    Site content for fake_site: numbered pages up to last_page. failing maps a page number to the error it
+    raises on every request, or to a list of errors raised one per request before the page loads
+    """
+    failing = failing or {}
+
+    def content(link, idx):
+        error = failing.get(idx)
+        if isinstance(error, list):
+            error = error.pop(0) if error else None
+        if error is not None:
+            raise error
+        return numbered_page(idx) if idx <= last_page else None
+    return content
+
+
+def parse_numbered(raw):
+    """Parse function for the process pool: the page number, the empty page is the last one"""
+    numbers = [int(n) for n in re.findall(r'<div id="page">(\d+)</div>', raw)]
+    if numbers == [3]:
+        raise ValueError('broken page')
+    return (None if numbers else 'last'), numbers
+
+
+def page_numbers(pages):
+    return [int(page.xpath('//div[@id="page"]/text()')[0]) for page in pages]
+
+
+class TestPageFetcher:
+    """Tests for PageFetcher.pages"""
+
+    @pytest.mark.parametrize('workers', [1, 4])
+    def test_pages_in_order_until_last_page(self, app_context, fake_site, workers):
+        """Test that pages come back in order and stop at the empty page"""
+        app_context.workers = workers
+        with fake_site(numbered(7), latency=0.01, jitter=True).patch():
+            pages = list(PageFetcher(app_context).pages('https://www.livelib.ru/reader/u/read', 100))
+        assert page_numbers(pages) == list(range(1, 8))
+
+    def test_pages_stop_on_redirect(self, app_context, fake_site):
+        """Test that the bot redirect page stops the crawl"""
+        app_context.workers = 3
+        with fake_site(numbered(2), last=MOCK_404_PAGE).patch():
+            pages = list(PageFetcher(app_context).pages('https://www.livelib.ru/reader/u/read', 100))
+        assert page_numbers(pages) == [1, 2]
+
+    def test_pages_respect_count(self, app_context, fake_site):
+        """Test that no more than count pages are requested"""
+        app_context.workers = 4
+        site = fake_site(numbered(50))
+        with site.patch():
+            pages = list(PageFetcher(app_context).pages('https://www.livelib.ru/reader/u/read', 3))
+        assert page_numbers(pages) == [1, 2, 3]
+        assert sorted(site.numbers) == [1, 2, 3]
+
+    def test_pages_skip_failed_download(self, app_context, fake_site):
+        """Test that a failed page is skipped and the crawl goes on"""
+        app_context.workers = 2
+        with fake_site(numbered(4, failing={2: ConnectionError('boom')})).patch():
+            pages = list(PageFetcher(app_context).pages('https://www.livelib.ru/reader/u/read', 100))
+        assert page_numbers(pages) == [1, 3, 4]
+
+    def test_pages_bounded_in_flight(self, app_context, fake_site):
+        """Test that at most `workers` pages past the last one are requested"""
+        app_context.workers = 3
+        site = fake_site(numbered(5))
+        with site.patch():
+            list(PageFetcher(app_context).pages('https://www.livelib.ru/reader/u/read', 100))
+        assert max(site.numbers) <= 6 + 2
+
+    def test_numbered_pages_from_start(self, app_context, fake_site):
+        """Test that the crawl can start from a later page and reports page numbers"""
+        app_context.workers = 2
+        site = fake_site(numbered(5, failing={4: ConnectionError('boom')}))
+        with site.patch():
+            pages = list(PageFetcher(app_context).numbered_pages('https://www.livelib.ru/reader/u/read', 100, start=3))
+        assert [idx for idx, _ in pages] == [3, 5]
+        assert page_numbers(page for _, page in pages) == [3, 5]
+        assert min(site.numbers) == 3
+
+    def test_selenium_driver_forces_single_worker(self, app_context, mock_selenium_driver):
+        """Test that a selenium driver is never shared between threads"""
+        app_context.workers = 8
+        app_context.driver = mock_selenium_driver
+        assert PageFetcher(app_context).workers == 1
+
+    def test_driver_pool_keeps_workers(self, app_context):
+        """Test that a pool of browsers is shared by all download threads"""
+        app_context.workers = 4
+        app_context.driver = DriverPool(4, factory=object)
+        assert PageFetcher(app_context).workers == 4
+
+
+class TestRetries:
+    """Tests for retries and the failed page list"""
+
+    @pytest.fixture
+    def retrying_context(self, app_context, tmp_path):
+        app_context.workers = 2
+        app_context.retry_policy = RetryPolicy(max_attempts=3, base_delay=0.01, jitter=0)
+        app_context.dead_letters = DeadLetters(str(tmp_path / 'failed'))
+        return app_context
+
+    def test_transient_failure_retried(self, retrying_context, fake_site):
+        """Test that a page failing once is loaded by the next attempt and not skipped"""
+        site = fake_site(numbered(4, failing={2: [ConnectionError('reset'), SiteBusyError('/~2', 503)]}))
+        with site.patch():
+            pages = list(PageFetcher(retrying_context).pages('https://www.livelib.ru/reader/u/read', 100))
+        assert page_numbers(pages) == [1, 2, 3, 4]
+        assert site.numbers.count(2) == 3
+        assert retrying_context.dead_letters.links() == []
+
+    def test_exhausted_attempts_dead_lettered(self, retrying_context, fake_site):
+        """Test that a page failing every attempt is skipped and put to the failed list"""
+        site = fake_site(numbered(4, failing={3: [ConnectionError('reset')] * 3}))
+        with site.patch():
+            pages = list(PageFetcher(retrying_context).pages('https://www.livelib.ru/reader/u/read', 100))
+        assert page_numbers(pages) == [1, 2, 4]
+        assert site.numbers.count(3) == 3
+        assert retrying_context.dead_letters.links() == ['https://www.livelib.ru/reader/u/read/~3']
+
+    def test_fatal_error_not_retried(self, retrying_context, fake_site):
+        """Test that an error which would repeat is dead-lettered at once"""
+        site = fake_site(numbered(4, failing={1: [ValueError('bad url')]}))
+        with site.patch():
+            pages = list(PageFetcher(retrying_context).pages('https://www.livelib.ru/reader/u/read', 100))
+        assert page_numbers(pages) == [2, 3, 4]
+        assert site.numbers.count(1) == 1
+        assert retrying_context.dead_letters.links() == ['https://www.livelib.ru/reader/u/read/~1']
+
+    def test_explicit_pages_only(self, retrying_context, fake_site):
+        """Test that only the listed pages are loaded when pages are given"""
+        site = fake_site(numbered(4))
+        with site.patch():
+            pages = list(PageFetcher(retrying_context).numbered_pages('https://www.livelib.ru/reader/u/read', 100,
+                                                                      pages=[2, 4]))
+        assert [idx for idx, _ in pages] == [2, 4]
+        assert sorted(site.numbers) == [2, 4]
+
+    def test_async_transient_failure_retried(self, retrying_context, fake_site):
+        """Test that the async loader retries a failed page as well"""
+        async def collect():
+            return [page async for page in PageFetcher(retrying_context).pages_async(
+                'https://www.livelib.ru/reader/u/read', 100)]
+
+        with fake_site(numbered(4, failing={2: [ConnectionError('reset')]})).patch_async():
+            pages = asyncio.run(collect())
+        assert page_numbers(pages) == [1, 2, 3, 4]
+
+
+class TestPacingFeedback:
+    """Tests for the reports PageFetcher sends to the rate limiter"""
+
+    def test_reports_latency_push_back_and_redirect(self, app_context, fake_site):
+        """Test that pages report their latency, 429 and the bot redirect report push-back"""
+        app_context.rate_limiter = Mock(reserve=Mock(return_value=0))
+        busy = SiteBusyError('https://www.livelib.ru/reader/u/read/~2', 429, 30)
+        with fake_site(numbered(3, failing={2: busy}), last=MOCK_404_PAGE).patch():
+            pages = list(PageFetcher(app_context).pages('https://www.livelib.ru/reader/u/read', 100))
+        assert page_numbers(pages) == [1, 3]
+        reports = [c.args for c in app_context.rate_limiter.report.call_args_list]
+        assert (None, True, 30) in reports
+        assert reports[-1] == (None, True, None)
+        assert sum(1 for latency, throttled, _ in reports if latency is not None and not throttled) == 3
+
+    def test_fresh_cache_hits_skip_the_limiter(self, app_context, tmp_path, fake_site):
+        """Test that pages served from the cache neither wait for the limiter nor report latency"""
+        from Helpers.http_cache import HttpCache
+        app_context.rate_limiter = Mock()
+        app_context.cache = HttpCache(str(tmp_path / 'cache.db'), ttl=3600)
+        for i in (1, 2):
+            app_context.cache.put(f'https://www.livelib.ru/reader/u/read/~{i}', numbered_page(i).encode())
+        site = fake_site(numbered(2))
+        with site.patch():
+            pages = list(PageFetcher(app_context).pages('https://www.livelib.ru/reader/u/read', 100))
+        assert page_numbers(pages) == [1, 2]
+        assert site.numbers == [3]
+        assert app_context.rate_limiter.acquire.call_count == 1
+        assert [c.args[0] is not None for c in app_context.rate_limiter.report.call_args_list] == [True]
+
+
+class TestParsedPages:
+    """Tests for PageFetcher.parsed_pages"""
+
+    def test_parsed_in_order_until_last_page(self, app_context, parser_pool, fake_site):
+        """Test that pages parsed in other processes come back in order and a broken page is skipped"""
+        app_context.workers = 2
+        app_context.parser_pool = parser_pool
+        with fake_site(numbered(6), latency=0.01, jitter=True).patch():
+            pages = list(PageFetcher(app_context).parsed_pages('https://www.livelib.ru/reader/u/read', 100,
+                                                               parse_numbered, start=2))
+        assert pages == [(2, [2]), (4, [4]), (5, [5]), (6, [6])]
+
+    def test_downloads_bounded_by_workers(self, app_context, parser_pool, fake_site):
+        """Test that the wider parse window does not raise the number of simultaneous downloads"""
+        app_context.workers = 1
+        app_context.parser_pool = parser_pool
+        site = fake_site(numbered(5), latency=0.01)
+        with site.patch():
+            pages = list(PageFetcher(app_context).parsed_pages('https://www.livelib.ru/reader/u/read', 100,
+                                                               parse_numbered))
+        assert [idx for idx, _ in pages] == [1, 2, 4, 5]
+        assert site.peak == 1
+
+
+class TestPageFetcherAsync:
+    """Tests for PageFetcher.pages_async"""
+
+    @staticmethod
+    def collect(fetcher, count=100):
+        async def run():
+            return [page async for page in fetcher.pages_async('https://www.livelib.ru/reader/u/read', count)]
+        return asyncio.run(run())
+
+    @pytest.mark.parametrize('workers', [1, 4])
+    def test_pages_async_in_order(self, app_context, fake_site, workers):
+        """Test that async pages come back in order and stop at the empty page"""
+        app_context.workers = workers
+        with fake_site(numbered(6), latency=0.02, jitter=True).patch_async():
+            pages = self.collect(PageFetcher(app_context))
+        assert page_numbers(pages) == list(range(1, 7))
+
+    def test_pages_async_skip_failed_download(self, app_context, fake_site):
+        """Test that a failed page is skipped"""
+        with fake_site(numbered(3, failing={1: ConnectionError('boom')})).patch_async():
+            pages = self.collect(PageFetcher(app_context))
+        assert page_numbers(pages) == [2, 3]
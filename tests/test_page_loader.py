@@ -0,0 +1,184 @@
+"""
+Unit tests for page_loader module
+"""
+import pytest
+import asyncio
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from unittest.mock import Mock, patch
+from Helpers import page_loader
+from Helpers.page_loader import PageDownloader, AsyncPageDownloader, DEFAULT_HEADERS, SiteBusyError, download_page, \
+    download_page_async, get_default_downloader
+
+
+@pytest.fixture
+def local_server():
+    """Serve a fixed page on a local port, recording request headers"""
+    seen_headers = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen_headers.append(dict(self.headers))
+            body = ('<html><body>%s</body></html>' % self.path).encode()
+            self.send_response({'/busy': 429, '/down': 503}.get(self.path, 200))
+            if self.path == '/busy':
+                self.send_header('Retry-After', '7')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:%d' % server.server_port, seen_headers
+    server.shutdown()
+    server.server_close()
+
+
+class TestPageDownloader:
+    """Tests for PageDownloader class"""
+
+    def test_pool_size_configures_adapters(self):
+        """Test that both schemes share an adapter with the requested pool size"""
+        downloader = PageDownloader(pool_size=7)
+        adapter = downloader.session.get_adapter('https://www.livelib.ru/')
+        assert adapter._pool_maxsize == 7
+        assert adapter._pool_connections == 7
+        assert downloader.session.get_adapter('http://localhost/') is adapter
+
+    def test_per_host_caps_connections(self):
+        """Test that per_host makes the pool block instead of opening extra connections"""
+        downloader = PageDownloader(pool_size=7, per_host=2)
+        adapter = downloader.session.get_adapter('https://www.livelib.ru/')
+        assert adapter._pool_maxsize == 2
+        assert adapter._pool_block is True
+        assert adapter._pool_connections == 7
+
+    def test_busy_site_raises(self, local_server):
+        """Test that 429 and 5xx answers are raised with the requested pause"""
+        base, _ = local_server
+        downloader = PageDownloader()
+        with pytest.raises(SiteBusyError) as busy:
+            downloader.download(base + '/busy')
+        assert busy.value.status == 429
+        assert busy.value.retry_after == 7
+        with pytest.raises(SiteBusyError) as down:
+            downloader.download(base + '/down')
+        assert down.value.status == 503 and down.value.retry_after is None
+        assert downloader.download(base + '/ok') == b'<html><body>/ok</body></html>'
+
+    def test_default_headers(self):
+        """Test keep-alive and compression negotiation headers"""
+        downloader = PageDownloader()
+        assert downloader.session.headers['Connection'] == 'keep-alive'
+        assert 'gzip' in downloader.session.headers['Accept-Encoding']
+        for name, value in DEFAULT_HEADERS.items():
+            assert downloader.session.headers[name] == value
+
+    def test_custom_headers_override_defaults(self):
+        """Test that explicit headers are merged over defaults"""
+        downloader = PageDownloader(headers={'User-Agent': 'backup', 'Accept-Language': 'en'})
+        assert downloader.session.headers['User-Agent'] == 'backup'
+        assert downloader.session.headers['Accept-Language'] == 'en'
+
+    def test_download_reuses_session(self, mock_requests_response):
+        """Test that every download goes through the same session"""
+        downloader = PageDownloader(timeout=5)
+        mock_requests_response.__enter__ = Mock(return_value=mock_requests_response)
+        mock_requests_response.__exit__ = Mock(return_value=False)
+        with patch.object(downloader.session, 'get', return_value=mock_requests_response) as get:
+            assert downloader.download('https://www.livelib.ru/a') == mock_requests_response.content
+            downloader.download('https://www.livelib.ru/b')
+        assert get.call_count == 2
+        get.assert_called_with('https://www.livelib.ru/b', headers=None, timeout=5)
+
+
+class TestDownloadPage:
+    """Tests for download_page function"""
+
+    def test_routes_through_given_downloader(self):
+        """Test that the passed downloader is used"""
+        downloader = Mock()
+        downloader.download.return_value = b'<html></html>'
+        assert download_page('https://www.livelib.ru/a', downloader=downloader) == b'<html></html>'
+        downloader.download.assert_called_once_with('https://www.livelib.ru/a')
+
+    def test_falls_back_to_shared_downloader(self):
+        """Test that calls without a downloader share one pooled instance"""
+        assert get_default_downloader() is get_default_downloader()
+        with patch.object(page_loader, '_default_downloader', Mock()) as default:
+            default.download.return_value = b'body'
+            assert download_page('https://www.livelib.ru/a') == b'body'
+
+    def test_download_error_is_raised(self):
+        """Test that download errors propagate to the caller"""
+        downloader = Mock()
+        downloader.download.side_effect = ConnectionError('boom')
+        with pytest.raises(ConnectionError):
+            download_page('https://www.livelib.ru/a', downloader=downloader)
+
+    def test_selenium_driver_takes_precedence(self, mock_selenium_driver):
+        """Test that a selenium driver bypasses the requests downloader"""
+        downloader = Mock()
+        with patch('selenium.webdriver.support.wait.WebDriverWait'):
+            result = download_page('https://www.livelib.ru/a', mock_selenium_driver, downloader)
+        assert result == mock_selenium_driver.page_source
+        downloader.download.assert_not_called()
+
+    def test_requests_logs_to_module_logger(self, caplog, capsys):
+        """Test that the requests path logs whole lines through the page loader's logger instead of printing"""
+        downloader = Mock()
+        downloader.download.side_effect = [b'body', ConnectionError('boom')]
+        with caplog.at_level('INFO', logger='Helpers.page_loader'):
+            download_page('https://www.livelib.ru/a', downloader=downloader)
+            with pytest.raises(ConnectionError):
+                download_page('https://www.livelib.ru/b', downloader=downloader)
+        assert [(r.name, r.levelname) for r in caplog.records] == \
+            [('Helpers.page_loader', 'INFO')] * 3 + [('Helpers.page_loader', 'ERROR')]
+        assert capsys.readouterr().out == ''
+
+    def test_selenium_logs_to_module_logger(self, mock_selenium_driver, caplog):
+        """Test that the selenium path logs through the page loader's own logger"""
+        with patch('selenium.webdriver.support.wait.WebDriverWait'), \
+                caplog.at_level('INFO', logger='Helpers.page_loader'):
+            download_page('https://www.livelib.ru/a', mock_selenium_driver)
+        assert [record.name for record in caplog.records] == ['Helpers.page_loader']
+
+
+class TestAsyncPageDownloader:
+    """Tests for AsyncPageDownloader and download_page_async"""
+
+    def test_download_from_local_server(self, local_server):
+        """Test downloading several pages concurrently through one session"""
+        base, seen_headers = local_server
+
+        async def run():
+            async with AsyncPageDownloader(pool_size=2) as downloader:
+                return await asyncio.gather(*[download_page_async(f'{base}/p{i}', downloader) for i in range(3)])
+
+        bodies = asyncio.run(run())
+        assert bodies == [b'<html><body>/p%d</body></html>' % i for i in range(3)]
+        assert seen_headers[0]['Accept-Language'] == DEFAULT_HEADERS['Accept-Language']
+
+    def test_busy_site_raises_async(self, local_server):
+        """Test that the async downloader raises on 429 too"""
+        base, _ = local_server
+
+        async def run():
+            async with AsyncPageDownloader() as downloader:
+                await download_page_async(base + '/busy', downloader)
+
+        with pytest.raises(SiteBusyError):
+            asyncio.run(run())
+
+    def test_download_error_is_raised(self):
+        """Test that connection errors propagate to the caller"""
+        async def run():
+            async with AsyncPageDownloader(timeout=2) as downloader:
+                await download_page_async('http://127.0.0.1:1/', downloader)
+
+        with pytest.raises(Exception):
+            asyncio.run(run())
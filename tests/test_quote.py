@@ -1,6 +1,8 @@
 """
 Unit tests for Quote class
 """
+import warnings
+
 import pytest
 from Helpers.quote import Quote
 from Helpers.book import Book
@@ -99,6 +101,14 @@ class TestQuote:
         assert quote1 != quote2
         assert not (quote1 != quote1)
 
+    def test_quote_inequality_other_type(self):
+        """Test that a quote is not equal to a value of another type, without warnings"""
+        quote = Quote(link='/quote/111', text='Text')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            assert quote != '/quote/111'
+            assert quote != Book(link='/quote/111')
+
     def test_quote_to_list(self):
         """Test converting quote to list"""
         book = Book(link='/book/333', name='Book', author='Author')
@@ -111,6 +121,20 @@ class TestQuote:
         assert len(result) == 3
         assert 'Quote text' in [str(item) for item in result]
 
+    def test_quote_default_book_not_shared(self):
+        """Test that quotes without a book get separate empty books"""
+        quote1 = Quote(link='/quote/1', text='a')
+        quote2 = Quote(link='/quote/2', text='b')
+        quote1.book.add_name('Changed')
+        assert quote2.book.name == ''
+
+    def test_quote_hash_and_to_dict(self):
+        """Test link-based hashing and the nested serialization order"""
+        quote = Quote(link='/quote/1', text='a', book=Book(link='/book/2'))
+        assert len({quote, Quote(link='/quote/1', text='b')}) == 1
+        assert list(quote.to_dict()) == list(Quote.FIELDS)
+        assert quote.to_dict()['book'] == quote.book.to_dict()
+
     def test_quote_add_book(self):
         """Test adding book to quote"""
         quote = Quote(link='/quote/555', text='Text')
@@ -0,0 +1,250 @@
+"""
+Unit tests for QuoteLoader module
+"""
+import pytest
+import asyncio
+import pandas as pd
+from Helpers.book import Book
+from Helpers.checkpoint import Checkpoint
+from Helpers.sqlite_store import SqliteStore
+from Helpers.quote import Quote
+from Modules.QuoteLoader import QuoteLoader, QUOTE_COLUMNS
+from tests.fixtures.mock_html import make_quote_list_page
+
+
+@pytest.fixture
+def quote_loader(app_context, temp_csv_file):
+    """QuoteLoader writing to a temporary CSV file"""
+    app_context.quote_file = temp_csv_file
+    return QuoteLoader(app_context)
+
+
+def read_quotes_df(path):
+    return pd.read_csv(path, sep='\t')
+
+
+class TestUpsertQuotes:
+    """Tests for QuoteLoader.upsert_quotes"""
+
+    def test_upsert_into_empty_frame(self, sample_quotes):
+        """Test that all quotes are appended to an empty frame"""
+        result = QuoteLoader.upsert_quotes(pd.DataFrame(columns=QUOTE_COLUMNS), sample_quotes)
+        assert list(result.columns) == QUOTE_COLUMNS
+        assert list(result['Quote text']) == ['First quote text', 'Second quote text', 'Third quote text']
+
+    def test_upsert_updates_existing_text(self, sample_quotes):
+        """Test that text of a known quote is replaced in the 'Quote text' column"""
+        existing = QuoteLoader.upsert_quotes(pd.DataFrame(columns=QUOTE_COLUMNS), sample_quotes)
+        updated = Quote(link='/quote/222222', text='Edited text', book=sample_quotes[1].book)
+        result = QuoteLoader.upsert_quotes(existing, [updated])
+        assert len(result) == 3
+        assert 'text' not in result.columns
+        assert result.loc[result['Quote link'] == updated.link, 'Quote text'].item() == 'Edited text'
+
+    def test_upsert_appends_and_updates(self, sample_quotes):
+        """Test mixed batch of new and known quotes"""
+        existing = QuoteLoader.upsert_quotes(pd.DataFrame(columns=QUOTE_COLUMNS), sample_quotes[:2])
+        batch = [Quote(link='/quote/111111', text='Changed', book=sample_quotes[0].book), sample_quotes[2]]
+        result = QuoteLoader.upsert_quotes(existing, batch)
+        assert list(result['Quote text']) == ['Changed', 'Second quote text', 'Third quote text']
+
+    def test_upsert_drops_legacy_index_column(self, sample_quotes):
+        """Test that an index column saved by older versions is discarded"""
+        existing = pd.DataFrame([[0, 'Name', 'Author', 'Text', 'https://www.livelib.ru/book/1',
+                                  'https://www.livelib.ru/quote/1']], columns=['Unnamed: 0'] + QUOTE_COLUMNS)
+        result = QuoteLoader.upsert_quotes(existing, [])
+        assert list(result.columns) == QUOTE_COLUMNS
+
+    def test_upsert_duplicate_new_quotes(self):
+        """Test that the last version of a duplicated new quote wins"""
+        book = Book(link='/book/1')
+        batch = [Quote(link='/quote/1', text='First', book=book), Quote(link='/quote/1', text='Second', book=book)]
+        result = QuoteLoader.upsert_quotes(pd.DataFrame(columns=QUOTE_COLUMNS), batch)
+        assert list(result['Quote text']) == ['Second']
+
+
+class TestSaveQuotes:
+    """Tests for QuoteLoader.save_quotes"""
+
+    def test_save_quotes_new_file(self, quote_loader, sample_quotes, temp_csv_file):
+        """Test saving quotes to an empty file"""
+        quote_loader.save_quotes(sample_quotes)
+        df = read_quotes_df(temp_csv_file)
+        assert list(df.columns) == QUOTE_COLUMNS
+        assert len(df) == 3
+
+    def test_save_quotes_twice_keeps_format(self, quote_loader, sample_quotes, temp_csv_file):
+        """Test that repeated saves neither duplicate rows nor add index columns"""
+        quote_loader.save_quotes(sample_quotes)
+        quote_loader.save_quotes(sample_quotes + [Quote(link='/quote/4', text='Fourth', book=Book(link='/book/4'))])
+        df = read_quotes_df(temp_csv_file)
+        assert list(df.columns) == QUOTE_COLUMNS
+        assert len(df) == 4
+
+    def test_save_quotes_rewrite_all(self, quote_loader, sample_quotes, temp_csv_file):
+        """Test that rewrite mode drops previously saved quotes"""
+        quote_loader.save_quotes(sample_quotes)
+        quote_loader.ac.rewrite_all = True
+        quote_loader.save_quotes(sample_quotes[:1])
+        assert len(read_quotes_df(temp_csv_file)) == 1
+
+
+class TestSaveQuotesStream:
+    """Tests for QuoteLoader.save_quotes_stream"""
+
+    def test_stream_appends_new_quotes(self, quote_loader, sample_quotes, temp_csv_file):
+        """Test that new quotes are appended without rewriting saved rows"""
+        quote_loader.save_quotes_stream(iter(sample_quotes[:2]), {}, batch_size=1)
+        quote_loader.save_quotes_stream(iter(sample_quotes), quote_loader.load_index(), batch_size=1)
+        df = read_quotes_df(temp_csv_file)
+        assert list(df.columns) == QUOTE_COLUMNS
+        assert list(df['Quote link']) == [q.link for q in sample_quotes]
+
+    def test_stream_updates_changed_quotes(self, quote_loader, sample_quotes, temp_csv_file):
+        """Test that changed texts are applied in place"""
+        quote_loader.save_quotes(sample_quotes)
+        edited = Quote(link='/quote/222222', text='Edited text', book=sample_quotes[1].book)
+        quote_loader.save_quotes_stream(iter([edited]), quote_loader.load_index())
+        df = read_quotes_df(temp_csv_file)
+        assert len(df) == 3
+        assert df.loc[df['Quote link'] == edited.link, 'Quote text'].item() == 'Edited text'
+
+    def test_stream_matches_full_save(self, quote_loader, temp_csv_file):
+        """Test that appended rows use the same quoting as a full save"""
+        book = Book(link='/book/1', name='Name "with" quotes')
+        quotes = [Quote(link='/quote/1', text='He said "hi"', book=book)]
+        quote_loader.save_quotes_stream(iter(quotes), {})
+        streamed = open(temp_csv_file, encoding='utf-8').read()
+        quote_loader.ac.rewrite_all = True
+        quote_loader.save_quotes(quotes)
+        assert open(temp_csv_file, encoding='utf-8').read() == streamed
+        assert read_quotes_df(temp_csv_file)['Quote text'].item() == 'He said "hi"'
+
+    def test_stream_rewrite_all(self, quote_loader, sample_quotes, temp_csv_file):
+        """Test that rewrite mode replaces the table after the stream ends"""
+        quote_loader.save_quotes(sample_quotes)
+        quote_loader.ac.rewrite_all = True
+        quote_loader.save_quotes_stream(iter(sample_quotes[:1]), {})
+        assert len(read_quotes_df(temp_csv_file)) == 1
+
+
+    def test_stream_into_store(self, quote_loader, sample_quotes, tmp_path):
+        """Test that quotes go to the store when one is configured"""
+        quote_loader.ac.store = SqliteStore(str(tmp_path / 'library.db'))
+        quote_loader.save_quotes_stream(iter(sample_quotes[:2]), quote_loader.load_index())
+        edited = Quote(link=sample_quotes[0].link, text='Edited', book=sample_quotes[0].book)
+        quote_loader.save_quotes_stream(iter([edited, sample_quotes[2]]), quote_loader.load_index(), batch_size=1)
+        index = quote_loader.load_index()
+        assert len(index) == 3
+        assert index[edited.link].text == 'Edited'
+        quote_loader.ac.store.close()
+
+
+class TestGetQuotes:
+    """Tests for QuoteLoader.get_quotes and get_quotes_async"""
+
+    @staticmethod
+    def quote_pages(pages, per_page=4):
+        """Site content for fake_site: `pages` quote list pages"""
+        def content(link, idx):
+            return make_quote_list_page(per_page, start=(idx - 1) * per_page) if idx <= pages else None
+        return content
+
+    def test_get_quotes(self, quote_loader, fake_site):
+        """Test collecting quotes from all pages"""
+        site = fake_site(self.quote_pages(2))
+        with site.patch():
+            quotes = quote_loader.get_quotes()
+        assert [q.text for q in quotes[:2]] == ['Quote text 0', 'Quote text 1']
+        assert len(quotes) == 8
+
+    def test_get_quotes_with_parser_pool(self, quote_loader, parser_pool, fake_site):
+        """Test that pages parsed in the process pool give the same quotes"""
+        site = fake_site(self.quote_pages(2))
+        with site.patch():
+            expected = quote_loader.get_quotes()
+            quote_loader.ac.parser_pool = parser_pool
+            quotes = quote_loader.get_quotes()
+        assert [(q.link, q.text, q.book.link) for q in quotes] == [(q.link, q.text, q.book.link) for q in expected]
+
+    def test_get_quotes_async(self, quote_loader, fake_site):
+        """Test the coroutine version yields the same quotes"""
+        site = fake_site(self.quote_pages(2))
+        with site.patch_async():
+            quotes = asyncio.run(quote_loader.get_quotes_async())
+        assert len(quotes) == 8
+        assert quotes[-1].link == 'https://www.livelib.ru/quote/7-quote-7'
+
+    def test_get_quotes_loads_full_text(self, quote_loader, fake_site):
+        """Test that truncated quotes are completed from the quote page"""
+        truncated = make_quote_list_page(1).replace('</blockquote>', '</blockquote><a class="read-more__link">more</a>')
+        full = '<html><body><article><blockquote>Full text</blockquote></article></body></html>'
+
+        def content(link, idx):
+            if idx is None:
+                return full
+            return truncated if idx == 1 else None
+
+        with fake_site(content).patch():
+            quotes = quote_loader.get_quotes()
+        assert [q.text for q in quotes] == ['Full text']
+
+    def test_get_quotes_stops_on_known_pages(self, quote_loader, fake_site):
+        """Test incremental crawl over a saved quote feed"""
+        site = fake_site(self.quote_pages(20))
+        with site.patch():
+            saved = quote_loader.get_quotes()
+        quote_loader.save_quotes(saved)
+
+        quote_loader.ac.stop_after = 1
+        site.requested.clear()
+        with site.patch():
+            quotes = quote_loader.get_quotes(known=quote_loader.load_index())
+        assert len(site.requested) == 1
+        assert len(quotes) == 4
+
+    def test_known_truncated_quote_is_not_reloaded(self, quote_loader, fake_site):
+        """Test that a saved truncated quote reuses its saved text"""
+        truncated = make_quote_list_page(1).replace('</blockquote>', '</blockquote><a class="read-more__link">more</a>')
+        known = {'https://www.livelib.ru/quote/0-quote-0': Quote('/quote/0-quote-0', 'Saved text')}
+        quote_loader.ac.stop_after = 1
+        site = fake_site(lambda link, idx: truncated)
+        with site.patch():
+            quotes = quote_loader.get_quotes(known=known)
+        assert all('~' in link for link in site.requested)
+        assert [q.text for q in quotes] == ['Saved text']
+
+
+    def test_get_quotes_resume(self, quote_loader, tmp_path, fake_site):
+        """Test that restored quotes come first and finished pages are not requested again"""
+        path = str(tmp_path / 'quotes.checkpoint')
+        site = fake_site(self.quote_pages(3))
+        with site.patch():
+            quotes = quote_loader.iter_quotes(checkpoint=Checkpoint(path))
+            first = [next(quotes) for _ in range(4)]
+            quotes.close()
+
+        site.requested.clear()
+        with site.patch():
+            resumed = quote_loader.get_quotes(checkpoint=Checkpoint(path, resume=True))
+        assert 1 not in site.numbers
+        assert [q.text for q in resumed[:4]] == [q.text for q in first]
+        assert len(resumed) == 12
+
+
+class TestLoadIndex:
+    """Tests for QuoteLoader.load_index"""
+
+    def test_load_index_missing_file(self, quote_loader):
+        """Test that a missing backup gives an empty index"""
+        quote_loader.ac.quote_file = quote_loader.ac.quote_file + '_missing.csv'
+        assert quote_loader.load_index() == {}
+
+    def test_load_index(self, quote_loader, sample_quotes):
+        """Test that saved quotes are indexed by link with their text"""
+        quote_loader.save_quotes(sample_quotes)
+        index = quote_loader.load_index()
+        assert len(index) == len(sample_quotes)
+        assert all(q.link in index for q in sample_quotes)
+        assert 'https://www.livelib.ru/quote/0' not in index
+        assert index[sample_quotes[0].link].text == sample_quotes[0].text
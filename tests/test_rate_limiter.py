@@ -0,0 +1,106 @@
+"""
+Unit tests for rate_limiter module
+"""
+import pytest
+import threading
+import time
+from Helpers.rate_limiter import TokenBucket, AdaptiveDelay, load_delay, save_delay
+
+
+class TestTokenBucket:
+    """Tests for TokenBucket class"""
+
+    def test_invalid_rate(self):
+        """Test that a non-positive rate is rejected"""
+        with pytest.raises(ValueError):
+            TokenBucket(0)
+
+    def test_burst_is_free(self):
+        """Test that the first burst tokens are granted without waiting"""
+        bucket = TokenBucket(rate=1, burst=3)
+        assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    def test_reserve_after_burst_accumulates_debt(self):
+        """Test that every token past the burst waits one more interval"""
+        bucket = TokenBucket(rate=10, burst=1)
+        bucket.reserve()
+        assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+        assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+    def test_acquire_respects_rate(self):
+        """Test that acquire paces calls to the configured rate"""
+        bucket = TokenBucket(rate=20, burst=1)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        assert time.monotonic() - start >= 0.19
+
+    def test_shared_between_threads(self):
+        """Test that several threads share one budget"""
+        bucket = TokenBucket(rate=50, burst=1)
+        start = time.monotonic()
+        threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(3)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert time.monotonic() - start >= 11 / 50 - 0.01
+
+
+class TestAdaptiveDelay:
+    """Tests for AdaptiveDelay class"""
+
+    def test_starts_in_the_middle(self):
+        """Test the default and the restored starting pause"""
+        assert AdaptiveDelay(5, 15).delay == 10
+        assert AdaptiveDelay(5, 15, start=7).delay == 7
+        assert AdaptiveDelay(5, 15, start=1).delay == 5
+
+    def test_healthy_site_speeds_up_to_min_delay(self):
+        """Test additive decrease of the pause while answers are fast"""
+        pacer = AdaptiveDelay(5, 15)
+        pacer.report(latency=0.2)
+        assert pacer.delay == pytest.approx(9.5)
+        for _ in range(100):
+            pacer.report(latency=0.2)
+        assert pacer.delay == 5
+
+    def test_push_back_doubles_up_to_limit(self):
+        """Test multiplicative backoff on 429/5xx/bot redirect"""
+        pacer = AdaptiveDelay(5, 15)
+        pacer.report(throttled=True)
+        assert pacer.delay == 20
+        for _ in range(10):
+            pacer.report(throttled=True)
+        assert pacer.delay == 15 * AdaptiveDelay.BACKOFF_LIMIT
+
+    def test_slow_answer_backs_off(self):
+        """Test that an answer much slower than usual grows the pause"""
+        pacer = AdaptiveDelay(5, 15)
+        pacer.report(latency=0.5)
+        pacer.report(latency=3)
+        assert pacer.delay == pytest.approx(9.5 * 1.5)
+
+    def test_retry_after_postpones_next_request(self):
+        """Test that the requested pause is kept before the next slot"""
+        pacer = AdaptiveDelay(0, 0.01, jitter=0)
+        pacer.report(throttled=True, retry_after=2)
+        assert pacer.reserve() == pytest.approx(2, abs=0.05)
+
+    def test_requests_are_spaced(self):
+        """Test that consecutive reservations keep the current pause between them"""
+        pacer = AdaptiveDelay(1, 1, jitter=0)
+        assert pacer.reserve() == 0
+        assert pacer.reserve() == pytest.approx(1, abs=0.01)
+        assert pacer.reserve() == pytest.approx(2, abs=0.01)
+
+    def test_state_persists_per_host(self, tmp_path):
+        """Test that the pause of one host survives a run and other hosts are kept"""
+        path = str(tmp_path / 'pace.json')
+        assert load_delay(path, 'www.livelib.ru') is None
+        save_delay(path, 'www.livelib.ru', 7.5)
+        save_delay(path, 'example.org', 3)
+        assert load_delay(path, 'www.livelib.ru') == 7.5
+        assert load_delay(path, 'example.org') == 3
+        (tmp_path / 'broken.json').write_text('{', encoding='utf-8')
+        assert load_delay(str(tmp_path / 'broken.json'), 'www.livelib.ru') is None
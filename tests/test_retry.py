@@ -0,0 +1,81 @@
+"""
+Unit tests for retry module
+"""
+import pytest
+from Helpers.page_loader import SiteBusyError
+from Helpers.retry import RetryPolicy, DeadLetters, EmptyPageError
+
+
+class TestRetryPolicy:
+    """Tests for RetryPolicy class"""
+
+    @pytest.mark.parametrize('error', [ConnectionError('reset'), TimeoutError('slow'),
+                                       SiteBusyError('/reader/u/read/~1', 503), EmptyPageError('/reader/u/read/~1')])
+    def test_transient_errors_are_retried(self, error):
+        """Test that network errors, timeouts, 429/5xx and empty pages are retried"""
+        assert RetryPolicy().is_retryable(error)
+
+    @pytest.mark.parametrize('error', [ValueError('bad url'), KeyError('link')])
+    def test_other_errors_are_fatal(self, error):
+        """Test that errors which would repeat on every attempt are not retried"""
+        assert not RetryPolicy().is_retryable(error)
+
+    def test_attempts_are_limited(self):
+        """Test that no attempt is made past max_attempts"""
+        policy = RetryPolicy(max_attempts=3)
+        error = ConnectionError('reset')
+        assert [policy.should_retry(attempt, error) for attempt in (1, 2, 3)] == [True, True, False]
+
+    def test_delay_doubles_up_to_limit(self):
+        """Test exponential backoff without jitter, capped by max_delay"""
+        policy = RetryPolicy(base_delay=2, max_delay=10, jitter=0)
+        assert [policy.delay(attempt) for attempt in (1, 2, 3, 4)] == [2, 4, 8, 10]
+
+    def test_delay_jitter_bounds(self):
+        """Test that jitter keeps the delay within the configured share"""
+        policy = RetryPolicy(base_delay=4, jitter=0.5)
+        assert all(2 <= policy.delay(1) <= 6 for _ in range(100))
+
+    def test_delay_respects_retry_after(self):
+        """Test that the delay is never shorter than the Retry-After of the site"""
+        policy = RetryPolicy(base_delay=1, jitter=0)
+        assert policy.delay(1, SiteBusyError('/reader/u', 429, 30)) == 30
+
+
+class TestDeadLetters:
+    """Tests for DeadLetters class"""
+
+    def test_links_deduplicated_in_order(self, tmp_path):
+        """Test that failed pages are listed once, in the order they failed"""
+        dead_letters = DeadLetters(str(tmp_path / 'failed'))
+        for link in ('/reader/u/read/~3', '/reader/u/quotes/~1', '/reader/u/read/~3'):
+            dead_letters.add(link, ConnectionError('reset'))
+        assert dead_letters.links() == ['/reader/u/read/~3', '/reader/u/quotes/~1']
+
+    def test_torn_line_skipped(self, tmp_path):
+        """Test that a line cut short by a crash does not hide the others"""
+        path = tmp_path / 'failed'
+        dead_letters = DeadLetters(str(path))
+        dead_letters.add('/reader/u/read/~2', ConnectionError('reset'))
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write('{"link": "/reader/u/re')
+        assert dead_letters.links() == ['/reader/u/read/~2']
+
+    def test_clear(self, tmp_path):
+        """Test that clear empties the list and a missing file reads as empty"""
+        dead_letters = DeadLetters(str(tmp_path / 'failed'))
+        dead_letters.clear()
+        dead_letters.add('/reader/u/read/~2', ConnectionError('reset'))
+        dead_letters.clear()
+        assert dead_letters.links() == []
+
+    def test_replace_with(self, tmp_path):
+        """Test that the list is swapped for the new one, and an empty new list clears it"""
+        dead_letters = DeadLetters(str(tmp_path / 'failed'))
+        dead_letters.add('/reader/u/read/~2', ConnectionError('reset'))
+        retry = DeadLetters(str(tmp_path / 'failed.retry'))
+        retry.add('/reader/u/read/~5', ConnectionError('reset'))
+        dead_letters.replace_with(retry)
+        assert dead_letters.links() == ['/reader/u/read/~5'] and retry.links() == []
+        dead_letters.replace_with(retry)
+        assert dead_letters.links() == []
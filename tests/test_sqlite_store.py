@@ -0,0 +1,107 @@
+"""
+Unit tests for sqlite_store module
+"""
+import pytest
+from Helpers.book import Book
+from Helpers.quote import Quote
+from Helpers.merge import merge_items
+from Helpers.sqlite_store import SqliteStore, StoreIndex, open_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteStore(str(tmp_path / 'library.db'))
+    yield store
+    store.close()
+
+
+class TestOpenStore:
+    """Tests for open_store"""
+
+    def test_open_sqlite(self, tmp_path):
+        """Test opening a store from its command line spec"""
+        store = open_store(f'sqlite:{tmp_path / "library.db"}')
+        assert isinstance(store, SqliteStore)
+        store.close()
+
+    @pytest.mark.parametrize('spec', ['sqlite:', 'csv:library.csv', 'library.db'])
+    def test_unknown_store(self, spec):
+        """Test that unsupported specs are rejected"""
+        with pytest.raises(ValueError):
+            open_store(spec)
+
+
+class TestBooks:
+    """Tests for book upserts and the lazy book index"""
+
+    def test_upsert_and_read_back(self, store, sample_books):
+        """Test that every field is stored"""
+        store.upsert_books(sample_books)
+        assert [b.to_dict() for b in store.iter_books()] == [b.to_dict() for b in sample_books]
+
+    def test_upsert_updates_in_place(self, store, sample_books):
+        """Test that a changed book replaces its row and keeps its position"""
+        store.upsert_books(sample_books)
+        store.upsert_books([Book(link=sample_books[0].link, status='wish', name='Book 1', author='Author 1')])
+        books = list(store.iter_books())
+        assert len(books) == 3
+        assert books[0].status == 'wish'
+
+    def test_iter_books_by_status(self, store, sample_books):
+        """Test filtering by the indexed status column"""
+        store.upsert_books(sample_books)
+        assert {b.status for b in store.iter_books('wish')} <= {'wish'}
+        assert len(list(store.iter_books('read'))) == sum(b.status == 'read' for b in sample_books)
+
+    def test_book_index_is_a_mapping(self, store, sample_books):
+        """Test lookups, iteration and length of the index"""
+        store.upsert_books(sample_books)
+        index = store.book_index()
+        assert isinstance(index, StoreIndex)
+        assert len(index) == 3
+        assert set(index) == {b.link for b in sample_books}
+        assert index[sample_books[1].link].name == sample_books[1].name
+        assert index.get('https://www.livelib.ru/book/missing') is None
+        assert sample_books[2].link in index
+
+    def test_merge_against_index(self, store, sample_books):
+        """Test that the index works with merge_items like a dict"""
+        store.upsert_books(sample_books[:2])
+        changed = Book(link=sample_books[0].link, status='wish')
+        result = merge_items(store.book_index(), [changed, sample_books[2]])
+        assert [b.link for b in result.added] == [sample_books[2].link]
+        assert [b.link for b in result.changed] == [changed.link]
+
+    def test_retain(self, store, sample_books):
+        """Test that books missing from the crawl are dropped"""
+        store.upsert_books(sample_books)
+        store.retain('books', [sample_books[1].link])
+        assert [b.link for b in store.iter_books()] == [sample_books[1].link]
+
+    def test_survives_reopening(self, tmp_path, sample_books):
+        """Test that data is committed to disk"""
+        path = str(tmp_path / 'library.db')
+        store = SqliteStore(path)
+        store.upsert_books(sample_books)
+        store.close()
+        store = SqliteStore(path)
+        assert len(store.book_index()) == 3
+        store.close()
+
+
+class TestQuotes:
+    """Tests for quote upserts"""
+
+    def test_upsert_and_read_back(self, store, sample_quotes):
+        """Test that quotes keep their text and book"""
+        store.upsert_quotes(sample_quotes)
+        quotes = list(store.iter_quotes())
+        assert [(q.link, q.text) for q in quotes] == [(q.link, q.text) for q in sample_quotes]
+        assert quotes[0].book.name == sample_quotes[0].book.name
+        assert quotes[0].book.link == sample_quotes[0].book.link
+
+    def test_quote_index_text(self, store, sample_quotes):
+        """Test that the quote index exposes the saved text"""
+        store.upsert_quotes(sample_quotes)
+        store.upsert_quotes([Quote(link=sample_quotes[0].link, text='Edited', book=sample_quotes[0].book)])
+        assert store.quote_index()[sample_quotes[0].link].text == 'Edited'